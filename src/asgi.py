@@ -0,0 +1,21 @@
+"""
+Aplicação ASGI
+
+    uvicorn src.asgi:app --host 0.0.0.0 --port 5000
+    gunicorn -k uvicorn.workers.UvicornWorker -c src/gunicorn_conf.py src.asgi:app
+
+As rotas que chamam serviços externos (n8n, Kommo CRM, ChatGPT) são atendidas
+pelos handlers assíncronos de src/routes/assincronas.py; as demais (webhooks,
+painéis, mídias, arquivos estáticos) pela aplicação Flask em um pool de
+threads (src/utils/asgi.py).
+
+Variáveis de ambiente:
+    ASGI_THREADS        Threads para o banco e as rotas WSGI (padrão: 16)
+    ASGI_HTTP_LIMIT     Conexões simultâneas com serviços externos (padrão: 0, sem limite)
+    ASGI_HTTP_TIMEOUT   Timeout total das chamadas externas em segundos (padrão: 120)
+"""
+from src.main import app as flask_app
+from src.routes.assincronas import rotas
+from src.utils.asgi import AplicacaoASGI
+
+app = AplicacaoASGI(flask_app, rotas)
@@ -0,0 +1,108 @@
+"""
+Configuração do gunicorn para produção
+
+    gunicorn -c src/gunicorn_conf.py src.main:app
+
+Variáveis de ambiente:
+    GUNICORN_WORKERS        Número de processos (padrão: 2 x CPUs da cota + 1)
+    GUNICORN_WORKER_CLASS   gthread (padrão) ou gevent (requer `pip install gevent`)
+    GUNICORN_THREADS        Threads por worker no gthread (padrão: 4)
+    GUNICORN_CONNECTIONS    Conexões simultâneas por worker no gevent (padrão: 500)
+    GUNICORN_MAX_REQUESTS   Requisições até reciclar o worker (padrão: 2000; 0 desliga)
+    GUNICORN_TIMEOUT        Segundos sem resposta até o worker ser reiniciado (padrão: 60)
+    GUNICORN_GRACEFUL_TIMEOUT  Segundos para concluir requisições no desligamento (padrão: 30)
+    GUNICORN_ACCESS_LOG     Destino do log de acesso (padrão: stdout; vazio desliga)
+    PORT                    Porta HTTP (padrão: 5000)
+    FORWARDED_ALLOW_IPS     IPs do proxy reverso cujos X-Forwarded-* são aceitos (padrão: 127.0.0.1)
+
+A aplicação é carregada uma vez no processo mestre (preload_app) e os workers
+são criados por fork, compartilhando as páginas de memória do código. As
+conexões do pool do SQLAlchemy abertas no mestre são descartadas no filho.
+"""
+import math
+import os
+
+
+def cpus_disponiveis():
+    """CPUs da cota do cgroup (limite do container) ou, sem cota, do host"""
+    cpus = os.cpu_count() or 1
+    try:
+        # cgroup v2: "<quota> <period>" ou "max <period>"
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, periodo = f.read().split()
+        if quota != 'max':
+            return max(1, min(cpus, math.ceil(int(quota) / int(periodo))))
+        return cpus
+    except (OSError, ValueError):
+        pass
+    try:
+        # cgroup v1
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as f:
+            quota = int(f.read())
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as f:
+            periodo = int(f.read())
+        if quota > 0:
+            return max(1, min(cpus, math.ceil(quota / periodo)))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+if worker_class == 'gevent':
+    # Com preload_app a aplicação é importada no mestre: o patch precisa vir antes
+    from gevent import monkey
+    monkey.patch_all()
+
+workers = int(os.environ.get('GUNICORN_WORKERS', 0)) or 2 * cpus_disponiveis() + 1
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_connections = int(os.environ.get('GUNICORN_CONNECTIONS', 500))
+
+preload_app = True
+
+# Recicla workers periodicamente (limita o crescimento de memória); o jitter
+# evita que todos reiniciem ao mesmo tempo
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = max_requests // 10
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+
+# Endereços do proxy (Traefik), separados por vírgula. No gunicorn 21 isto só
+# decide o esquema (X-Forwarded-Proto): REMOTE_ADDR continua sendo o do socket e o
+# IP do cliente vem do ProxyConfiavel (src/utils/security.py, PROXY_HOPS). No
+# UvicornWorker o uvicorn usa a mesma lista para o X-Forwarded-For.
+forwarded_allow_ips = os.environ.get('FORWARDED_ALLOW_IPS', '127.0.0.1')
+
+# Log de acesso no stdout; GUNICORN_ACCESS_LOG vazio desliga
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-') or None
+errorlog = '-'
+loglevel = os.environ.get('LOG_LEVEL', 'info').lower()
+
+
+def _descartar_pool(fechar):
+    from src.extensions import db
+    from src.main import app
+    with app.app_context():
+        db.engine.dispose(close=fechar)
+
+
+def when_ready(server):
+    # O mestre não atende requisições: fecha as conexões abertas ao carregar a aplicação
+    _descartar_pool(fechar=True)
+
+
+def post_fork(server, worker):
+    if worker_class == 'gevent':
+        try:
+            # Torna o psycopg2 cooperativo com o gevent
+            from psycogreen.gevent import patch_psycopg
+            patch_psycopg()
+        except ImportError:
+            pass
+    # close=False: os sockets herdados do mestre não são fechados pelo filho
+    _descartar_pool(fechar=False)
+    server.log.info(f'Worker {worker.pid} iniciado ({worker_class})')
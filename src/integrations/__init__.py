@@ -1,2 +1,49 @@
 # Módulo de integrações
+#
+# Os módulos de integração (e dependências pesadas como openai, requests e
+# PIL) só são importados no primeiro uso:
+#
+#     from src import integrations
+#     integrations.create_chatgpt_client(...)   # importa .chatgpt aqui
+#
+# Evite `from src.integrations.x import y` no topo de rotas e modelos, o que
+# carregaria o módulo na inicialização da aplicação.
+import importlib
+import sys
 
+_EXPORTS = {
+    'create_chatgpt_client': 'chatgpt',
+    'test_chatgpt_connection': 'chatgpt',
+    'create_kommo_client': 'kommo_crm',
+    'test_kommo_connection': 'kommo_crm',
+    'create_sdr_processor': 'n8n_workflows',
+    'test_n8n_connection': 'n8n_workflows',
+    'config_snapshot_version': 'n8n_workflows',
+    'get_image_preprocessor': 'image_processing',
+    'get_image_analysis_cache': 'image_cache',
+    # Versões assíncronas (aplicação ASGI)
+    'create_chatgpt_client_async': 'chatgpt',
+    'test_chatgpt_connection_async': 'chatgpt',
+    'create_kommo_client_async': 'kommo_crm',
+    'test_kommo_connection_async': 'kommo_crm',
+    'create_sdr_processor_async': 'n8n_workflows',
+    'test_n8n_connection_async': 'n8n_workflows',
+}
+
+
+def __getattr__(nome):
+    modulo = _EXPORTS.get(nome)
+    if modulo is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {nome!r}")
+    valor = getattr(importlib.import_module(f'{__name__}.{modulo}'), nome)
+    globals()[nome] = valor  # Próximos acessos não passam por __getattr__
+    return valor
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_EXPORTS))
+
+
+def modulos_carregados():
+    """Módulos de integração já importados neste processo"""
+    return sorted(m[len(__name__) + 1:] for m in sys.modules if m.startswith(__name__ + '.'))
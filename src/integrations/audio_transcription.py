@@ -0,0 +1,334 @@
+"""
+Transcrição de áudio em trechos paralelos (divisão por silêncio)
+"""
+import array
+import io
+import math
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+AUDIO_SAMPLE_RATE = 16000
+AUDIO_TARGET_CHUNK_SECONDS = float(os.environ.get('AUDIO_TARGET_CHUNK_SECONDS', 30))
+AUDIO_MAX_CHUNK_SECONDS = float(os.environ.get('AUDIO_MAX_CHUNK_SECONDS', 60))
+AUDIO_TRANSCRIPTION_WORKERS = int(os.environ.get('AUDIO_TRANSCRIPTION_WORKERS', 4))
+
+FRAME_SECONDS = 0.03
+MIN_SILENCE_SECONDS = 0.35
+SILENCE_DBFS = -40.0
+
+
+def _rms(data: bytes, sample_width: int) -> float:
+    """RMS de um bloco PCM (inteiros com sinal de 8/16/32 bits)"""
+    typecode = {1: 'b', 2: 'h', 4: 'i'}.get(sample_width)
+    if typecode is None:
+        raise ValueError(f"Largura de amostra não suportada: {sample_width}")
+    samples = array.array(typecode, data[:len(data) - len(data) % sample_width])
+    if not samples:
+        return 0.0
+    return math.sqrt(sum(s * s for s in samples) / len(samples))
+
+
+def ensure_wav(path: str) -> Tuple[str, bool]:
+    """
+    Garante um arquivo WAV PCM, convertendo com ffmpeg quando necessário
+
+    Args:
+        path: Caminho do áudio (WAV, OGG/Opus, MP3, ...)
+
+    Returns:
+        Caminho do WAV e se ele é temporário (deve ser removido pelo chamador)
+    """
+    with open(path, 'rb') as f:
+        header = f.read(12)
+    if header[:4] == b'RIFF' and header[8:12] == b'WAVE':
+        return path, False
+
+    ffmpeg = shutil.which('ffmpeg')
+    if not ffmpeg:
+        raise RuntimeError('ffmpeg não encontrado para converter o áudio')
+
+    fd, destino = tempfile.mkstemp(prefix='sdria-audio-', suffix='.wav')
+    os.close(fd)
+    resultado = subprocess.run(
+        [ffmpeg, '-nostdin', '-loglevel', 'error', '-y', '-i', path,
+         '-ac', '1', '-ar', str(AUDIO_SAMPLE_RATE), '-f', 'wav', destino],
+        capture_output=True
+    )
+    if resultado.returncode != 0:
+        os.remove(destino)
+        raise RuntimeError(f"Erro ao converter áudio: {resultado.stderr.decode(errors='ignore')[:200]}")
+    return destino, True
+
+
+def find_chunk_boundaries(frame_levels: List[float], frame_seconds: float,
+                          target_seconds: float = AUDIO_TARGET_CHUNK_SECONDS,
+                          max_seconds: float = AUDIO_MAX_CHUNK_SECONDS,
+                          min_silence_seconds: float = MIN_SILENCE_SECONDS,
+                          silence_dbfs: float = SILENCE_DBFS, full_scale: float = 32768.0) -> List[Tuple[int, int]]:
+    """
+    Define os trechos a partir do nível (RMS) de cada quadro
+
+    Cada trecho termina no meio do silêncio mais próximo após `target_seconds`
+    e nunca passa de `max_seconds` (corte forçado se não houver silêncio).
+
+    Args:
+        frame_levels: RMS por quadro
+        frame_seconds: Duração de cada quadro
+        target_seconds: Duração alvo dos trechos
+        max_seconds: Duração máxima dos trechos
+        min_silence_seconds: Duração mínima de um silêncio usado como corte
+        silence_dbfs: Nível abaixo do qual o quadro é silêncio
+        full_scale: Valor de fundo de escala das amostras
+
+    Returns:
+        Lista de (quadro inicial, quadro final) de cada trecho
+    """
+    limiar = full_scale * (10 ** (silence_dbfs / 20))
+    min_silencio = max(1, int(min_silence_seconds / frame_seconds))
+
+    # Pontos de corte candidatos: meio de cada sequência de quadros silenciosos
+    cortes = []
+    inicio_silencio = None
+    for i, nivel in enumerate(frame_levels + [limiar + 1]):
+        if nivel < limiar:
+            if inicio_silencio is None:
+                inicio_silencio = i
+        elif inicio_silencio is not None:
+            if i - inicio_silencio >= min_silencio:
+                cortes.append((inicio_silencio + i) // 2)
+            inicio_silencio = None
+
+    total = len(frame_levels)
+    alvo = int(target_seconds / frame_seconds)
+    maximo = int(max_seconds / frame_seconds)
+    trechos = []
+    inicio = 0
+
+    while total - inicio > maximo:
+        candidatos = [c for c in cortes if inicio + alvo <= c <= inicio + maximo]
+        if not candidatos:
+            # Sem silêncio após o alvo: usa o último antes dele, ou corta no máximo
+            candidatos = [c for c in cortes if inicio < c < inicio + alvo][-1:] or [inicio + maximo]
+        fim = candidatos[0]
+        trechos.append((inicio, fim))
+        inicio = fim
+
+    if inicio < total:
+        trechos.append((inicio, total))
+    return trechos
+
+
+class TranscriptionBackend:
+    """Interface de backend de transcrição"""
+
+    def transcribe(self, wav_file: io.BytesIO, language: Optional[str] = None) -> str:
+        """
+        Transcreve um trecho WAV
+
+        Args:
+            wav_file: Arquivo WAV em memória (com atributo name)
+            language: Idioma (opcional)
+
+        Returns:
+            Texto transcrito
+        """
+        raise NotImplementedError
+
+
+class OpenAIWhisperBackend(TranscriptionBackend):
+    """Transcrição pela API Whisper da OpenAI"""
+
+    def __init__(self, api_key: str, model: str = 'whisper-1'):
+        self.api_key = api_key
+        self.model = model
+
+    def transcribe(self, wav_file, language=None):
+        import openai
+
+        params = {'api_key': self.api_key}
+        if language:
+            params['language'] = language
+        response = openai.Audio.transcribe(self.model, wav_file, **params)
+        return response['text'].strip()
+
+
+class StubTranscriptionBackend(TranscriptionBackend):
+    """Backend local para testes e benchmarks: simula latência proporcional à duração"""
+
+    def __init__(self, seconds_per_audio_second: float = 0.0, fixed_latency: float = 0.0):
+        self.seconds_per_audio_second = seconds_per_audio_second
+        self.fixed_latency = fixed_latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def transcribe(self, wav_file, language=None):
+        wav_file.seek(0)
+        with wave.open(wav_file, 'rb') as w:
+            duracao = w.getnframes() / w.getframerate()
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.fixed_latency + duracao * self.seconds_per_audio_second)
+        return f'[{duracao:.1f}s]'
+
+
+class AudioTranscriber:
+    """Divide o áudio em trechos por silêncio e transcreve os trechos em paralelo"""
+
+    def __init__(self, backend: TranscriptionBackend, max_workers: int = AUDIO_TRANSCRIPTION_WORKERS,
+                 target_chunk_seconds: float = AUDIO_TARGET_CHUNK_SECONDS,
+                 max_chunk_seconds: float = AUDIO_MAX_CHUNK_SECONDS):
+        """
+        Inicializa o transcritor
+
+        Args:
+            backend: Backend de transcrição
+            max_workers: Trechos transcritos simultaneamente
+            target_chunk_seconds: Duração alvo dos trechos
+            max_chunk_seconds: Duração máxima dos trechos
+        """
+        self.backend = backend
+        self.max_workers = max_workers
+        self.target_chunk_seconds = target_chunk_seconds
+        self.max_chunk_seconds = max_chunk_seconds
+
+    def _frame_levels(self, w: wave.Wave_read) -> Tuple[List[float], int]:
+        """Lê o WAV em blocos e calcula o RMS de cada quadro (sem manter o áudio em memória)"""
+        frames_por_quadro = max(1, int(w.getframerate() * FRAME_SECONDS))
+        niveis = []
+        while True:
+            data = w.readframes(frames_por_quadro)
+            if not data:
+                break
+            niveis.append(_rms(data, w.getsampwidth()))
+        return niveis, frames_por_quadro
+
+    def split(self, wav_path: str) -> List[Dict]:
+        """
+        Divide um WAV em trechos WAV em memória
+
+        Args:
+            wav_path: Caminho do WAV
+
+        Returns:
+            Trechos com início, fim (segundos) e arquivo WAV
+        """
+        with wave.open(wav_path, 'rb') as w:
+            niveis, frames_por_quadro = self._frame_levels(w)
+            taxa = w.getframerate()
+            full_scale = float(2 ** (8 * w.getsampwidth() - 1))
+            limites = find_chunk_boundaries(
+                niveis, frames_por_quadro / taxa, self.target_chunk_seconds,
+                self.max_chunk_seconds, full_scale=full_scale
+            )
+
+            trechos = []
+            for indice, (inicio, fim) in enumerate(limites):
+                w.setpos(min(inicio * frames_por_quadro, w.getnframes()))
+                data = w.readframes((fim - inicio) * frames_por_quadro)
+
+                buffer = io.BytesIO()
+                buffer.name = f'trecho-{indice}.wav'
+                with wave.open(buffer, 'wb') as saida:
+                    saida.setnchannels(w.getnchannels())
+                    saida.setsampwidth(w.getsampwidth())
+                    saida.setframerate(taxa)
+                    saida.writeframes(data)
+                buffer.seek(0)
+
+                trechos.append({
+                    'indice': indice,
+                    'inicio': inicio * frames_por_quadro / taxa,
+                    'fim': min(fim * frames_por_quadro, w.getnframes()) / taxa,
+                    'arquivo': buffer
+                })
+            return trechos
+
+    def transcribe_file(self, path: str, language: Optional[str] = None) -> Dict:
+        """
+        Transcreve um arquivo de áudio
+
+        Args:
+            path: Caminho do áudio (WAV ou formato suportado pelo ffmpeg)
+            language: Idioma (opcional)
+
+        Returns:
+            Texto completo, trechos transcritos, duração e tempo gasto
+        """
+        inicio = time.perf_counter()
+        wav_path, temporario = ensure_wav(path)
+        try:
+            trechos = self.split(wav_path)
+        finally:
+            if temporario:
+                os.remove(wav_path)
+
+        def _transcrever(trecho):
+            return self.backend.transcribe(trecho['arquivo'], language)
+
+        # Os resultados de map mantêm a ordem dos trechos
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(trechos)))) as pool:
+            textos = list(pool.map(_transcrever, trechos))
+
+        return {
+            'text': ' '.join(t for t in textos if t),
+            'chunks': [
+                {'inicio': t['inicio'], 'fim': t['fim'], 'texto': texto}
+                for t, texto in zip(trechos, textos)
+            ],
+            'duration': trechos[-1]['fim'] if trechos else 0.0,
+            'elapsed': time.perf_counter() - inicio
+        }
+
+
+def create_transcription_backend(name: Optional[str] = None,
+                                 api_key: Optional[str] = None) -> Optional[TranscriptionBackend]:
+    """
+    Cria o backend configurado em AUDIO_TRANSCRIPTION_BACKEND ('openai' ou 'stub')
+
+    Args:
+        name: Nome do backend (padrão: variável de ambiente)
+        api_key: Chave da API OpenAI (padrão: OPENAI_API_KEY)
+
+    Returns:
+        Backend ou None se a transcrição local estiver desabilitada
+    """
+    name = (name or os.environ.get('AUDIO_TRANSCRIPTION_BACKEND', '')).lower()
+    if name == 'openai':
+        return OpenAIWhisperBackend(api_key or os.environ.get('OPENAI_API_KEY'))
+    if name == 'stub':
+        return StubTranscriptionBackend()
+    return None
+
+
+def benchmark_transcription(wav_path: str, seconds_per_audio_second: float = 0.05,
+                            workers: int = AUDIO_TRANSCRIPTION_WORKERS) -> Dict:
+    """
+    Compara o tempo até a transcrição serial (um trecho) e em trechos paralelos
+    com o backend simulado
+
+    Args:
+        wav_path: Caminho do WAV
+        seconds_per_audio_second: Latência simulada por segundo de áudio
+        workers: Trechos simultâneos no modo paralelo
+
+    Returns:
+        Tempos em segundos e número de trechos
+    """
+    duracao_total = 10 ** 6
+    serial = AudioTranscriber(StubTranscriptionBackend(seconds_per_audio_second), 1,
+                              duracao_total, duracao_total).transcribe_file(wav_path)
+    paralelo = AudioTranscriber(StubTranscriptionBackend(seconds_per_audio_second),
+                                workers).transcribe_file(wav_path)
+    return {
+        'duration': serial['duration'],
+        'serial_seconds': serial['elapsed'],
+        'parallel_seconds': paralelo['elapsed'],
+        'chunks': len(paralelo['chunks'])
+    }
@@ -6,6 +6,35 @@ import json
 from typing import Dict, List, Optional, Any
 from datetime import datetime
 
+DEFAULT_IMAGE_PROMPT = """
+        Analise a seguinte descrição de imagem recebida em uma conversa:
+        
+        {image_description}
+        
+        Forneça uma análise incluindo:
+        1. Tipo de conteúdo identificado
+        2. Relevância para vendas/negócios
+        3. Possíveis ações a serem tomadas
+        4. Classificação de prioridade (alta, média, baixa)
+        
+        Responda em formato JSON estruturado.
+        """
+
+IMAGE_SYSTEM_PROMPT = "Você é um especialista em análise de conteúdo visual para vendas e atendimento."
+
+def image_analysis_prompts(image_description: str, custom_prompt: Optional[str] = None):
+    """
+    Prompt formatado e prompt de sistema da análise de imagem
+    
+    Compartilhado com o pré-processamento do n8n, que consulta o cache de
+    análises com a mesma chave de prompt.
+    
+    Returns:
+        (prompt formatado, prompt de sistema)
+    """
+    prompt = custom_prompt or DEFAULT_IMAGE_PROMPT
+    return prompt.format(image_description=image_description), IMAGE_SYSTEM_PROMPT
+
 class ChatGPTClient:
     """Cliente para integração com ChatGPT/OpenAI"""
     
@@ -21,8 +50,33 @@ class ChatGPTClient:
         self.model = model
         openai.api_key = api_key
     
+    def _build_messages(self, prompt: str, system_prompt: Optional[str] = None,
+                        images: Optional[List[str]] = None) -> List[Dict]:
+        """Monta as mensagens da requisição (prompt do sistema, texto e imagens)"""
+        messages = []
+        
+        if system_prompt:
+            messages.append({
+                "role": "system",
+                "content": system_prompt
+            })
+        
+        content = prompt
+        if images:
+            content = [{"type": "text", "text": prompt}] + [
+                {"type": "image_url", "image_url": {"url": url}} for url in images
+            ]
+        
+        messages.append({
+            "role": "user",
+            "content": content
+        })
+        
+        return messages
+    
     def generate_response(self, prompt: str, system_prompt: Optional[str] = None, 
-                         max_tokens: int = 1000, temperature: float = 0.7) -> Dict:
+                         max_tokens: int = 1000, temperature: float = 0.7,
+                         images: Optional[List[str]] = None) -> Dict:
         """
         Gera uma resposta usando ChatGPT
         
@@ -31,27 +85,15 @@ class ChatGPTClient:
             system_prompt: Prompt do sistema (opcional)
             max_tokens: Número máximo de tokens
             temperature: Temperatura para controlar criatividade
+            images: URLs ou data URLs de imagens enviadas junto ao prompt (opcional)
             
         Returns:
             Resposta do ChatGPT
         """
         try:
-            messages = []
-            
-            if system_prompt:
-                messages.append({
-                    "role": "system",
-                    "content": system_prompt
-                })
-            
-            messages.append({
-                "role": "user",
-                "content": prompt
-            })
-            
             response = openai.ChatCompletion.create(
                 model=self.model,
-                messages=messages,
+                messages=self._build_messages(prompt, system_prompt, images),
                 max_tokens=max_tokens,
                 temperature=temperature
             )
@@ -102,37 +144,48 @@ class ChatGPTClient:
         
         return self.generate_response(formatted_prompt, system_prompt)
     
-    def analyze_image_description(self, image_description: str, custom_prompt: Optional[str] = None) -> Dict:
+    def analyze_image_description(self, image_description: str, custom_prompt: Optional[str] = None,
+                                  image_base64: Optional[str] = None, cliente_id: Optional[int] = None) -> Dict:
         """
         Analisa descrição de imagem
         
         Args:
             image_description: Descrição da imagem
             custom_prompt: Prompt personalizado (opcional)
+            image_base64: Imagem em base64 enviada junto à descrição, reduzida antes do envio (opcional)
+            cliente_id: ID do cliente, para as estatísticas de pré-processamento (opcional)
             
         Returns:
             Análise da imagem
         """
-        default_prompt = """
-        Analise a seguinte descrição de imagem recebida em uma conversa:
+        formatted_prompt, system_prompt = image_analysis_prompts(image_description, custom_prompt)
         
-        {image_description}
+        if not image_base64:
+            return self.generate_response(formatted_prompt, system_prompt)
         
-        Forneça uma análise incluindo:
-        1. Tipo de conteúdo identificado
-        2. Relevância para vendas/negócios
-        3. Possíveis ações a serem tomadas
-        4. Classificação de prioridade (alta, média, baixa)
+        from src.integrations.image_processing import get_image_preprocessor
+        from src.integrations.image_cache import get_image_analysis_cache, prompt_key
         
-        Responda em formato JSON estruturado.
-        """
+        processed, info = get_image_preprocessor().process_base64(cliente_id, image_base64)
         
-        prompt = custom_prompt or default_prompt
-        formatted_prompt = prompt.format(image_description=image_description)
+        # Imagens quase idênticas já analisadas para o cliente, com o mesmo prompt, reutilizam o resultado
+        cache = get_image_analysis_cache() if cliente_id is not None else None
+        image_hash = int(info['dhash'], 16)
+        chave_prompt = prompt_key(formatted_prompt, system_prompt)
+        if cache:
+            cached = cache.get(cliente_id, image_hash, chave_prompt)
+            if cached is not None:
+                return {**cached, 'cache': True}
         
-        system_prompt = "Você é um especialista em análise de conteúdo visual para vendas e atendimento."
+        result = self.generate_response(
+            formatted_prompt, system_prompt,
+            images=[f"data:{info['mime_type']};base64,{processed}"]
+        )
         
-        return self.generate_response(formatted_prompt, system_prompt)
+        if cache and result['success']:
+            cache.put(cliente_id, image_hash, result, chave_prompt)
+        
+        return result
     
     def generate_sales_response(self, context: str, customer_message: str, 
                                custom_prompt: Optional[str] = None) -> Dict:
@@ -235,6 +288,69 @@ class ChatGPTClient:
         return self.generate_response(prompt, system_prompt)
 
 
+class AsyncChatGPTClient(ChatGPTClient):
+    """
+    Cliente ChatGPT assíncrono, usado pela aplicação ASGI
+    
+    generate_response e os métodos de análise retornam corrotinas. A chave é
+    enviada em cada chamada (sem alterar openai.api_key, compartilhado entre
+    as requisições simultâneas).
+    """
+    
+    def __init__(self, api_key: str, model: str = "gpt-3.5-turbo", http=None):
+        """
+        Args:
+            api_key: Chave da API OpenAI
+            model: Modelo a ser usado
+            http: aiohttp.ClientSession compartilhada (opcional)
+        """
+        self.api_key = api_key
+        self.model = model
+        self.http = http
+    
+    async def generate_response(self, prompt: str, system_prompt: Optional[str] = None,
+                                max_tokens: int = 1000, temperature: float = 0.7,
+                                images: Optional[List[str]] = None) -> Dict:
+        try:
+            if self.http is not None:
+                # Reaproveita o pool de conexões da aplicação (contexto da tarefa atual)
+                openai.aiosession.set(self.http)
+            
+            response = await openai.ChatCompletion.acreate(
+                model=self.model,
+                messages=self._build_messages(prompt, system_prompt, images),
+                max_tokens=max_tokens,
+                temperature=temperature,
+                api_key=self.api_key
+            )
+            
+            return {
+                'success': True,
+                'response': response.choices[0].message.content,
+                'usage': response.usage,
+                'model': self.model
+            }
+            
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    async def analyze_image_description(self, image_description: str, custom_prompt: Optional[str] = None,
+                                        image_base64: Optional[str] = None, cliente_id: Optional[int] = None) -> Dict:
+        if not image_base64:
+            return await super().analyze_image_description(image_description, custom_prompt)
+        
+        # Com imagem, o pré-processamento (pool de processos) e o cache de análises
+        # seguem o fluxo síncrono em uma thread
+        import asyncio
+        client = ChatGPTClient(self.api_key, self.model)
+        return await asyncio.get_running_loop().run_in_executor(
+            None, client.analyze_image_description, image_description, custom_prompt, image_base64, cliente_id
+        )
+
+
 def create_chatgpt_client(api_key: str, model: str = "gpt-3.5-turbo") -> ChatGPTClient:
     """
     Cria uma instância do cliente ChatGPT
@@ -286,3 +402,56 @@ def test_chatgpt_connection(api_key: str, model: str = "gpt-3.5-turbo") -> Dict:
             'message': f'Erro ao conectar com ChatGPT: {str(e)}'
         }
 
+
+def create_chatgpt_client_async(http, api_key: str, model: str = "gpt-3.5-turbo") -> AsyncChatGPTClient:
+    """
+    Cria uma instância do cliente ChatGPT assíncrono
+    
+    Args:
+        http: aiohttp.ClientSession compartilhada
+        api_key: Chave da API OpenAI
+        model: Modelo a ser usado
+        
+    Returns:
+        Instância do cliente assíncrono
+    """
+    return AsyncChatGPTClient(api_key, model, http)
+
+
+async def test_chatgpt_connection_async(http, api_key: str, model: str = "gpt-3.5-turbo") -> Dict:
+    """
+    Testa a conexão com ChatGPT sem bloquear o event loop
+    
+    Args:
+        http: aiohttp.ClientSession compartilhada
+        api_key: Chave da API OpenAI
+        model: Modelo a ser usado
+        
+    Returns:
+        Resultado do teste (mesmo formato de test_chatgpt_connection)
+    """
+    try:
+        client = create_chatgpt_client_async(http, api_key, model)
+        response = await client.generate_response(
+            "Responda apenas 'OK' para confirmar que a conexão está funcionando.",
+            max_tokens=10
+        )
+        
+        if response['success']:
+            return {
+                'success': True,
+                'message': 'Conexão com ChatGPT estabelecida com sucesso',
+                'model': model,
+                'response': response['response']
+            }
+        else:
+            return {
+                'success': False,
+                'message': f'Erro ao conectar com ChatGPT: {response["error"]}'
+            }
+            
+    except Exception as e:
+        return {
+            'success': False,
+            'message': f'Erro ao conectar com ChatGPT: {str(e)}'
+        }
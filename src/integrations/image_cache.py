@@ -0,0 +1,167 @@
+"""
+Cache de análises de imagens por hash perceptual (imagens quase duplicadas)
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+IMAGE_CACHE_MAX_DISTANCE = int(os.environ.get('IMAGE_CACHE_MAX_DISTANCE', 6))
+IMAGE_CACHE_PER_CLIENT = int(os.environ.get('IMAGE_CACHE_PER_CLIENT', 256))
+IMAGE_CACHE_MAX_ENTRIES = int(os.environ.get('IMAGE_CACHE_MAX_ENTRIES', 10000))
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Número de bits diferentes entre dois hashes"""
+    return bin(a ^ b).count('1')
+
+
+def prompt_key(*prompts: Optional[str]) -> str:
+    """
+    Chave dos prompts usados na análise (ex: prompt formatado e prompt de sistema)
+
+    A mesma imagem analisada com outro prompt é outra análise; trocar o
+    prompt_imagem do cliente faz as entradas antigas deixarem de ser usadas.
+    """
+    digest = hashlib.sha1()
+    for prompt in prompts:
+        digest.update((prompt or '').encode('utf-8'))
+        digest.update(b'\x00')
+    return digest.hexdigest()[:16]
+
+
+class ImageAnalysisCache:
+    """
+    Índice de hashes perceptuais por cliente com despejo LRU
+
+    A busca percorre apenas as entradas do cliente (limitadas por
+    IMAGE_CACHE_PER_CLIENT), então o custo é constante por consulta. Cada
+    entrada é da imagem analisada com um prompt (prompt_key); imagens
+    parecidas só reaproveitam análises feitas com o mesmo prompt.
+    """
+
+    def __init__(self, max_distance: int = IMAGE_CACHE_MAX_DISTANCE,
+                 per_client: int = IMAGE_CACHE_PER_CLIENT, max_entries: int = IMAGE_CACHE_MAX_ENTRIES):
+        """
+        Inicializa o cache
+
+        Args:
+            max_distance: Distância de Hamming máxima para considerar duas imagens iguais
+            per_client: Máximo de análises guardadas por cliente
+            max_entries: Máximo de análises guardadas no total
+        """
+        self.max_distance = max_distance
+        self.per_client = per_client
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # Ordem global de uso (cliente_id, (prompt, hash)) -> None, para o despejo LRU entre clientes
+        self._lru: 'OrderedDict[Tuple[int, Tuple[str, int]], None]' = OrderedDict()
+        self._entries: Dict[int, 'OrderedDict[Tuple[str, int], Dict]'] = {}
+        self._metrics: Dict[int, Dict[str, int]] = {}
+
+    def _metric(self, cliente_id: int, nome: str):
+        metrics = self._metrics.setdefault(cliente_id, {'hits': 0, 'misses': 0, 'evictions': 0})
+        metrics[nome] += 1
+
+    def get(self, cliente_id: int, image_hash: int, prompt: str = '') -> Optional[Dict]:
+        """
+        Procura uma análise de imagem quase idêntica feita com o mesmo prompt
+
+        Args:
+            cliente_id: ID do cliente
+            image_hash: Hash perceptual da imagem
+            prompt: Chave dos prompts da análise (prompt_key)
+
+        Returns:
+            Análise armazenada ou None
+        """
+        with self._lock:
+            entradas = self._entries.get(cliente_id) or {}
+            melhor, melhor_distancia = None, self.max_distance + 1
+            for chave in entradas:
+                if chave[0] != prompt:
+                    continue
+                distancia = hamming_distance(chave[1], image_hash)
+                if distancia < melhor_distancia:
+                    melhor, melhor_distancia = chave, distancia
+                    if distancia == 0:
+                        break
+
+            if melhor is None:
+                self._metric(cliente_id, 'misses')
+                return None
+
+            entradas.move_to_end(melhor)
+            self._lru.move_to_end((cliente_id, melhor))
+            self._metric(cliente_id, 'hits')
+            return entradas[melhor]
+
+    def put(self, cliente_id: int, image_hash: int, analysis: Dict, prompt: str = ''):
+        """
+        Armazena a análise de uma imagem
+
+        Args:
+            cliente_id: ID do cliente
+            image_hash: Hash perceptual da imagem
+            analysis: Resultado da análise
+            prompt: Chave dos prompts da análise (prompt_key)
+        """
+        chave = (prompt, image_hash)
+        with self._lock:
+            entradas = self._entries.setdefault(cliente_id, OrderedDict())
+            entradas[chave] = analysis
+            entradas.move_to_end(chave)
+            self._lru[(cliente_id, chave)] = None
+            self._lru.move_to_end((cliente_id, chave))
+
+            if len(entradas) > self.per_client:
+                antigo, _ = entradas.popitem(last=False)
+                del self._lru[(cliente_id, antigo)]
+                self._metric(cliente_id, 'evictions')
+
+            while len(self._lru) > self.max_entries:
+                (cid, antigo), _ = self._lru.popitem(last=False)
+                del self._entries[cid][antigo]
+                if not self._entries[cid]:
+                    del self._entries[cid]
+                self._metric(cid, 'evictions')
+
+    def get_metrics(self, cliente_id: Optional[int] = None) -> Dict:
+        """
+        Retorna métricas de análises evitadas
+
+        Args:
+            cliente_id: ID do cliente (opcional; sem ele, retorna o total)
+
+        Returns:
+            Hits (análises evitadas), misses, despejos e entradas armazenadas
+        """
+        with self._lock:
+            if cliente_id is not None:
+                metrics = dict(self._metrics.get(cliente_id, {'hits': 0, 'misses': 0, 'evictions': 0}))
+                metrics['entradas'] = len(self._entries.get(cliente_id) or {})
+            else:
+                metrics = {'hits': 0, 'misses': 0, 'evictions': 0}
+                for m in self._metrics.values():
+                    for chave in metrics:
+                        metrics[chave] += m[chave]
+                metrics['entradas'] = len(self._lru)
+            metrics['analises_evitadas'] = metrics['hits']
+            return metrics
+
+
+_cache = None
+
+
+def get_image_analysis_cache() -> ImageAnalysisCache:
+    """
+    Retorna o cache compartilhado do processo
+
+    Returns:
+        Instância de ImageAnalysisCache
+    """
+    global _cache
+    if _cache is None:
+        _cache = ImageAnalysisCache()
+    return _cache
@@ -0,0 +1,261 @@
+"""
+Pré-processamento de imagens (Pillow) antes da análise por LLM
+"""
+import base64
+import io
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+IMAGE_MAX_SIDE = int(os.environ.get('IMAGE_MAX_SIDE', 1568))
+IMAGE_FORMAT = os.environ.get('IMAGE_FORMAT', 'JPEG').upper()
+IMAGE_TARGET_BYTES = int(os.environ.get('IMAGE_TARGET_BYTES', 300 * 1024))
+IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', 2))
+IMAGE_TIMEOUT = int(os.environ.get('IMAGE_TIMEOUT', 30))
+
+MIME_TYPES = {'JPEG': 'image/jpeg', 'WEBP': 'image/webp'}
+
+
+def dhash(img: Image.Image, hash_size: int = 8) -> int:
+    """
+    Calcula o hash perceptual por diferença (dHash) de uma imagem
+
+    Args:
+        img: Imagem já decodificada
+        hash_size: Lado do hash (8 => 64 bits)
+
+    Returns:
+        Hash como inteiro
+    """
+    pequena = img.convert('L').resize((hash_size + 1, hash_size), Image.LANCZOS)
+    pixels = list(pequena.getdata())
+    valor = 0
+    for linha in range(hash_size):
+        inicio = linha * (hash_size + 1)
+        for coluna in range(hash_size):
+            valor = (valor << 1) | (pixels[inicio + coluna] > pixels[inicio + coluna + 1])
+    return valor
+
+
+def preprocess_image_bytes(data: bytes, max_side: int = IMAGE_MAX_SIDE, fmt: str = IMAGE_FORMAT,
+                           target_bytes: int = IMAGE_TARGET_BYTES, quality: int = 85,
+                           min_quality: int = 40) -> Tuple[bytes, Dict]:
+    """
+    Decodifica, remove EXIF, reduz e re-codifica uma imagem
+
+    Executada nos processos do pool: precisa ser uma função de módulo (picklable).
+
+    Args:
+        data: Bytes da imagem original
+        max_side: Maior lado permitido em pixels
+        fmt: Formato de saída (JPEG ou WEBP)
+        target_bytes: Tamanho alvo; a qualidade é reduzida até atingi-lo
+        quality: Qualidade inicial
+        min_quality: Qualidade mínima
+
+    Returns:
+        Bytes re-codificados e informações do processamento
+    """
+    fmt = fmt.upper()
+    if fmt not in MIME_TYPES:
+        raise ValueError(f"Formato de imagem não suportado: {fmt}")
+
+    with Image.open(io.BytesIO(data)) as img:
+        original_size = img.size
+        original_format = img.format
+        # Aplica a orientação do EXIF antes de descartá-lo
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+
+        # Hash perceptual calculado na ingestão, antes da redução
+        image_hash = dhash(img)
+        img.thumbnail((max_side, max_side), Image.LANCZOS)
+
+        while True:
+            buffer = io.BytesIO()
+            # Sem o parâmetro exif, os metadados não são gravados
+            img.save(buffer, format=fmt, quality=quality, optimize=True)
+            if buffer.tell() <= target_bytes or quality <= min_quality:
+                break
+            quality = max(min_quality, quality - 10)
+
+        output = buffer.getvalue()
+        return output, {
+            'original_size': original_size,
+            'original_format': original_format,
+            'size': img.size,
+            'format': fmt,
+            'mime_type': MIME_TYPES[fmt],
+            'quality': quality,
+            'bytes_in': len(data),
+            'bytes_out': len(output),
+            'dhash': f'{image_hash:016x}'
+        }
+
+
+def preprocess_image_file(path: str, max_side: int = IMAGE_MAX_SIDE, fmt: str = IMAGE_FORMAT,
+                          target_bytes: int = IMAGE_TARGET_BYTES) -> Tuple[bytes, Dict]:
+    """
+    Pré-processa uma imagem gravada em disco, lendo-a no próprio processo do pool
+
+    Args:
+        path: Caminho do arquivo
+        max_side: Maior lado permitido em pixels
+        fmt: Formato de saída (JPEG ou WEBP)
+        target_bytes: Tamanho alvo
+
+    Returns:
+        Bytes re-codificados e informações do processamento
+    """
+    with open(path, 'rb') as f:
+        return preprocess_image_bytes(f.read(), max_side, fmt, target_bytes)
+
+
+class ImagePreprocessor:
+    """Executa o pré-processamento em um pool de processos e contabiliza bytes economizados por cliente"""
+
+    def __init__(self, workers: int = IMAGE_WORKERS, max_side: int = IMAGE_MAX_SIDE,
+                 fmt: str = IMAGE_FORMAT, target_bytes: int = IMAGE_TARGET_BYTES):
+        """
+        Inicializa o pré-processador
+
+        Args:
+            workers: Número de processos do pool
+            max_side: Maior lado permitido em pixels
+            fmt: Formato de saída (JPEG ou WEBP)
+            target_bytes: Tamanho alvo da imagem re-codificada
+        """
+        self.workers = workers
+        self.max_side = max_side
+        self.fmt = fmt
+        self.target_bytes = target_bytes
+        self._pool = None
+        self._pool_pid = None
+        self._lock = threading.Lock()
+        self._stats: Dict[int, Dict[str, int]] = {}
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        # Cria o pool sob demanda e recria após fork (ex: workers do gunicorn)
+        with self._lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def process(self, cliente_id: int, data: bytes) -> Tuple[bytes, Dict]:
+        """
+        Pré-processa uma imagem fora do worker web
+
+        Args:
+            cliente_id: ID do cliente (para as estatísticas)
+            data: Bytes da imagem original
+
+        Returns:
+            Bytes processados e informações do processamento. Se a imagem
+            processada não ficar menor, a original é mantida.
+        """
+        future = self._get_pool().submit(preprocess_image_bytes, data, self.max_side,
+                                         self.fmt, self.target_bytes)
+        output, info = future.result(timeout=IMAGE_TIMEOUT)
+
+        if len(output) >= len(data):
+            output = self._keep_original(info, data)
+
+        self._record(cliente_id, info['bytes_in'], info['bytes_out'])
+        return output, info
+
+    def process_file(self, cliente_id: int, path: str) -> Tuple[bytes, Dict]:
+        """
+        Pré-processa uma imagem em disco sem lê-la no worker web
+
+        Args:
+            cliente_id: ID do cliente (para as estatísticas)
+            path: Caminho do arquivo
+
+        Returns:
+            Bytes processados e informações do processamento. Se a imagem
+            processada não ficar menor, a original é mantida (lida só nesse caso).
+        """
+        future = self._get_pool().submit(preprocess_image_file, path, self.max_side,
+                                         self.fmt, self.target_bytes)
+        output, info = future.result(timeout=IMAGE_TIMEOUT)
+
+        if info['bytes_out'] >= info['bytes_in']:
+            with open(path, 'rb') as f:
+                output = self._keep_original(info, f.read())
+
+        self._record(cliente_id, info['bytes_in'], info['bytes_out'])
+        return output, info
+
+    @staticmethod
+    def _keep_original(info: Dict, data: bytes) -> bytes:
+        # A original segue no seu formato: as informações descrevem os bytes enviados
+        info.update({
+            'bytes_out': len(data),
+            'mantida_original': True,
+            'size': info['original_size'],
+            'format': info['original_format'],
+            'mime_type': Image.MIME.get(info['original_format'], 'application/octet-stream'),
+        })
+        return data
+
+    def process_base64(self, cliente_id: int, encoded: str) -> Tuple[str, Dict]:
+        """
+        Pré-processa uma imagem em base64 (aceita data URLs)
+
+        Args:
+            cliente_id: ID do cliente
+            encoded: Imagem em base64 ou data URL
+
+        Returns:
+            Imagem processada em base64 e informações do processamento
+        """
+        if encoded.startswith('data:'):
+            encoded = encoded.split(',', 1)[1]
+        output, info = self.process(cliente_id, base64.b64decode(encoded))
+        return base64.b64encode(output).decode('ascii'), info
+
+    def _record(self, cliente_id: int, bytes_in: int, bytes_out: int):
+        with self._lock:
+            stats = self._stats.setdefault(cliente_id, {'imagens': 0, 'bytes_entrada': 0, 'bytes_saida': 0})
+            stats['imagens'] += 1
+            stats['bytes_entrada'] += bytes_in
+            stats['bytes_saida'] += bytes_out
+
+    def get_stats(self, cliente_id: Optional[int] = None) -> Dict:
+        """
+        Retorna as estatísticas de bytes economizados
+
+        Args:
+            cliente_id: ID do cliente (opcional; sem ele, retorna todos)
+
+        Returns:
+            Estatísticas por cliente
+        """
+        with self._lock:
+            if cliente_id is not None:
+                stats = dict(self._stats.get(cliente_id, {'imagens': 0, 'bytes_entrada': 0, 'bytes_saida': 0}))
+                stats['bytes_economizados'] = stats['bytes_entrada'] - stats['bytes_saida']
+                return stats
+            return {cid: {**s, 'bytes_economizados': s['bytes_entrada'] - s['bytes_saida']}
+                    for cid, s in self._stats.items()}
+
+
+_preprocessor = None
+
+
+def get_image_preprocessor() -> ImagePreprocessor:
+    """
+    Retorna o pré-processador compartilhado do processo
+
+    Returns:
+        Instância de ImagePreprocessor
+    """
+    global _preprocessor
+    if _preprocessor is None:
+        _preprocessor = ImagePreprocessor()
+    return _preprocessor
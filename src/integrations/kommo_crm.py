@@ -256,6 +256,48 @@ class KommoCRM:
         return self._make_request('GET', f'{entity_type}/custom_fields')
 
 
+class AsyncKommoCRM(KommoCRM):
+    """
+    Cliente Kommo CRM assíncrono (aiohttp), usado pela aplicação ASGI
+    
+    Os mesmos métodos do KommoCRM, mas retornando corrotinas
+    (ex: `await client.get_pipelines()`).
+    """
+    
+    def __init__(self, domain: str, access_token: str, http):
+        """
+        Args:
+            domain: Domínio do Kommo
+            access_token: Token de acesso da API
+            http: aiohttp.ClientSession compartilhada
+        """
+        super().__init__(domain, access_token)
+        self.http = http
+    
+    async def _make_request(self, method: str, endpoint: str, data: Optional[Dict] = None) -> Dict:
+        import aiohttp
+        
+        url = f"{self.base_url}/{endpoint}"
+        method = method.upper()
+        
+        if method == 'GET':
+            kwargs = {'params': data}
+        elif method in ('POST', 'PATCH'):
+            kwargs = {'json': data}
+        elif method == 'DELETE':
+            kwargs = {}
+        else:
+            raise ValueError(f"Método HTTP não suportado: {method}")
+        
+        try:
+            async with self.http.request(method, url, headers=self.headers, **kwargs) as response:
+                response.raise_for_status()
+                content = await response.read()
+                return json.loads(content) if content else {}
+        except aiohttp.ClientError as e:
+            raise Exception(f"Erro na requisição para Kommo CRM: {str(e)}")
+
+
 def create_kommo_client(domain: str, access_token: str) -> KommoCRM:
     """
     Cria uma instância do cliente Kommo CRM
@@ -298,3 +340,47 @@ def test_kommo_connection(domain: str, access_token: str) -> Dict:
             'message': f'Erro ao conectar com Kommo CRM: {str(e)}'
         }
 
+
+def create_kommo_client_async(http, domain: str, access_token: str) -> AsyncKommoCRM:
+    """
+    Cria uma instância do cliente Kommo CRM assíncrono
+    
+    Args:
+        http: aiohttp.ClientSession compartilhada
+        domain: Domínio do Kommo
+        access_token: Token de acesso
+        
+    Returns:
+        Instância do cliente assíncrono
+    """
+    return AsyncKommoCRM(domain, access_token, http)
+
+
+async def test_kommo_connection_async(http, domain: str, access_token: str) -> Dict:
+    """
+    Testa a conexão com o Kommo CRM sem bloquear o event loop
+    
+    Args:
+        http: aiohttp.ClientSession compartilhada
+        domain: Domínio do Kommo
+        access_token: Token de acesso
+        
+    Returns:
+        Resultado do teste (mesmo formato de test_kommo_connection)
+    """
+    try:
+        client = create_kommo_client_async(http, domain, access_token)
+        account_info = await client.get_account_info()
+        
+        return {
+            'success': True,
+            'message': 'Conexão com Kommo CRM estabelecida com sucesso',
+            'account_name': account_info.get('name', 'N/A'),
+            'account_id': account_info.get('id', 'N/A')
+        }
+        
+    except Exception as e:
+        return {
+            'success': False,
+            'message': f'Erro ao conectar com Kommo CRM: {str(e)}'
+        }
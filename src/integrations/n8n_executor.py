@@ -0,0 +1,722 @@
+"""
+Executor local dos workflows n8n empacotados (DAG paralelo)
+"""
+import json
+import os
+import re
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Any, Tuple
+
+import requests
+
+WORKFLOWS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'n8n-workflows')
+
+BUNDLED_WORKFLOWS = {
+    'sdr-webhook': os.path.join(WORKFLOWS_DIR, 'SDRWHATSAPPIA_DINAMICO.json'),
+    'muda-etapa-webhook': os.path.join(WORKFLOWS_DIR, 'MUDAETAPAIATAG_DINAMICO.json'),
+}
+
+
+class WorkflowExecutionError(Exception):
+    """Erro ao carregar ou executar um workflow localmente"""
+
+
+class WorkflowNode:
+    """Nó de um workflow n8n"""
+
+    def __init__(self, name: str, node_type: str, parameters: Dict):
+        self.name = name
+        self.type = node_type
+        self.parameters = parameters or {}
+
+    @property
+    def short_type(self) -> str:
+        """Tipo do nó sem o prefixo do pacote (ex: httpRequest)"""
+        return self.type.rsplit('.', 1)[-1]
+
+    def __repr__(self):
+        return f'<WorkflowNode {self.name} ({self.short_type})>'
+
+
+class WorkflowGraph:
+    """Grafo acíclico (DAG) construído a partir do JSON exportado pelo n8n"""
+
+    def __init__(self, name: str, nodes: Dict[str, WorkflowNode], edges: List[Tuple[str, int, str]]):
+        """
+        Inicializa o grafo
+
+        Args:
+            name: Nome do workflow
+            nodes: Nós indexados pelo nome
+            edges: Arestas (origem, índice de saída, destino)
+        """
+        self.name = name
+        self.nodes = nodes
+        self.edges = edges
+
+        self.outgoing: Dict[str, List[Tuple[int, str]]] = {nome: [] for nome in nodes}
+        self.incoming: Dict[str, List[str]] = {nome: [] for nome in nodes}
+
+        for origem, saida, destino in edges:
+            if origem not in nodes or destino not in nodes:
+                raise WorkflowExecutionError(f"Conexão com nó inexistente: {origem} -> {destino}")
+            self.outgoing[origem].append((saida, destino))
+            self.incoming[destino].append(origem)
+
+        self.order = self._topological_order()
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'WorkflowGraph':
+        """
+        Cria o grafo a partir do dicionário exportado pelo n8n
+
+        Args:
+            data: Conteúdo do arquivo de workflow
+
+        Returns:
+            Grafo do workflow
+        """
+        nodes = {}
+        for node in data.get('nodes', []):
+            nodes[node['name']] = WorkflowNode(node['name'], node['type'], node.get('parameters'))
+
+        edges = []
+        for origem, conexoes in (data.get('connections') or {}).items():
+            for saida, destinos in enumerate(conexoes.get('main', [])):
+                for destino in destinos or []:
+                    edges.append((origem, saida, destino['node']))
+
+        return cls(data.get('name', ''), nodes, edges)
+
+    @property
+    def roots(self) -> List[str]:
+        """Nós sem predecessores (gatilhos)"""
+        return [nome for nome in self.order if not self.incoming[nome]]
+
+    def _topological_order(self) -> List[str]:
+        """Ordenação topológica (Kahn); falha se houver ciclo"""
+        grau = {nome: len(set(origens)) for nome, origens in self.incoming.items()}
+        fila = [nome for nome in self.nodes if grau[nome] == 0]
+        ordem = []
+
+        while fila:
+            atual = fila.pop(0)
+            ordem.append(atual)
+            for destino in dict.fromkeys(d for _, d in self.outgoing[atual]):
+                grau[destino] -= 1
+                if grau[destino] == 0:
+                    fila.append(destino)
+
+        if len(ordem) != len(self.nodes):
+            raise WorkflowExecutionError(f"Workflow '{self.name}' contém ciclo")
+        return ordem
+
+
+def load_workflow(path_or_name: str) -> WorkflowGraph:
+    """
+    Carrega um workflow a partir de um arquivo JSON ou do nome do webhook empacotado
+
+    Args:
+        path_or_name: Caminho do arquivo ou chave de BUNDLED_WORKFLOWS
+
+    Returns:
+        Grafo do workflow
+    """
+    path = BUNDLED_WORKFLOWS.get(path_or_name, path_or_name)
+    with open(path, encoding='utf-8') as f:
+        return WorkflowGraph.from_dict(json.load(f))
+
+
+# ---------------------------------------------------------------------------
+# Expressões n8n ({{ ... }})
+# ---------------------------------------------------------------------------
+
+_TEMPLATE_RE = re.compile(r'\{\{(.*?)\}\}', re.S)
+_NODE_REF_RE = re.compile(r"""^\$\(\s*(['"])(.+?)\1\s*\)\.item\.json((?:\.[\w$]+)*)$""")
+_JSON_REF_RE = re.compile(r'^\$json((?:\.[\w$]+)*)$')
+_STRINGIFY_RE = re.compile(r'^JSON\.stringify\((.*)\)$', re.S)
+
+
+def _split_top_level(expr: str, operator: str) -> List[str]:
+    """Divide a expressão pelo operador, ignorando strings e parênteses"""
+    partes, atual, profundidade, aspas = [], [], 0, None
+    i = 0
+    while i < len(expr):
+        c = expr[i]
+        if aspas:
+            if c == aspas:
+                aspas = None
+        elif c in ('"', "'", '`'):
+            aspas = c
+        elif c == '(':
+            profundidade += 1
+        elif c == ')':
+            profundidade -= 1
+        elif profundidade == 0 and expr.startswith(operator, i):
+            partes.append(''.join(atual))
+            atual = []
+            i += len(operator)
+            continue
+        atual.append(c)
+        i += 1
+    partes.append(''.join(atual))
+    return [p.strip() for p in partes]
+
+
+def _get_path(data: Any, path: str) -> Any:
+    """Percorre um caminho '.a.b.c' em dicionários, retornando None se ausente"""
+    for chave in [p for p in path.split('.') if p]:
+        if not isinstance(data, dict):
+            return None
+        data = data.get(chave)
+    return data
+
+
+@lru_cache(maxsize=512)
+def _compile_operand(operand: str) -> Callable[[Dict], Any]:
+    """Compila um operando simples em uma função do contexto"""
+    if len(operand) >= 2 and operand[0] == operand[-1] and operand[0] in ('"', "'"):
+        literal = operand[1:-1]
+        return lambda ctx: literal
+    if operand in ('true', 'false'):
+        valor = operand == 'true'
+        return lambda ctx: valor
+    if operand in ('null', 'undefined'):
+        return lambda ctx: None
+    if re.fullmatch(r'-?\d+(\.\d+)?', operand):
+        numero = float(operand) if '.' in operand else int(operand)
+        return lambda ctx: numero
+    if operand == 'new Date().toISOString()':
+        return lambda ctx: datetime.utcnow().isoformat(timespec='milliseconds') + 'Z'
+
+    match = _JSON_REF_RE.match(operand)
+    if match:
+        path = match.group(1)
+        return lambda ctx: _get_path(ctx['json'], path)
+
+    match = _NODE_REF_RE.match(operand)
+    if match:
+        nome, path = match.group(2), match.group(3)
+
+        def _node_ref(ctx):
+            if nome not in ctx['nodes']:
+                raise WorkflowExecutionError(f"Nó '{nome}' referenciado antes de ser executado")
+            return _get_path(ctx['nodes'][nome], path)
+        return _node_ref
+
+    match = _STRINGIFY_RE.match(operand)
+    if match:
+        interno = _compile_expression(match.group(1).strip())
+        return lambda ctx: json.dumps(interno(ctx), ensure_ascii=False, default=str)
+
+    raise WorkflowExecutionError(f"Expressão não suportada: {operand}")
+
+
+@lru_cache(maxsize=512)
+def _compile_expression(expr: str) -> Callable[[Dict], Any]:
+    """Compila uma expressão com || e && (semântica de JavaScript)"""
+    alternativas = []
+    for parte in _split_top_level(expr, '||'):
+        alternativas.append([_compile_operand(op) for op in _split_top_level(parte, '&&')])
+
+    def _evaluate(ctx):
+        valor = None
+        for conjuncao in alternativas:
+            for operando in conjuncao:
+                valor = operando(ctx)
+                if not valor:
+                    break
+            if valor:
+                return valor
+        return valor
+    return _evaluate
+
+
+def resolve_value(value: Any, ctx: Dict) -> Any:
+    """
+    Resolve parâmetros de nó, avaliando expressões '={{ ... }}' recursivamente
+
+    Args:
+        value: Valor do parâmetro (string, lista ou dicionário)
+        ctx: Contexto com 'json' (entrada do nó) e 'nodes' (saídas já calculadas)
+
+    Returns:
+        Valor com as expressões avaliadas
+    """
+    if isinstance(value, dict):
+        return {k: resolve_value(v, ctx) for k, v in value.items()}
+    if isinstance(value, list):
+        return [resolve_value(v, ctx) for v in value]
+    if not isinstance(value, str) or not value.startswith('='):
+        return value
+
+    template = value[1:]
+    match = _TEMPLATE_RE.fullmatch(template.strip())
+    if match:
+        # Expressão única preserva o tipo do resultado
+        return _compile_expression(match.group(1).strip())(ctx)
+
+    def _substituir(m):
+        resultado = _compile_expression(m.group(1).strip())(ctx)
+        return '' if resultado is None else str(resultado)
+    return _TEMPLATE_RE.sub(_substituir, template)
+
+
+# ---------------------------------------------------------------------------
+# Serviços externos (reais ou stubs)
+# ---------------------------------------------------------------------------
+
+class WorkflowServices:
+    """Serviços externos usados pelos nós (HTTP e OpenAI)"""
+
+    def __init__(self, openai_api_key: Optional[str] = None, timeout: int = 30):
+        self.openai_api_key = openai_api_key or os.environ.get('OPENAI_API_KEY')
+        self.timeout = timeout
+        self._local = threading.local()
+        # Equivalente ao $getWorkflowStaticData('global') do n8n: mantido entre execuções
+        self.static_data: Dict = {}
+
+    def _session(self) -> requests.Session:
+        # requests.Session não é thread-safe: uma por thread do executor
+        if not hasattr(self._local, 'session'):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def http_request(self, method: str, url: str, params: Optional[Dict] = None,
+                     body: Optional[Dict] = None, headers: Optional[Dict] = None) -> Dict:
+        """Executa uma requisição HTTP e retorna o JSON da resposta"""
+        response = self._session().request(method, url, params=params, json=body,
+                                           headers=headers, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json() if response.content else {}
+
+    def chat_completion(self, model: str, messages: List[Dict], options: Dict) -> Dict:
+        """Gera uma resposta de chat via OpenAI"""
+        from src.integrations.chatgpt import ChatGPTClient
+
+        client = ChatGPTClient(self.openai_api_key, model)
+        system = next((m['content'] for m in messages if m.get('role') == 'system'), None)
+        user = next((m['content'] for m in messages if m.get('role') == 'user'), '')
+        result = client.generate_response(
+            user if isinstance(user, str) else json.dumps(user),
+            system_prompt=system,
+            max_tokens=options.get('maxTokens', 1000),
+            temperature=options.get('temperature', 0.7)
+        )
+        if not result['success']:
+            raise WorkflowExecutionError(result['error'])
+        return {'response': result['response'], 'model': model}
+
+    def transcribe(self, model: str, item: Dict) -> Dict:
+        """Transcreve o áudio recebido no item"""
+        raise WorkflowExecutionError('Transcrição de áudio não configurada para execução local')
+
+
+class StubWorkflowServices(WorkflowServices):
+    """Serviços simulados para testes locais e benchmarks, com latência configurável"""
+
+    def __init__(self, latency: float = 0.0, config_response: Optional[Dict] = None,
+                 ai_response: str = 'Olá! Como posso ajudar?'):
+        super().__init__()
+        self.latency = latency
+        self.config_response = config_response or {
+            'cliente_id': 1,
+            'configuracoes': {
+                'kommo_domain': 'https://stub.kommo.com',
+                'kommo_token': 'stub-token',
+                'chatgpt_model': 'gpt-4o-mini',
+                'pipeline_id': '1',
+                'funil_ids': [],
+                'prompt_agente_ia': None,
+                'prompt_audio': None,
+                'prompt_imagem': None,
+                'usar_n8n': True
+            },
+            'tags_permitidas': ['transfere_vendedor', 'transfere_suporte', 'transfere_ligacao']
+        }
+        self.ai_response = ai_response
+        self.calls: List[Tuple[str, str]] = []
+        self._lock = threading.Lock()
+
+    def _registrar(self, tipo: str, alvo: str):
+        with self._lock:
+            self.calls.append((tipo, alvo))
+        if self.latency:
+            time.sleep(self.latency)
+
+    def http_request(self, method, url, params=None, body=None, headers=None):
+        self._registrar('http', f'{method} {url}')
+        if '/api/webhook/sdr' in (url or ''):
+            from src.integrations.n8n_workflows import config_snapshot_version
+
+            versao = config_snapshot_version({
+                'configuracoes': self.config_response['configuracoes'],
+                'tags_permitidas': self.config_response['tags_permitidas']
+            })
+            # Assim como o endpoint real: só 'inalterada' para a versão conhecida,
+            # senão o snapshot e os dados recebidos ecoados em 'webhook_data'
+            if (params or {}).get('configVersion') == versao:
+                return {'cliente_id': self.config_response['cliente_id'], 'config_version': versao,
+                        'config_inalterada': True}
+            resposta = dict(self.config_response, config_version=versao, config_inalterada=False)
+            try:
+                enviado = json.loads((body or {}).get('webhook_data') or '{}')
+            except (TypeError, ValueError):
+                enviado = {}
+            resposta['webhook_data'] = enviado.get('webhook_data', enviado)
+            return resposta
+        if '/api/v4/leads' in (url or '') and method == 'GET':
+            return {'_embedded': {'leads': [{'id': 1}]}}
+        return {'success': True}
+
+    def chat_completion(self, model, messages, options):
+        self._registrar('chat', model)
+        return {'response': self.ai_response, 'model': model}
+
+    def transcribe(self, model, item):
+        self._registrar('transcribe', model)
+        return {'text': 'transcrição simulada'}
+
+
+# ---------------------------------------------------------------------------
+# Implementações dos tipos de nó
+# ---------------------------------------------------------------------------
+
+def _node_webhook(node: WorkflowNode, ctx: Dict, services: WorkflowServices) -> Dict[int, Dict]:
+    return {0: ctx['json']}
+
+
+def _node_http_request(node: WorkflowNode, ctx: Dict, services: WorkflowServices) -> Dict[int, Dict]:
+    params = resolve_value(node.parameters, ctx)
+
+    def _pares(chave):
+        return {p['name']: p.get('value') for p in (params.get(chave) or {}).get('parameters', [])}
+
+    query = _pares('queryParameters') if params.get('sendQuery') else None
+    body = _pares('bodyParameters') if params.get('sendBody') else None
+    headers = _pares('headerParameters') if params.get('sendHeaders') else None
+    method = params.get('method') or params.get('httpMethod') or ('POST' if body is not None else 'GET')
+
+    return {0: services.http_request(method.upper(), params.get('url'), query, body, headers)}
+
+
+def _avaliar_condicao(condicao: Dict, ctx: Dict, case_sensitive: bool) -> bool:
+    esquerda = resolve_value(condicao.get('leftValue'), ctx)
+    direita = resolve_value(condicao.get('rightValue'), ctx)
+    operacao = (condicao.get('operator') or {}).get('operation', 'equal')
+
+    if isinstance(esquerda, str) and isinstance(direita, str) and not case_sensitive:
+        esquerda, direita = esquerda.lower(), direita.lower()
+
+    if operacao == 'equal':
+        return esquerda == direita
+    if operacao == 'notEqual':
+        return esquerda != direita
+    if operacao == 'contains':
+        return isinstance(esquerda, str) and str(direita) in esquerda
+    if operacao == 'notContains':
+        return not (isinstance(esquerda, str) and str(direita) in esquerda)
+    if operacao == 'exists':
+        return esquerda is not None
+    if operacao == 'true':
+        return esquerda is True
+    if operacao == 'false':
+        return esquerda is False
+    raise WorkflowExecutionError(f"Operador de condição não suportado: {operacao}")
+
+
+def _node_if(node: WorkflowNode, ctx: Dict, services: WorkflowServices) -> Dict[int, Dict]:
+    bloco = node.parameters.get('conditions') or {}
+    case_sensitive = (bloco.get('options') or {}).get('caseSensitive', True)
+    resultados = [_avaliar_condicao(c, ctx, case_sensitive) for c in bloco.get('conditions', [])]
+    aprovado = any(resultados) if bloco.get('combinator') == 'or' else all(resultados)
+    return {0 if aprovado else 1: ctx['json']}
+
+
+def _node_openai(node: WorkflowNode, ctx: Dict, services: WorkflowServices) -> Dict[int, Dict]:
+    params = resolve_value(node.parameters, ctx)
+    model = params.get('model')
+    messages = (params.get('messages') or {}).get('messageValues')
+    if not messages:
+        return {0: services.transcribe(model, ctx['json'])}
+    return {0: services.chat_completion(model, messages, params.get('options') or {})}
+
+
+def _payload_gatilho(ctx: Dict) -> Dict:
+    return ctx['nodes'].get('Webhook Inicial') or ctx['nodes'].get('Webhook Muda Etapa') or {}
+
+
+def _code_config_em_cache(ctx: Dict) -> Dict:
+    """Port em Python do nó 'Config em Cache' (versão conhecida enviada como configVersion)"""
+    entrada = ctx['json']
+    cliente_id = str(entrada.get('cliente_id') or (entrada.get('webhook_data') or {}).get('cliente_id') or '')
+    conhecida = (ctx['static'].get('config') or {}).get(cliente_id)
+    return {'cliente_id': cliente_id, 'config_version': conhecida['version'] if conhecida else ''}
+
+
+def _code_buscar_configuracoes(ctx: Dict) -> Dict:
+    """Port em Python do nó 'Buscar Configurações Cliente' (payload, resposta HTTP ou cache)"""
+    cache = ctx['static'].setdefault('config', {})
+    payload = _payload_gatilho(ctx)
+    entrada = ctx['json']
+
+    if entrada.get('config_inalterada'):
+        conhecida = cache[str(entrada.get('cliente_id'))]
+        config = {
+            'cliente_id': entrada.get('cliente_id'),
+            'config_version': conhecida['version'],
+            'configuracoes': conhecida['configuracoes'],
+            'tags_permitidas': conhecida['tags_permitidas'],
+            'webhook_data': payload.get('webhook_data') or payload
+        }
+    elif entrada.get('configuracoes'):
+        config = entrada
+    else:
+        snapshot = payload.get('config') or {}
+        config = {
+            'cliente_id': payload.get('cliente_id'),
+            'config_version': snapshot.get('version'),
+            'configuracoes': (snapshot.get('data') or {}).get('configuracoes'),
+            'tags_permitidas': (snapshot.get('data') or {}).get('tags_permitidas'),
+            'webhook_data': payload.get('webhook_data') or payload
+        }
+
+    cache[str(config.get('cliente_id'))] = {
+        'version': config.get('config_version'),
+        'configuracoes': config.get('configuracoes'),
+        'tags_permitidas': config.get('tags_permitidas')
+    }
+    return config
+
+
+def _code_processar_tag(ctx: Dict) -> Dict:
+    """Port em Python do nó 'Processar Tag' (SDR WHATSAPP IA)"""
+    response = ctx['json'].get('response') or ''
+    tags_permitidas = _get_path(ctx['nodes'].get('Buscar Configurações Cliente'), '.tags_permitidas') or []
+    tag_encontrada = next((tag for tag in tags_permitidas if tag.lower() in response.lower()), None)
+    leads = _get_path(ctx['nodes'].get('Buscar Lead no Kommo'), '._embedded.leads') or []
+
+    return {
+        'tag_encontrada': tag_encontrada,
+        'funil_id': None,
+        'pipeline_id': None,
+        'lead_id': leads[0].get('id') if leads else None,
+        'response_ia': response
+    }
+
+
+def _code_processar_mudanca_etapa(ctx: Dict) -> Dict:
+    """Port em Python do nó 'Processar Mudança de Etapa' (MUDA ETAPA IA TAG)"""
+    webhook_data = ctx['json'].get('webhook_data') or {}
+    buscar = ctx['nodes'].get('Buscar Configurações Cliente') or {}
+    configuracoes = buscar.get('configuracoes') or {}
+    tags_permitidas = buscar.get('tags_permitidas') or []
+
+    tag_acionada = webhook_data.get('tag')
+    if not tag_acionada and webhook_data.get('message'):
+        mensagem = webhook_data['message'].lower()
+        tag_acionada = next((tag for tag in tags_permitidas if tag.lower() in mensagem), None)
+
+    funis = {
+        'transfere_vendedor': 'funil_vendedor_id',
+        'transfere_suporte': 'funil_suporte_id',
+        'transfere_ligacao': 'funil_ligacao_id',
+    }
+    if tag_acionada in funis:
+        novo_funil_id = configuracoes.get(funis[tag_acionada])
+        novo_pipeline_id = configuracoes.get('pipeline_id')
+    else:
+        novo_funil_id = webhook_data.get('funil_id')
+        novo_pipeline_id = webhook_data.get('pipeline_id')
+
+    return {
+        'tag_acionada': tag_acionada,
+        'novo_funil_id': novo_funil_id,
+        'novo_pipeline_id': novo_pipeline_id,
+        'lead_id': webhook_data.get('lead_id'),
+        'cliente_id': configuracoes.get('cliente_id'),
+        'kommo_token': configuracoes.get('kommo_token'),
+        'kommo_domain': configuracoes.get('kommo_domain')
+    }
+
+
+# Nós de código (JavaScript) não podem ser executados diretamente: cada um tem um port em Python
+CODE_NODES: Dict[str, Callable[[Dict], Dict]] = {
+    'Config em Cache': _code_config_em_cache,
+    'Buscar Configurações Cliente': _code_buscar_configuracoes,
+    'Processar Tag': _code_processar_tag,
+    'Processar Mudança de Etapa': _code_processar_mudanca_etapa,
+}
+
+
+def _node_code(node: WorkflowNode, ctx: Dict, services: WorkflowServices) -> Dict[int, Dict]:
+    implementacao = CODE_NODES.get(node.name)
+    if not implementacao:
+        raise WorkflowExecutionError(f"Nó de código sem implementação Python: {node.name}")
+    return {0: implementacao(ctx)}
+
+
+NODE_HANDLERS: Dict[str, Callable[[WorkflowNode, Dict, WorkflowServices], Dict[int, Dict]]] = {
+    'webhook': _node_webhook,
+    'httpRequest': _node_http_request,
+    'if': _node_if,
+    'code': _node_code,
+    'openAi': _node_openai,
+}
+
+
+# ---------------------------------------------------------------------------
+# Execução
+# ---------------------------------------------------------------------------
+
+class WorkflowExecutor:
+    """Executa um WorkflowGraph com agendamento topológico e ramos independentes em paralelo"""
+
+    def __init__(self, graph: WorkflowGraph, services: Optional[WorkflowServices] = None,
+                 max_workers: int = 8):
+        """
+        Inicializa o executor
+
+        Args:
+            graph: Grafo do workflow
+            services: Serviços externos (padrão: reais)
+            max_workers: Número máximo de nós executando em paralelo
+        """
+        self.graph = graph
+        self.services = services or WorkflowServices()
+        self.max_workers = max_workers
+
+        nao_suportados = [n for n in graph.nodes.values() if n.short_type not in NODE_HANDLERS]
+        if nao_suportados:
+            raise WorkflowExecutionError(f"Tipos de nó não suportados: {nao_suportados}")
+
+    def _run_node(self, nome: str, entrada: Dict, saidas: Dict[str, Dict]) -> Tuple[Dict[int, Dict], float]:
+        """Executa um nó; `saidas` é a cópia tirada no agendamento (não muda durante a execução)"""
+        node = self.graph.nodes[nome]
+        inicio = time.perf_counter()
+        ctx = {'json': entrada, 'nodes': saidas, 'static': self.services.static_data}
+        resultado = NODE_HANDLERS[node.short_type](node, ctx, self.services)
+        return resultado, time.perf_counter() - inicio
+
+    def run(self, payload: Dict) -> Dict:
+        """
+        Executa o workflow com o payload recebido pelo webhook
+
+        Um nó é executado quando todos os predecessores terminaram (ou foram
+        descartados por um nó 'if') e ao menos uma conexão de entrada está ativa.
+        Com várias entradas ativas, o $json é a fusão delas na ordem das conexões.
+
+        Args:
+            payload: Dados recebidos pelo gatilho
+
+        Returns:
+            Saídas por nó, nós descartados, tempos por nó e tempo total
+        """
+        graph = self.graph
+        pendentes = {nome: len(origens) for nome, origens in graph.incoming.items()}
+        entradas: Dict[str, Dict[str, Dict]] = {nome: {} for nome in graph.nodes}
+        saidas: Dict[str, Dict] = {}
+        tempos: Dict[str, float] = {}
+        descartados: List[str] = []
+        inicio = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            em_execucao = {}
+
+            def _liberar(nome, resultado):
+                # resultado None => nó descartado: todas as saídas inativas
+                for saida, destino in graph.outgoing[nome]:
+                    if resultado is not None and saida in resultado:
+                        entradas[destino][nome] = resultado[saida]
+                    pendentes[destino] -= 1
+                    if pendentes[destino] == 0:
+                        _agendar(destino)
+
+            def _agendar(nome):
+                if graph.incoming[nome] and not entradas[nome]:
+                    descartados.append(nome)
+                    _liberar(nome, None)
+                    return
+                entrada = payload if not graph.incoming[nome] else {}
+                for origem in graph.incoming[nome]:
+                    entrada.update(entradas[nome].get(origem) or {})
+                # Snapshot das saídas já concluídas, tirado na thread principal (única que
+                # escreve em `saidas`): ramos paralelos não se enxergam
+                future = pool.submit(self._run_node, nome, entrada, dict(saidas))
+                em_execucao[future] = nome
+
+            for raiz in graph.roots:
+                _agendar(raiz)
+
+            while em_execucao:
+                concluidos, _ = wait(list(em_execucao), return_when=FIRST_COMPLETED)
+                for future in concluidos:
+                    nome = em_execucao.pop(future)
+                    try:
+                        resultado, duracao = future.result()
+                    except WorkflowExecutionError:
+                        raise
+                    except Exception as e:
+                        raise WorkflowExecutionError(f"Erro no nó '{nome}': {str(e)}") from e
+                    saidas[nome] = next(iter(resultado.values()), None)
+                    tempos[nome] = duracao
+                    _liberar(nome, resultado)
+
+        return {
+            'workflow': graph.name,
+            'outputs': saidas,
+            'skipped': descartados,
+            'timings': tempos,
+            'total_time': time.perf_counter() - inicio
+        }
+
+
+def run_workflow(path_or_name: str, payload: Dict, services: Optional[WorkflowServices] = None,
+                 max_workers: int = 8) -> Dict:
+    """
+    Carrega e executa um workflow
+
+    Args:
+        path_or_name: Caminho do arquivo ou nome do webhook empacotado
+        payload: Dados de entrada do gatilho
+        services: Serviços externos (padrão: reais)
+        max_workers: Paralelismo máximo
+
+    Returns:
+        Resultado da execução
+    """
+    return WorkflowExecutor(load_workflow(path_or_name), services, max_workers).run(payload)
+
+
+def benchmark_workflow(path_or_name: str, payload: Dict, runs: int = 20,
+                       latency: float = 0.05, max_workers: int = 8) -> Dict:
+    """
+    Mede a execução do workflow contra serviços simulados, comparando
+    execução serial (1 worker) com a paralela
+
+    Args:
+        path_or_name: Caminho do arquivo ou nome do webhook empacotado
+        payload: Dados de entrada do gatilho
+        runs: Número de execuções por modo
+        latency: Latência simulada por chamada externa (segundos)
+        max_workers: Paralelismo do modo paralelo
+
+    Returns:
+        Tempo médio por execução em cada modo
+    """
+    graph = load_workflow(path_or_name)
+    resultado = {}
+
+    for modo, workers in (('serial', 1), ('parallel', max_workers)):
+        executor = WorkflowExecutor(graph, StubWorkflowServices(latency=latency), workers)
+        inicio = time.perf_counter()
+        for _ in range(runs):
+            executor.run(payload)
+        resultado[f'{modo}_avg_ms'] = (time.perf_counter() - inicio) / runs * 1000
+
+    resultado['speedup'] = resultado['serial_avg_ms'] / resultado['parallel_avg_ms']
+    return resultado
@@ -2,7 +2,10 @@
 Integração com workflows n8n
 """
 import requests
+import base64
 import json
+import hashlib
+import secrets
 from typing import Dict, List, Optional, Any
 from datetime import datetime
 
@@ -88,6 +91,52 @@ class N8NWorkflowManager:
         except requests.exceptions.RequestException as e:
             raise Exception(f"Erro ao disparar webhook: {str(e)}")
     
+    def trigger_webhook_stream(self, webhook_path: str, data: Dict, media, field: str = 'file') -> Dict:
+        """
+        Dispara um webhook do n8n enviando uma mídia como multipart/form-data
+        em streaming (chunked), sem carregar o arquivo em memória
+        
+        Args:
+            webhook_path: Caminho do webhook
+            data: Dados enviados no campo 'payload' (JSON)
+            media: Mídia recebida (SpooledMedia)
+            field: Nome do campo do arquivo
+            
+        Returns:
+            Resposta do webhook
+        """
+        webhook_url = f"{self.base_url}/webhook/{webhook_path}"
+        boundary = secrets.token_hex(16)
+        
+        def corpo():
+            yield (
+                f'--{boundary}\r\n'
+                'Content-Disposition: form-data; name="payload"\r\n'
+                'Content-Type: application/json\r\n\r\n'
+            ).encode() + json.dumps(data).encode() + (
+                f'\r\n--{boundary}\r\n'
+                f'Content-Disposition: form-data; name="{field}"; filename="{media.filename}"\r\n'
+                f'Content-Type: {media.mime_type}\r\n\r\n'
+            ).encode()
+            yield from media.iter_chunks()
+            yield f'\r\n--{boundary}--\r\n'.encode()
+        
+        try:
+            response = requests.post(
+                webhook_url,
+                data=corpo(),
+                headers={'Content-Type': f'multipart/form-data; boundary={boundary}'}
+            )
+            response.raise_for_status()
+            
+            if response.content:
+                return response.json()
+            else:
+                return {'success': True}
+                
+        except requests.exceptions.RequestException as e:
+            raise Exception(f"Erro ao disparar webhook: {str(e)}")
+    
     def get_workflows(self) -> List[Dict]:
         """
         Obtém lista de workflows
@@ -151,39 +200,81 @@ class N8NWorkflowManager:
         return self._make_request('GET', '/api/v1/executions', params)
 
 
+def config_snapshot_version(snapshot: Dict) -> str:
+    """
+    Calcula a versão (hash de conteúdo) de um snapshot de configuração
+    
+    Args:
+        snapshot: Snapshot retornado por ConfiguracaoCliente.to_snapshot()
+        
+    Returns:
+        Hash SHA-256 truncado do JSON canônico do snapshot
+    """
+    canonical = json.dumps(snapshot, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:16]
+
+
 class SDRWorkflowProcessor:
     """Processador específico para workflows SDR"""
     
-    def __init__(self, n8n_manager: N8NWorkflowManager, app_base_url: str):
+    def __init__(self, n8n_manager: N8NWorkflowManager, app_base_url: str,
+                 config_snapshot: Optional[Dict] = None):
         """
         Inicializa o processador de workflows SDR
         
         Args:
             n8n_manager: Instância do gerenciador n8n
             app_base_url: URL base da aplicação
+            config_snapshot: Snapshot de configuração do cliente enviado junto ao
+                payload, evitando que o n8n busque as configurações (opcional)
         """
         self.n8n = n8n_manager
         self.app_base_url = app_base_url.rstrip('/')
+        self.config_snapshot = config_snapshot
+        self.config_version = config_snapshot_version(config_snapshot) if config_snapshot else None
     
-    def process_whatsapp_message(self, cliente_id: int, message_data: Dict) -> Dict:
+    def _build_payload(self, cliente_id: int, action: str, **dados) -> Dict:
         """
-        Processa mensagem do WhatsApp através do workflow SDR
+        Monta o payload enviado ao webhook do n8n
         
         Args:
             cliente_id: ID do cliente
-            message_data: Dados da mensagem
+            action: Ação executada pelo workflow
+            **dados: Dados específicos da ação
             
         Returns:
-            Resultado do processamento
+            Payload do webhook
         """
         webhook_data = {
             'cliente_id': cliente_id,
             'webhook_url': f"{self.app_base_url}/api/webhook/sdr",
-            'message_data': message_data,
+            **dados,
             'timestamp': datetime.now().isoformat(),
-            'action': 'process_message'
+            'action': action
         }
         
+        if self.config_snapshot is not None:
+            # O n8n só busca as configurações quando o payload não traz o snapshot
+            webhook_data['config'] = {
+                'version': self.config_version,
+                'data': self.config_snapshot
+            }
+        
+        return webhook_data
+    
+    def process_whatsapp_message(self, cliente_id: int, message_data: Dict) -> Dict:
+        """
+        Processa mensagem do WhatsApp através do workflow SDR
+        
+        Args:
+            cliente_id: ID do cliente
+            message_data: Dados da mensagem
+            
+        Returns:
+            Resultado do processamento
+        """
+        webhook_data = self._build_payload(cliente_id, 'process_message', message_data=message_data)
+        
         try:
             result = self.n8n.trigger_webhook('sdr-webhook', webhook_data)
             return {
@@ -210,14 +301,7 @@ class SDRWorkflowProcessor:
         Returns:
             Resultado da mudança
         """
-        webhook_data = {
-            'cliente_id': cliente_id,
-            'webhook_url': f"{self.app_base_url}/api/webhook/sdr",
-            'lead_data': lead_data,
-            'new_stage': new_stage,
-            'timestamp': datetime.now().isoformat(),
-            'action': 'change_stage'
-        }
+        webhook_data = self._build_payload(cliente_id, 'change_stage', lead_data=lead_data, new_stage=new_stage)
         
         try:
             result = self.n8n.trigger_webhook('muda-etapa-webhook', webhook_data)
@@ -233,27 +317,27 @@ class SDRWorkflowProcessor:
                 'message': 'Erro ao alterar etapa'
             }
     
-    def process_audio_message(self, cliente_id: int, audio_data: Dict) -> Dict:
+    def process_audio_message(self, cliente_id: int, audio_data: Dict, media=None) -> Dict:
         """
         Processa mensagem de áudio através do workflow
         
         Args:
             cliente_id: ID do cliente
             audio_data: Dados do áudio
+            media: Arquivo de áudio recebido em streaming (SpooledMedia, opcional)
             
         Returns:
             Resultado do processamento
         """
-        webhook_data = {
-            'cliente_id': cliente_id,
-            'webhook_url': f"{self.app_base_url}/api/webhook/sdr",
-            'audio_data': audio_data,
-            'timestamp': datetime.now().isoformat(),
-            'action': 'process_audio'
-        }
+        if media is not None:
+            audio_data = self._transcribe_audio(audio_data, media)
+        webhook_data = self._build_payload(cliente_id, 'process_audio', audio_data=audio_data)
         
         try:
-            result = self.n8n.trigger_webhook('sdr-webhook', webhook_data)
+            if media is not None and 'transcricao' not in audio_data:
+                result = self.n8n.trigger_webhook_stream('sdr-webhook', webhook_data, media, 'audio')
+            else:
+                result = self.n8n.trigger_webhook('sdr-webhook', webhook_data)
             return {
                 'success': True,
                 'result': result,
@@ -266,24 +350,115 @@ class SDRWorkflowProcessor:
                 'message': 'Erro ao processar áudio'
             }
     
-    def process_image_message(self, cliente_id: int, image_data: Dict) -> Dict:
+    def _transcribe_audio(self, audio_data: Dict, media) -> Dict:
+        """
+        Transcreve o áudio localmente em trechos paralelos (AUDIO_TRANSCRIPTION_BACKEND)
+        
+        Args:
+            audio_data: Dados do áudio
+            media: Arquivo de áudio recebido em streaming (SpooledMedia)
+            
+        Returns:
+            Dados do áudio com a transcrição; sem backend configurado ou em caso
+            de erro, retorna os dados originais e o áudio segue para o workflow
+        """
+        from src.integrations.audio_transcription import AudioTranscriber, create_transcription_backend
+        
+        configuracoes = (self.config_snapshot or {}).get('configuracoes') or {}
+        backend = create_transcription_backend(api_key=configuracoes.get('chatgpt_api_key'))
+        if backend is None:
+            return audio_data
+        
+        try:
+            result = AudioTranscriber(backend).transcribe_file(media.path, audio_data.get('language'))
+        except Exception:
+            return audio_data
+        
+        return {
+            **audio_data,
+            'transcricao': result['text'],
+            'transcricao_trechos': result['chunks'],
+            'duracao': result['duration']
+        }
+    
+    def _preprocess_image(self, cliente_id: int, image_data: Dict, media=None) -> Dict:
+        """
+        Reduz a imagem (arquivo recebido em streaming ou campo 'base64') antes de repassá-la ao workflow
+        
+        Args:
+            cliente_id: ID do cliente
+            image_data: Dados da imagem
+            media: Arquivo de imagem recebido em streaming (SpooledMedia, opcional)
+            
+        Returns:
+            Dados da imagem com o conteúdo pré-processado
+        """
+        from src.integrations.image_processing import get_image_preprocessor
+        
+        if media is not None:
+            # O arquivo é lido pelo processo do pool; só a imagem reduzida volta ao worker
+            processed, info = get_image_preprocessor().process_file(cliente_id, media.path)
+            processed = base64.b64encode(processed).decode('ascii')
+        else:
+            encoded = image_data.get('base64') if isinstance(image_data, dict) else None
+            if not encoded:
+                return image_data
+            
+            try:
+                processed, info = get_image_preprocessor().process_base64(cliente_id, encoded)
+            except Exception:
+                # Imagem inválida ou pool indisponível: segue com a original
+                return image_data
+        
+        image_data = {
+            **image_data,
+            'base64': processed,
+            'mime_type': info['mime_type'],
+            'preprocessamento': {
+                'largura': info['size'][0],
+                'altura': info['size'][1],
+                'bytes_originais': info['bytes_in'],
+                'bytes': info['bytes_out'],
+                'dhash': info['dhash']
+            }
+        }
+        
+        # Se uma imagem quase idêntica já foi analisada com o mesmo prompt (prompt_imagem do
+        # cliente e descrição da imagem), o workflow pode reutilizar a análise
+        from src.integrations.image_cache import get_image_analysis_cache, prompt_key
+        from src.integrations.chatgpt import image_analysis_prompts
+        configuracoes = (self.config_snapshot or {}).get('configuracoes') or {}
+        chave_prompt = prompt_key(*image_analysis_prompts(
+            image_data.get('description') or '', configuracoes.get('prompt_imagem')
+        ))
+        cached = get_image_analysis_cache().get(cliente_id, int(info['dhash'], 16), chave_prompt)
+        if cached is not None:
+            image_data['analise_cache'] = cached.get('response')
+        
+        return image_data
+    
+    def process_image_message(self, cliente_id: int, image_data: Dict, media=None) -> Dict:
         """
         Processa mensagem de imagem através do workflow
         
         Args:
             cliente_id: ID do cliente
             image_data: Dados da imagem
+            media: Arquivo de imagem recebido em streaming (SpooledMedia, opcional)
             
         Returns:
             Resultado do processamento
         """
-        webhook_data = {
-            'cliente_id': cliente_id,
-            'webhook_url': f"{self.app_base_url}/api/webhook/sdr",
-            'image_data': image_data,
-            'timestamp': datetime.now().isoformat(),
-            'action': 'process_image'
-        }
+        try:
+            image_data = self._preprocess_image(cliente_id, image_data, media)
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'message': 'Erro ao processar imagem'
+            }
+        
+        webhook_data = self._build_payload(cliente_id, 'process_image', image_data=image_data)
         
         try:
             result = self.n8n.trigger_webhook('sdr-webhook', webhook_data)
@@ -300,6 +475,109 @@ class SDRWorkflowProcessor:
             }
 
 
+class AsyncN8NWorkflowManager(N8NWorkflowManager):
+    """
+    Gerenciador n8n assíncrono (aiohttp), usado pela aplicação ASGI
+    
+    Os métodos da API retornam corrotinas (ex: `await manager.get_workflows()`).
+    """
+    
+    def __init__(self, n8n_base_url: str, api_key: Optional[str] = None, http=None):
+        """
+        Args:
+            n8n_base_url: URL base do n8n
+            api_key: Chave da API do n8n (opcional)
+            http: aiohttp.ClientSession compartilhada
+        """
+        super().__init__(n8n_base_url, api_key)
+        self.http = http
+    
+    async def _make_request(self, method: str, endpoint: str, data: Optional[Dict] = None) -> Dict:
+        import aiohttp
+        
+        url = f"{self.base_url}/{endpoint.lstrip('/')}"
+        method = method.upper()
+        
+        if method == 'GET':
+            kwargs = {'params': data}
+        elif method in ('POST', 'PUT'):
+            kwargs = {'json': data}
+        elif method == 'DELETE':
+            kwargs = {}
+        else:
+            raise ValueError(f"Método HTTP não suportado: {method}")
+        
+        try:
+            async with self.http.request(method, url, headers=self.headers, **kwargs) as response:
+                response.raise_for_status()
+                content = await response.read()
+                return json.loads(content) if content else {}
+        except aiohttp.ClientError as e:
+            raise Exception(f"Erro na requisição para n8n: {str(e)}")
+    
+    async def trigger_webhook(self, webhook_path: str, data: Dict) -> Dict:
+        import aiohttp
+        
+        webhook_url = f"{self.base_url}/webhook/{webhook_path}"
+        
+        try:
+            async with self.http.post(webhook_url, json=data) as response:
+                response.raise_for_status()
+                content = await response.read()
+                return json.loads(content) if content else {'success': True}
+        except aiohttp.ClientError as e:
+            raise Exception(f"Erro ao disparar webhook: {str(e)}")
+
+
+class AsyncSDRWorkflowProcessor(SDRWorkflowProcessor):
+    """
+    Processador SDR assíncrono: mensagens e mudanças de etapa sem bloquear o event loop
+
+    Áudio e imagem (upload em streaming, transcrição e pré-processamento no
+    pool) continuam nas rotas WSGI, com SDRWorkflowProcessor.
+    """
+
+    def process_audio_message(self, cliente_id: int, audio_data: Dict, media=None) -> Dict:
+        raise NotImplementedError('Áudio não é processado pelo processador assíncrono; use create_sdr_processor')
+
+    def process_image_message(self, cliente_id: int, image_data: Dict, media=None) -> Dict:
+        raise NotImplementedError('Imagem não é processada pelo processador assíncrono; use create_sdr_processor')
+
+    async def process_whatsapp_message(self, cliente_id: int, message_data: Dict) -> Dict:
+        webhook_data = self._build_payload(cliente_id, 'process_message', message_data=message_data)
+        
+        try:
+            result = await self.n8n.trigger_webhook('sdr-webhook', webhook_data)
+            return {
+                'success': True,
+                'result': result,
+                'message': 'Mensagem processada com sucesso'
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'message': 'Erro ao processar mensagem'
+            }
+    
+    async def change_lead_stage(self, cliente_id: int, lead_data: Dict, new_stage: str) -> Dict:
+        webhook_data = self._build_payload(cliente_id, 'change_stage', lead_data=lead_data, new_stage=new_stage)
+        
+        try:
+            result = await self.n8n.trigger_webhook('muda-etapa-webhook', webhook_data)
+            return {
+                'success': True,
+                'result': result,
+                'message': 'Etapa alterada com sucesso'
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'message': 'Erro ao alterar etapa'
+            }
+
+
 def create_n8n_manager(base_url: str, api_key: Optional[str] = None) -> N8NWorkflowManager:
     """
     Cria uma instância do gerenciador n8n
@@ -315,7 +593,8 @@ def create_n8n_manager(base_url: str, api_key: Optional[str] = None) -> N8NWorkf
 
 
 def create_sdr_processor(n8n_base_url: str, app_base_url: str, 
-                        api_key: Optional[str] = None) -> SDRWorkflowProcessor:
+                        api_key: Optional[str] = None,
+                        config_snapshot: Optional[Dict] = None) -> SDRWorkflowProcessor:
     """
     Cria uma instância do processador SDR
     
@@ -323,12 +602,13 @@ def create_sdr_processor(n8n_base_url: str, app_base_url: str,
         n8n_base_url: URL base do n8n
         app_base_url: URL base da aplicação
         api_key: Chave da API n8n (opcional)
+        config_snapshot: Snapshot de configuração do cliente (opcional)
         
     Returns:
         Instância do processador SDR
     """
     n8n_manager = create_n8n_manager(n8n_base_url, api_key)
-    return SDRWorkflowProcessor(n8n_manager, app_base_url)
+    return SDRWorkflowProcessor(n8n_manager, app_base_url, config_snapshot)
 
 
 def test_n8n_connection(base_url: str, api_key: Optional[str] = None) -> Dict:
@@ -358,3 +638,51 @@ def test_n8n_connection(base_url: str, api_key: Optional[str] = None) -> Dict:
             'message': f'Erro ao conectar com n8n: {str(e)}'
         }
 
+
+def create_sdr_processor_async(http, n8n_base_url: str, app_base_url: str,
+                               api_key: Optional[str] = None,
+                               config_snapshot: Optional[Dict] = None) -> AsyncSDRWorkflowProcessor:
+    """
+    Cria uma instância do processador SDR assíncrono
+    
+    Args:
+        http: aiohttp.ClientSession compartilhada
+        n8n_base_url: URL base do n8n
+        app_base_url: URL base da aplicação
+        api_key: Chave da API n8n (opcional)
+        config_snapshot: Snapshot de configuração do cliente (opcional)
+        
+    Returns:
+        Instância do processador SDR assíncrono
+    """
+    n8n_manager = AsyncN8NWorkflowManager(n8n_base_url, api_key, http)
+    return AsyncSDRWorkflowProcessor(n8n_manager, app_base_url, config_snapshot)
+
+
+async def test_n8n_connection_async(http, base_url: str, api_key: Optional[str] = None) -> Dict:
+    """
+    Testa a conexão com n8n sem bloquear o event loop
+    
+    Args:
+        http: aiohttp.ClientSession compartilhada
+        base_url: URL base do n8n
+        api_key: Chave da API (opcional)
+        
+    Returns:
+        Resultado do teste (mesmo formato de test_n8n_connection)
+    """
+    try:
+        manager = AsyncN8NWorkflowManager(base_url, api_key, http)
+        workflows = await manager.get_workflows()
+        
+        return {
+            'success': True,
+            'message': 'Conexão com n8n estabelecida com sucesso',
+            'workflows_count': len(workflows) if workflows else 0
+        }
+        
+    except Exception as e:
+        return {
+            'success': False,
+            'message': f'Erro ao conectar com n8n: {str(e)}'
+        }
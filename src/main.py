@@ -1,9 +1,11 @@
-print("DEBUG: Iniciando main.py")
 import os
 import sys
+import time
 # DON\"T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
+_inicio = time.perf_counter()
+
 from flask import Flask, send_from_directory
 from flask_cors import CORS
 from src.extensions import db
@@ -14,83 +16,107 @@ from src.routes.cliente import cliente_bp
 from src.routes.admin import admin_bp
 from src.routes.integrations import integrations_bp
 from src.routes.n8n import n8n_bp
-from src.utils.security import middleware_seguranca, add_security_headers
-
-app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
-
-# Configurações de segurança
-app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'sdr-ia-secret-key-change-in-production')
-app.config['SESSION_COOKIE_SECURE'] = False  # True em produção com HTTPS
-app.config['SESSION_COOKIE_HTTPONLY'] = True
-app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
-
-# Configurar CORS para permitir requisições externas
-CORS(app, supports_credentials=True, origins=['*'])
-
-# Aplicar middleware de segurança
-app.before_request(middleware_seguranca)
-app.after_request(add_security_headers)
-
-# Registrar blueprints
-app.register_blueprint(user_bp, url_prefix='/api')
-app.register_blueprint(auth_bp, url_prefix='/api/auth')
-app.register_blueprint(webhook_bp, url_prefix='/api/webhook')
-app.register_blueprint(cliente_bp, url_prefix='/api/cliente')
-app.register_blueprint(admin_bp, url_prefix='/api/admin')
-app.register_blueprint(integrations_bp, url_prefix='/api/integrations')
-app.register_blueprint(n8n_bp, url_prefix='/api/n8n')
-
-# Configuração do banco de dados
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db.init_app(app)
-
-# Criar tabelas
-with app.app_context():
-    db.create_all()
-    
-    # Criar administrador padrão se não existir
-    from src.models.administrador import Administrador
-    admin_default = Administrador.query.filter_by(email='admin@sdria.com').first()
-    if admin_default:
-        db.session.delete(admin_default)
-        db.session.commit()
-        print("Administrador padrão existente deletado.")
-
-    admin = Administrador(
-        nome='Administrador',
-        email='admin@sdria.com',
-        nivel_acesso='super_admin'
-    )
-    admin.set_senha('admin123')
-    db.session.add(admin)
-    db.session.commit()
-    print("Administrador padrão criado: admin@sdria.com / admin123")
-
-@app.route('/', defaults={'path': ''})
-@app.route('/<path:path>')
-def serve_static(path):
-    """Servir arquivos estáticos e SPA"""
-    if path and os.path.exists(os.path.join(app.static_folder, path)):
-        return send_from_directory(app.static_folder, path)
-    return send_from_directory(app.static_folder, 'index.html')
-
-@app.route('/health')
-def health_check():
-    """Endpoint de verificação de saúde"""
-    return {'status': 'healthy', 'service': 'SDR IA App'}, 200
+from src.utils.security import middleware_seguranca, add_security_headers, ProxyConfiavel, PROXY_HOPS
+from src.utils.serializacao import ProvedorJSON
+from src.utils.compressao import comprimir_resposta
+from src.utils.media import MEDIA_MAX_BYTES, RequisicaoMidia
+from src.utils.database import configurar_banco
+from src.utils.inicializacao import AUTO_BOOTSTRAP, RelatorioInicializacao, inicializar_banco
+
+
+def create_app(bootstrap=None):
+    """
+    Cria e configura a aplicação
+
+    Args:
+        bootstrap: Executa o bootstrap do banco (tabelas, migrações e
+            administrador padrão). None usa AUTO_BOOTSTRAP.
+
+    Returns:
+        Aplicação Flask
+    """
+    relatorio = RelatorioInicializacao(_inicio)
+    relatorio.marcar('importacoes')
+
+    app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
+
+    # JSON com orjson (se instalado) e datas em ISO 8601
+    app.json = ProvedorJSON(app)
+
+    # Configurações de segurança
+    app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'sdr-ia-secret-key-change-in-production')
+    app.config['SESSION_COOKIE_SECURE'] = False  # True em produção com HTTPS
+    app.config['SESSION_COOKIE_HTTPONLY'] = True
+    app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
+
+    # Limite de tamanho dos corpos de requisição (mídias são lidas em streaming até este limite)
+    app.config['MAX_CONTENT_LENGTH'] = MEDIA_MAX_BYTES
+    # Uploads multipart gravados uma única vez, já no formato usado por receber_midia
+    app.request_class = RequisicaoMidia
+
+    # Endereço real do cliente atrás do Traefik (REMOTE_ADDR passa a vir do X-Forwarded-For)
+    if PROXY_HOPS > 0:
+        app.wsgi_app = ProxyConfiavel(app.wsgi_app)
+
+    # Configurar CORS para permitir requisições externas
+    CORS(app, supports_credentials=True, origins=['*'])
+
+    # Aplicar middleware de segurança
+    app.before_request(middleware_seguranca)
+    app.after_request(add_security_headers)
+    # Compressão negociada (gzip/br) das respostas acima de COMPRESSAO_MINIMO bytes
+    app.after_request(comprimir_resposta)
+
+    # Registrar blueprints
+    app.register_blueprint(user_bp, url_prefix='/api')
+    app.register_blueprint(auth_bp, url_prefix='/api/auth')
+    app.register_blueprint(webhook_bp, url_prefix='/api/webhook')
+    app.register_blueprint(cliente_bp, url_prefix='/api/cliente')
+    app.register_blueprint(admin_bp, url_prefix='/api/admin')
+    app.register_blueprint(integrations_bp, url_prefix='/api/integrations')
+    app.register_blueprint(n8n_bp, url_prefix='/api/n8n')
+
+    @app.route('/', defaults={'path': ''})
+    @app.route('/<path:path>')
+    def serve_static(path):
+        """Servir arquivos estáticos e SPA"""
+        if path and os.path.exists(os.path.join(app.static_folder, path)):
+            return send_from_directory(app.static_folder, path)
+        return send_from_directory(app.static_folder, 'index.html')
+
+    @app.route('/health')
+    def health_check():
+        """Endpoint de verificação de saúde"""
+        return {'status': 'healthy', 'service': 'SDR IA App'}, 200
+
+    relatorio.marcar('configuracao')
+
+    # Configuração do banco de dados
+    # DATABASE_URL seleciona o banco (Postgres com pool de conexões ou SQLite local)
+    configurar_banco(app, db)
+    relatorio.marcar('banco')
+
+    # Tabelas, migrações e administrador padrão (idempotente; em produção roda
+    # uma vez por deploy com `python -m src.utils.inicializacao`)
+    if AUTO_BOOTSTRAP if bootstrap is None else bootstrap:
+        with app.app_context():
+            inicializar_banco()
+        relatorio.marcar('bootstrap')
+
+    app.extensions['inicializacao'] = relatorio
+    print(relatorio)
+    return app
+
+
+app = create_app()
 
 if __name__ == '__main__':
     # Configurações para desenvolvimento e produção
     debug_mode = os.environ.get('FLASK_DEBUG', 'False').lower() == 'true'
     port = int(os.environ.get('PORT', 5000))
-    
+
     app.run(
         host='0.0.0.0',
         port=port,
         debug=debug_mode
     )
-
-
-
-
@@ -0,0 +1,133 @@
+"""
+Migrações de esquema versionadas
+
+`db.create_all()` cria tabelas novas mas não altera tabelas existentes. Cada
+migração é um módulo `mNNNN_descricao.py` deste pacote com:
+
+    DESCRICAO = 'Texto curto'
+    def upgrade(conn): ...   # conn: Connection SQLAlchemy dentro de uma transação
+
+As versões aplicadas ficam registradas na tabela `schema_migrations`.
+Migrações devem ser idempotentes (ex: CREATE INDEX IF NOT EXISTS), pois em um
+banco novo os modelos já criam o esquema final.
+
+Uso:
+    python -m src.migrations            # aplica as pendentes em DATABASE_URL
+    python -m src.migrations --explain  # planos de execução das consultas críticas
+"""
+import importlib
+import pkgutil
+import re
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, select
+from sqlalchemy.exc import IntegrityError
+
+_metadata = MetaData()
+
+schema_migrations = Table(
+    'schema_migrations', _metadata,
+    Column('versao', Integer, primary_key=True),
+    Column('descricao', String(200), nullable=False),
+    Column('aplicada_em', DateTime, nullable=False)
+)
+
+
+def listar_migracoes():
+    """Retorna (versão, módulo) de todas as migrações do pacote, em ordem"""
+    migracoes = []
+    for info in pkgutil.iter_modules(__path__):
+        match = re.match(r'm(\d{4})_', info.name)
+        if match:
+            migracoes.append((int(match.group(1)), importlib.import_module(f'{__name__}.{info.name}')))
+    return sorted(migracoes, key=lambda m: m[0])
+
+
+def aplicar_migracoes(engine, log=print):
+    """
+    Aplica as migrações pendentes, cada uma em sua própria transação
+
+    Args:
+        engine: Engine SQLAlchemy
+        log: Função de log
+
+    Returns:
+        Versões aplicadas
+    """
+    _metadata.create_all(engine)
+
+    with engine.connect() as conn:
+        aplicadas = set(conn.execute(select(schema_migrations.c.versao)).scalars())
+
+    novas = []
+    for versao, modulo in listar_migracoes():
+        if versao in aplicadas:
+            continue
+        try:
+            with engine.begin() as conn:
+                modulo.upgrade(conn)
+                conn.execute(schema_migrations.insert().values(
+                    versao=versao, descricao=modulo.DESCRICAO, aplicada_em=datetime.utcnow()
+                ))
+        except IntegrityError:
+            # Outro worker aplicou a mesma versão ao mesmo tempo
+            continue
+        log(f'Migração {versao:04d} aplicada: {modulo.DESCRICAO}')
+        novas.append(versao)
+    return novas
+
+
+# Consultas executadas em toda requisição de webhook/admin e o índice que cada
+# uma deve usar. Parâmetros fixos bastam: o plano não depende dos valores.
+CONSULTAS_CRITICAS = [
+    ('webhook: configuração do cliente',
+     'SELECT * FROM configuracoes_cliente WHERE cliente_id = 1',
+     'uq_configuracoes_cliente_cliente_id'),
+    ('webhook: controle de eventos',
+     'SELECT * FROM controle_requisicoes WHERE cliente_id = 1 AND ativo = 1',
+     'uq_controle_requisicoes_cliente_id'),
+    ('cliente: tags',
+     'SELECT * FROM tags_cliente WHERE cliente_id = 1',
+     'ix_tags_cliente_cliente_nome'),
+    ('cliente: tag existente',
+     "SELECT * FROM tags_cliente WHERE cliente_id = 1 AND nome = 'x'",
+     'ix_tags_cliente_cliente_nome'),
+    ('admin: clientes pendentes',
+     'SELECT COUNT(*) FROM clientes WHERE ativo = 1 AND aprovado = 0',
+     'ix_clientes_status'),
+    ('admin: atividades do cliente',
+     "SELECT * FROM log_atividades WHERE usuario_id = 1 AND tipo_usuario = 'cliente' "
+     'ORDER BY data_criacao DESC LIMIT 20',
+     'ix_log_atividades_usuario'),
+    ('admin: logs por tipo',
+     "SELECT * FROM log_atividades WHERE tipo_usuario = 'cliente' ORDER BY data_criacao DESC LIMIT 50",
+     'ix_log_atividades_tipo_data'),
+    ('admin: atividades recentes',
+     "SELECT * FROM log_atividades WHERE data_criacao >= '2025-01-01' ORDER BY data_criacao DESC LIMIT 10",
+     'ix_log_atividades_data_criacao'),
+]
+
+
+def verificar_indices(engine):
+    """
+    Executa EXPLAIN nas consultas críticas e verifica o índice usado
+
+    No Postgres, tabelas muito pequenas podem ter varredura sequencial
+    escolhida pelo planejador mesmo com o índice disponível.
+
+    Args:
+        engine: Engine SQLAlchemy
+
+    Returns:
+        Lista com nome, índice esperado, se foi usado e o plano
+    """
+    prefixo = 'EXPLAIN QUERY PLAN ' if engine.dialect.name == 'sqlite' else 'EXPLAIN '
+    resultados = []
+    with engine.connect() as conn:
+        for nome, sql, indice in CONSULTAS_CRITICAS:
+            if engine.dialect.name != 'sqlite':
+                sql = re.sub(r'(ativo|aprovado) = 1', r'\1 = true', sql)
+                sql = re.sub(r'(ativo|aprovado) = 0', r'\1 = false', sql)
+            plano = '\n'.join(' '.join(str(c) for c in linha) for linha in conn.exec_driver_sql(prefixo + sql))
+            resultados.append({'consulta': nome, 'indice': indice, 'usa_indice': indice in plano, 'plano': plano})
+    return resultados
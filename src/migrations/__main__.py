@@ -0,0 +1,36 @@
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from sqlalchemy import create_engine
+
+from src.extensions import db
+from src.migrations import aplicar_migracoes, verificar_indices
+from src.models import administrador, cliente, user  # noqa: F401
+from src.utils.database import obter_database_url
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Migrações de esquema')
+    parser.add_argument('--explain', action='store_true',
+                        help='Mostra o plano de execução das consultas críticas')
+    args = parser.parse_args()
+
+    engine = create_engine(obter_database_url())
+    db.metadata.create_all(engine)
+    aplicadas = aplicar_migracoes(engine)
+    print(f'{len(aplicadas)} migração(ões) aplicada(s)')
+
+    if args.explain:
+        falhas = 0
+        for r in verificar_indices(engine):
+            print(f"[{'OK' if r['usa_indice'] else 'SEM ÍNDICE'}] {r['consulta']} ({r['indice']})")
+            print('    ' + r['plano'].replace('\n', '\n    '))
+            falhas += not r['usa_indice']
+        sys.exit(1 if falhas else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+"""
+Índices das consultas críticas e unicidade de cliente_id nas tabelas
+com um registro por cliente
+"""
+from sqlalchemy import inspect
+
+DESCRICAO = 'Índices das consultas críticas e cliente_id único'
+
+INDICES = [
+    ('ix_log_atividades_usuario', 'log_atividades', 'usuario_id, tipo_usuario, data_criacao'),
+    ('ix_log_atividades_tipo_data', 'log_atividades', 'tipo_usuario, data_criacao'),
+    ('ix_log_atividades_acao_data', 'log_atividades', 'acao, data_criacao'),
+    ('ix_log_atividades_data_criacao', 'log_atividades', 'data_criacao'),
+    ('ix_clientes_status', 'clientes', 'ativo, aprovado, data_criacao'),
+    ('ix_clientes_data_criacao', 'clientes', 'data_criacao'),
+    ('ix_tags_cliente_cliente_nome', 'tags_cliente', 'cliente_id, nome'),
+]
+
+UNICOS = [
+    ('uq_configuracoes_cliente_cliente_id', 'configuracoes_cliente'),
+    ('uq_controle_requisicoes_cliente_id', 'controle_requisicoes'),
+]
+
+
+def upgrade(conn):
+    inspetor = inspect(conn)
+    for nome, tabela, colunas in INDICES:
+        # Colunas substituídas por migrações posteriores (ex: acao -> acao_id em 0003)
+        existentes = {c['name'] for c in inspetor.get_columns(tabela)}
+        if not all(c.strip() in existentes for c in colunas.split(',')):
+            continue
+        conn.exec_driver_sql(f'CREATE INDEX IF NOT EXISTS {nome} ON {tabela} ({colunas})')
+
+    for nome, tabela in UNICOS:
+        # Mantém o registro mais antigo de cada cliente (o que .first() já retornava)
+        conn.exec_driver_sql(
+            f'DELETE FROM {tabela} WHERE id NOT IN '
+            f'(SELECT MIN(id) FROM {tabela} GROUP BY cliente_id)'
+        )
+        conn.exec_driver_sql(f'CREATE UNIQUE INDEX IF NOT EXISTS {nome} ON {tabela} (cliente_id)')
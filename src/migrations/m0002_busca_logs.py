@@ -0,0 +1,61 @@
+"""
+Índice de busca textual em log_atividades (acao, detalhes, ip_address, user_agent)
+
+SQLite: tabela FTS5 de conteúdo externo mantida por triggers.
+Postgres: coluna tsvector gerada com índice GIN.
+"""
+from sqlalchemy import inspect
+
+DESCRICAO = 'Busca textual nos logs de atividade'
+
+SQLITE = [
+    # tokenchars mantém IPs (192.168.0.1) e versões de user agent como um único token
+    """CREATE VIRTUAL TABLE IF NOT EXISTS log_atividades_fts USING fts5(
+        acao, detalhes, ip_address, user_agent,
+        content='log_atividades', content_rowid='id',
+        tokenize="unicode61 remove_diacritics 2 tokenchars '.:_-'"
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS log_atividades_fts_insert AFTER INSERT ON log_atividades BEGIN
+        INSERT INTO log_atividades_fts(rowid, acao, detalhes, ip_address, user_agent)
+        VALUES (new.id, new.acao, new.detalhes, new.ip_address, new.user_agent);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS log_atividades_fts_delete AFTER DELETE ON log_atividades BEGIN
+        INSERT INTO log_atividades_fts(log_atividades_fts, rowid, acao, detalhes, ip_address, user_agent)
+        VALUES ('delete', old.id, old.acao, old.detalhes, old.ip_address, old.user_agent);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS log_atividades_fts_update AFTER UPDATE ON log_atividades BEGIN
+        INSERT INTO log_atividades_fts(log_atividades_fts, rowid, acao, detalhes, ip_address, user_agent)
+        VALUES ('delete', old.id, old.acao, old.detalhes, old.ip_address, old.user_agent);
+        INSERT INTO log_atividades_fts(rowid, acao, detalhes, ip_address, user_agent)
+        VALUES (new.id, new.acao, new.detalhes, new.ip_address, new.user_agent);
+    END""",
+    # Indexa as linhas já existentes
+    "INSERT INTO log_atividades_fts(log_atividades_fts) VALUES ('rebuild')",
+]
+
+POSTGRES = [
+    """ALTER TABLE log_atividades ADD COLUMN IF NOT EXISTS busca tsvector
+        GENERATED ALWAYS AS (to_tsvector('simple',
+            coalesce(acao, '') || ' ' || coalesce(detalhes, '') || ' ' ||
+            coalesce(ip_address, '') || ' ' || coalesce(user_agent, ''))) STORED""",
+    'CREATE INDEX IF NOT EXISTS ix_log_atividades_busca ON log_atividades USING GIN (busca)',
+]
+
+
+def upgrade(conn):
+    # Esquema já com as colunas codificadas: a busca é criada pela migração 0003
+    if 'acao' not in {c['name'] for c in inspect(conn).get_columns('log_atividades')}:
+        return
+
+    if conn.dialect.name == 'sqlite':
+        # SQLite compilado sem FTS5: a busca usa LIKE como alternativa
+        if not conn.exec_driver_sql("SELECT sqlite_compileoption_used('ENABLE_FTS5')").scalar():
+            return
+        comandos = SQLITE
+    elif conn.dialect.name == 'postgresql':
+        comandos = POSTGRES
+    else:
+        return
+
+    for comando in comandos:
+        conn.exec_driver_sql(comando)
@@ -0,0 +1,162 @@
+"""
+Codificação por dicionário de log_atividades.acao e log_atividades.user_agent
+
+As colunas de texto são substituídas por acao_id/user_agent_id (tabelas
+log_acoes e log_user_agents). A conversão é feita em lotes por id, e o índice
+de busca textual é recriado a partir dos dicionários.
+"""
+import hashlib
+
+from sqlalchemy import inspect, text
+
+DESCRICAO = 'Dicionário de ações e user agents dos logs'
+
+LOTE = 5000
+
+SQLITE_BUSCA = [
+    # Conteúdo externo do FTS: visão com os textos decodificados
+    """CREATE VIEW IF NOT EXISTS log_atividades_busca AS
+        SELECT l.id, a.nome AS acao, l.detalhes, l.ip_address, u.texto AS user_agent
+        FROM log_atividades l
+        LEFT JOIN log_acoes a ON a.id = l.acao_id
+        LEFT JOIN log_user_agents u ON u.id = l.user_agent_id""",
+    """CREATE VIRTUAL TABLE IF NOT EXISTS log_atividades_fts USING fts5(
+        acao, detalhes, ip_address, user_agent,
+        content='log_atividades_busca', content_rowid='id',
+        tokenize="unicode61 remove_diacritics 2 tokenchars '.:_-'"
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS log_atividades_fts_insert AFTER INSERT ON log_atividades BEGIN
+        INSERT INTO log_atividades_fts(rowid, acao, detalhes, ip_address, user_agent)
+        VALUES (new.id, (SELECT nome FROM log_acoes WHERE id = new.acao_id), new.detalhes, new.ip_address,
+                (SELECT texto FROM log_user_agents WHERE id = new.user_agent_id));
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS log_atividades_fts_delete AFTER DELETE ON log_atividades BEGIN
+        INSERT INTO log_atividades_fts(log_atividades_fts, rowid, acao, detalhes, ip_address, user_agent)
+        VALUES ('delete', old.id, (SELECT nome FROM log_acoes WHERE id = old.acao_id), old.detalhes, old.ip_address,
+                (SELECT texto FROM log_user_agents WHERE id = old.user_agent_id));
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS log_atividades_fts_update AFTER UPDATE ON log_atividades BEGIN
+        INSERT INTO log_atividades_fts(log_atividades_fts, rowid, acao, detalhes, ip_address, user_agent)
+        VALUES ('delete', old.id, (SELECT nome FROM log_acoes WHERE id = old.acao_id), old.detalhes, old.ip_address,
+                (SELECT texto FROM log_user_agents WHERE id = old.user_agent_id));
+        INSERT INTO log_atividades_fts(rowid, acao, detalhes, ip_address, user_agent)
+        VALUES (new.id, (SELECT nome FROM log_acoes WHERE id = new.acao_id), new.detalhes, new.ip_address,
+                (SELECT texto FROM log_user_agents WHERE id = new.user_agent_id));
+    END""",
+    "INSERT INTO log_atividades_fts(log_atividades_fts) VALUES ('rebuild')",
+]
+
+POSTGRES_BUSCA = [
+    'ALTER TABLE log_atividades ADD COLUMN IF NOT EXISTS busca tsvector',
+    """CREATE OR REPLACE FUNCTION log_atividades_busca_atualizar() RETURNS trigger AS $$
+    BEGIN
+        NEW.busca := to_tsvector('simple',
+            coalesce((SELECT nome FROM log_acoes WHERE id = NEW.acao_id), '') || ' ' ||
+            coalesce(NEW.detalhes, '') || ' ' || coalesce(NEW.ip_address, '') || ' ' ||
+            coalesce((SELECT texto FROM log_user_agents WHERE id = NEW.user_agent_id), ''));
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql""",
+    'DROP TRIGGER IF EXISTS log_atividades_busca ON log_atividades',
+    """CREATE TRIGGER log_atividades_busca BEFORE INSERT OR UPDATE ON log_atividades
+        FOR EACH ROW EXECUTE FUNCTION log_atividades_busca_atualizar()""",
+    # O trigger recalcula a coluna das linhas já existentes
+    'UPDATE log_atividades SET busca = NULL',
+    'CREATE INDEX IF NOT EXISTS ix_log_atividades_busca ON log_atividades USING GIN (busca)',
+]
+
+
+def _tem_fts5(conn):
+    return conn.exec_driver_sql("SELECT sqlite_compileoption_used('ENABLE_FTS5')").scalar()
+
+
+def _converter(conn):
+    """Preenche acao_id/user_agent_id a partir das colunas de texto, em lotes por id"""
+    acoes = dict(conn.exec_driver_sql('SELECT nome, id FROM log_acoes').all())
+    user_agents = dict(conn.exec_driver_sql('SELECT hash, id FROM log_user_agents').all())
+
+    def _id(dicionario, tabela, chave, valores):
+        if chave not in dicionario:
+            colunas = ', '.join(valores)
+            parametros = ', '.join(f':{c}' for c in valores)
+            conn.execute(
+                text(f'INSERT INTO {tabela} ({colunas}) VALUES ({parametros})'), valores
+            )
+            coluna_chave = 'nome' if tabela == 'log_acoes' else 'hash'
+            dicionario[chave] = conn.execute(
+                text(f'SELECT id FROM {tabela} WHERE {coluna_chave} = :chave'), {'chave': chave}
+            ).scalar()
+        return dicionario[chave]
+
+    ultimo = 0
+    while True:
+        linhas = conn.execute(text(
+            'SELECT id, acao, user_agent FROM log_atividades WHERE id > :ultimo ORDER BY id LIMIT :lote'
+        ), {'ultimo': ultimo, 'lote': LOTE}).all()
+        if not linhas:
+            break
+
+        atualizacoes = []
+        for id, acao, user_agent in linhas:
+            acao_id = _id(acoes, 'log_acoes', acao or '', {'nome': acao or ''})
+            user_agent_id = None
+            if user_agent is not None:
+                chave = hashlib.sha1(user_agent.encode('utf-8')).hexdigest()
+                user_agent_id = _id(user_agents, 'log_user_agents', chave, {'hash': chave, 'texto': user_agent})
+            atualizacoes.append({'id': id, 'acao_id': acao_id, 'user_agent_id': user_agent_id})
+
+        conn.execute(text(
+            'UPDATE log_atividades SET acao_id = :acao_id, user_agent_id = :user_agent_id WHERE id = :id'
+        ), atualizacoes)
+        ultimo = linhas[-1][0]
+
+
+def upgrade(conn):
+    from src.models.administrador import AcaoLog, UserAgentLog
+
+    AcaoLog.__table__.create(conn, checkfirst=True)
+    UserAgentLog.__table__.create(conn, checkfirst=True)
+
+    sqlite = conn.dialect.name == 'sqlite'
+    postgres = conn.dialect.name == 'postgresql'
+    colunas = {c['name'] for c in inspect(conn).get_columns('log_atividades')}
+
+    if 'acao' in colunas:
+        versao = conn.exec_driver_sql('SELECT sqlite_version()').scalar() if sqlite else None
+        if versao and tuple(int(p) for p in versao.split('.')[:2]) < (3, 35):
+            raise RuntimeError('SQLite 3.35+ é necessário para remover as colunas de texto dos logs')
+
+        if 'acao_id' not in colunas:
+            conn.exec_driver_sql('ALTER TABLE log_atividades ADD COLUMN acao_id INTEGER REFERENCES log_acoes (id)')
+        if 'user_agent_id' not in colunas:
+            conn.exec_driver_sql(
+                'ALTER TABLE log_atividades ADD COLUMN user_agent_id INTEGER REFERENCES log_user_agents (id)'
+            )
+
+        _converter(conn)
+
+        # Objetos que dependem das colunas de texto precisam sair antes delas
+        if sqlite:
+            for trigger in ('insert', 'delete', 'update'):
+                conn.exec_driver_sql(f'DROP TRIGGER IF EXISTS log_atividades_fts_{trigger}')
+            conn.exec_driver_sql('DROP TABLE IF EXISTS log_atividades_fts')
+        if postgres:
+            conn.exec_driver_sql('DROP INDEX IF EXISTS ix_log_atividades_busca')
+            conn.exec_driver_sql('ALTER TABLE log_atividades DROP COLUMN IF EXISTS busca')
+        conn.exec_driver_sql('DROP INDEX IF EXISTS ix_log_atividades_acao_data')
+
+        conn.exec_driver_sql('ALTER TABLE log_atividades DROP COLUMN acao')
+        conn.exec_driver_sql('ALTER TABLE log_atividades DROP COLUMN user_agent')
+
+    conn.exec_driver_sql(
+        'CREATE INDEX IF NOT EXISTS ix_log_atividades_acao_id_data ON log_atividades (acao_id, data_criacao)'
+    )
+
+    if sqlite and _tem_fts5(conn):
+        comandos = SQLITE_BUSCA
+    elif postgres:
+        comandos = POSTGRES_BUSCA
+    else:
+        comandos = []
+    for comando in comandos:
+        conn.exec_driver_sql(comando)
@@ -0,0 +1,16 @@
+"""
+Versão dos dados de cada cliente (clientes.versao_dados)
+
+Incrementada na mesma transação de cada escrita em Cliente,
+ConfiguracaoCliente ou TagCliente (src/utils/etag.py). As ETags derivam
+dela e ficam iguais em todos os workers.
+"""
+from sqlalchemy import inspect
+
+DESCRICAO = 'Versão dos dados do cliente para ETags'
+
+
+def upgrade(conn):
+    if 'versao_dados' in {c['name'] for c in inspect(conn).get_columns('clientes')}:
+        return
+    conn.exec_driver_sql('ALTER TABLE clientes ADD COLUMN versao_dados INTEGER NOT NULL DEFAULT 0')
@@ -0,0 +1,52 @@
+"""
+IDs de log_atividades sem reutilização (AUTOINCREMENT no SQLite)
+
+Sem AUTOINCREMENT o SQLite reaproveita os ids liberados pelo arquivamento
+(src/utils/retencao_logs.py), e um log restaurado do arquivo pode colidir com
+um log novo. A tabela é recriada com AUTOINCREMENT, mantendo os ids; a busca
+textual (visão, FTS e triggers da migração 0003) é recriada em seguida.
+
+No Postgres o id já vem de uma sequência, que não volta atrás.
+"""
+from sqlalchemy import inspect
+
+from src.migrations.m0003_dicionario_logs import SQLITE_BUSCA, _tem_fts5
+
+DESCRICAO = 'AUTOINCREMENT em log_atividades'
+
+
+def upgrade(conn):
+    if conn.dialect.name != 'sqlite':
+        return
+
+    from src.models.administrador import LogAtividade
+
+    sql = conn.exec_driver_sql(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'log_atividades'"
+    ).scalar()
+    if sql is None or 'AUTOINCREMENT' in sql.upper():
+        return
+
+    # Visão, FTS e triggers referenciam a tabela antiga
+    for trigger in ('insert', 'delete', 'update'):
+        conn.exec_driver_sql(f'DROP TRIGGER IF EXISTS log_atividades_fts_{trigger}')
+    conn.exec_driver_sql('DROP TABLE IF EXISTS log_atividades_fts')
+    conn.exec_driver_sql('DROP VIEW IF EXISTS log_atividades_busca')
+
+    # Os índices continuam na tabela renomeada e os nomes seriam recriados abaixo
+    for indice in inspect(conn).get_indexes('log_atividades'):
+        conn.exec_driver_sql(f'DROP INDEX IF EXISTS "{indice["name"]}"')
+
+    conn.exec_driver_sql('ALTER TABLE log_atividades RENAME TO log_atividades_antiga')
+    LogAtividade.__table__.create(conn)
+
+    colunas = ', '.join(c.name for c in LogAtividade.__table__.columns)
+    # Ids explícitos: o sqlite_sequence passa a começar do maior id existente
+    conn.exec_driver_sql(
+        f'INSERT INTO log_atividades ({colunas}) SELECT {colunas} FROM log_atividades_antiga ORDER BY id'
+    )
+    conn.exec_driver_sql('DROP TABLE log_atividades_antiga')
+
+    if _tem_fts5(conn):
+        for comando in SQLITE_BUSCA:
+            conn.exec_driver_sql(comando)
@@ -1,4 +1,4 @@
-from .administrador import Administrador, ControleRequisicoes, LogAtividade
+from .administrador import Administrador, ControleRequisicoes, UsoDiario, AcaoLog, UserAgentLog, LogAtividade
 from .cliente import Cliente, ConfiguracaoCliente, TagCliente
 from .user import User
 
@@ -1,6 +1,11 @@
 from src.extensions import db
-from werkzeug.security import generate_password_hash, check_password_hash
+from src.utils.senhas import get_servico_senhas
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import Session
 from datetime import datetime
+import hashlib
 
 class Administrador(db.Model):
     __tablename__ = 'administradores'
@@ -15,12 +20,22 @@ class Administrador(db.Model):
     data_ultimo_login = db.Column(db.DateTime, nullable=True)
     
     def set_senha(self, senha):
-        """Define a senha do administrador com hash"""
-        self.senha_hash = generate_password_hash(senha)
+        """Define a senha do administrador com hash (bcrypt, calculado no pool de processos)"""
+        self.senha_hash = get_servico_senhas().gerar_hash(senha)
     
     def check_senha(self, senha):
-        """Verifica se a senha está correta"""
-        return check_password_hash(self.senha_hash, senha)
+        """
+        Verifica se a senha está correta
+        
+        Hashes com outro algoritmo ou custo são refeitos com a configuração
+        atual; o novo hash é gravado no próximo commit da sessão.
+        """
+        servico = get_servico_senhas()
+        if not servico.verificar(self.senha_hash, senha):
+            return False
+        if servico.precisa_rehash(self.senha_hash):
+            self.senha_hash = servico.gerar_hash(senha)
+        return True
     def to_dict(self):
         return {
             'id': self.id,
@@ -28,8 +43,8 @@ class Administrador(db.Model):
             'email': self.email,
             'nivel_acesso': self.nivel_acesso,
             'ativo': self.ativo,
-            'data_criacao': self.data_criacao.isoformat() if self.data_criacao else None,
-            'data_ultimo_login': self.data_ultimo_login.isoformat() if self.data_ultimo_login else None
+            'data_criacao': self.data_criacao,
+            'data_ultimo_login': self.data_ultimo_login
         }
     
     def __repr__(self):
@@ -38,6 +53,10 @@ class Administrador(db.Model):
 
 class ControleRequisicoes(db.Model):
     __tablename__ = 'controle_requisicoes'
+    __table_args__ = (
+        # Um controle por cliente (consultado a cada webhook)
+        db.Index('uq_controle_requisicoes_cliente_id', 'cliente_id', unique=True),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     cliente_id = db.Column(db.Integer, db.ForeignKey('clientes.id'), nullable=False)
@@ -64,12 +83,15 @@ class ControleRequisicoes(db.Model):
             return True
         return self.eventos_utilizados < self.limite_eventos
     
-    def usar_evento(self):
-        """Incrementa o contador de eventos utilizados"""
-        if self.pode_usar_evento() and self.limite_eventos != -1:
+    def usar_evento(self, acao='evento'):
+        """Incrementa o contador de eventos utilizados e o consolidado diário"""
+        if not self.pode_usar_evento():
+            return False
+        if self.limite_eventos != -1:
             self.eventos_utilizados += 1
-            return True
-        return False
+        # O consolidado conta também os clientes ilimitados (uso para cobrança)
+        UsoDiario.registrar(self.cliente_id, acao)
+        return True
     
     def to_dict(self):
         return {
@@ -78,8 +100,8 @@ class ControleRequisicoes(db.Model):
             'limite_eventos': self.limite_eventos,
             'eventos_utilizados': self.eventos_utilizados,
             'eventos_restantes': self.eventos_restantes(),
-            'periodo_inicio': self.periodo_inicio.isoformat() if self.periodo_inicio else None,
-            'periodo_fim': self.periodo_fim.isoformat() if self.periodo_fim else None,
+            'periodo_inicio': self.periodo_inicio,
+            'periodo_fim': self.periodo_fim,
             'ativo': self.ativo
         }
     
@@ -87,18 +109,250 @@ class ControleRequisicoes(db.Model):
         return f'<ControleRequisicoes Cliente {self.cliente_id} - {self.eventos_utilizados}/{self.limite_eventos}>'
 
 
+class UsoDiario(db.Model):
+    """Eventos consumidos por cliente, dia e ação (atualizado a cada evento)"""
+    __tablename__ = 'uso_diario'
+    __table_args__ = (
+        db.Index('uq_uso_diario_cliente_dia_acao', 'cliente_id', 'dia', 'acao', unique=True),
+        db.Index('ix_uso_diario_dia', 'dia'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    cliente_id = db.Column(db.Integer, db.ForeignKey('clientes.id'), nullable=False)
+    dia = db.Column(db.Date, nullable=False)
+    acao = db.Column(db.String(50), nullable=False)
+    eventos = db.Column(db.Integer, nullable=False, default=0)
+    
+    @classmethod
+    def registrar(cls, cliente_id, acao, quantidade=1, dia=None):
+        """
+        Soma eventos ao consolidado do dia com um único upsert, na transação
+        corrente (o commit do chamador grava contador e consolidado juntos)
+        """
+        valores = {
+            'cliente_id': cliente_id,
+            'dia': dia or datetime.utcnow().date(),
+            'acao': acao,
+            'eventos': quantidade
+        }
+        dialeto = db.session.get_bind().dialect.name
+        
+        if dialeto in ('sqlite', 'postgresql'):
+            if dialeto == 'sqlite':
+                from sqlalchemy.dialects.sqlite import insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert
+            stmt = insert(cls.__table__).values(**valores)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['cliente_id', 'dia', 'acao'],
+                set_={'eventos': cls.__table__.c.eventos + stmt.excluded.eventos}
+            )
+            db.session.execute(stmt)
+            return
+        
+        uso = cls.query.filter_by(cliente_id=cliente_id, dia=valores['dia'], acao=acao).first()
+        if uso:
+            uso.eventos += quantidade
+        else:
+            db.session.add(cls(**valores))
+    
+    def to_dict(self):
+        return {
+            'cliente_id': self.cliente_id,
+            'dia': self.dia,
+            'acao': self.acao,
+            'eventos': self.eventos
+        }
+    
+    def __repr__(self):
+        return f'<UsoDiario Cliente {self.cliente_id} {self.dia} {self.acao}: {self.eventos}>'
+
+
+class _DicionarioLog:
+    """
+    Tabela de dicionário (texto <-> id) com cache em memória por processo
+
+    Os pares texto/id nunca mudam depois de criados, então o cache não precisa
+    de invalidação: só é limitado em tamanho. A exceção são os textos
+    registrados na transação atual, descartados do cache se ela for desfeita.
+    """
+    CACHE_MAX = 10000
+    COLUNA_CHAVE = 'texto'  # Coluna única usada na busca
+    COLUNA_TEXTO = 'texto'  # Coluna com o texto original
+    
+    @classmethod
+    def _chave(cls, texto):
+        return texto
+    
+    @classmethod
+    def _valores(cls, texto):
+        return {cls.COLUNA_CHAVE: texto}
+    
+    @classmethod
+    def _guardar(cls, id, texto):
+        if len(cls._ids) >= cls.CACHE_MAX:
+            cls._ids.clear()
+            cls._textos.clear()
+        cls._ids[texto] = id
+        cls._textos[id] = texto
+    
+    @classmethod
+    def buscar_id(cls, texto):
+        """Retorna o id do texto ou None se ele nunca foi registrado"""
+        if texto is None:
+            return None
+        id = cls._ids.get(texto)
+        if id is None:
+            tabela = cls.__table__
+            id = db.session.execute(
+                db.select(tabela.c.id).where(tabela.c[cls.COLUNA_CHAVE] == cls._chave(texto))
+            ).scalar()
+            if id is not None:
+                cls._guardar(id, texto)
+        return id
+    
+    @classmethod
+    def obter_id(cls, texto):
+        """Retorna o id do texto, registrando-o se for novo"""
+        if texto is None:
+            return None
+        id = cls.buscar_id(texto)
+        if id is None:
+            id = cls._registrar(texto)
+            cls._guardar(id, texto)
+        return id
+    
+    @classmethod
+    def _registrar(cls, texto):
+        # Savepoint na transação do chamador: uma conexão própria esperaria, no SQLite,
+        # pelo lock de escrita que a sessão já detém após um flush (até o busy_timeout)
+        tabela = cls.__table__
+        coluna = tabela.c[cls.COLUNA_CHAVE]
+        db.session.info.setdefault('dicionario_log_novos', []).append((cls, texto))
+        try:
+            with db.session.begin_nested():
+                return db.session.execute(tabela.insert().values(**cls._valores(texto))).inserted_primary_key[0]
+        except IntegrityError:
+            # Registrado por outro processo entre a busca e a inserção
+            return db.session.execute(db.select(tabela.c.id).where(coluna == cls._chave(texto))).scalar()
+    
+    @classmethod
+    def _descartar(cls, texto):
+        id = cls._ids.pop(texto, None)
+        if id is not None:
+            cls._textos.pop(id, None)
+    
+    @classmethod
+    def texto_por_id(cls, id):
+        """Retorna o texto de um id"""
+        if id is None:
+            return None
+        texto = cls._textos.get(id)
+        if texto is None:
+            tabela = cls.__table__
+            texto = db.session.execute(
+                db.select(tabela.c[cls.COLUNA_TEXTO]).where(tabela.c.id == id)
+            ).scalar()
+            if texto is not None:
+                cls._guardar(id, texto)
+        return texto
+
+
+@event.listens_for(Session, 'after_commit')
+def _confirmar_dicionario_log(session):
+    # Também chamado ao liberar um savepoint: só vale o commit da transação externa
+    if not session.in_nested_transaction():
+        session.info.pop('dicionario_log_novos', None)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _descartar_dicionario_log(session, transacao_anterior):
+    # Ids de textos registrados na transação desfeita não existem mais no banco
+    novos = session.info.get('dicionario_log_novos', ())
+    for cls, texto in novos:
+        cls._descartar(texto)
+    if not transacao_anterior.nested:
+        session.info.pop('dicionario_log_novos', None)
+
+
+class AcaoLog(_DicionarioLog, db.Model):
+    """Dicionário das ações registradas em log_atividades"""
+    __tablename__ = 'log_acoes'
+    COLUNA_CHAVE = 'nome'
+    COLUNA_TEXTO = 'nome'
+    _ids = {}
+    _textos = {}
+    
+    id = db.Column(db.Integer, primary_key=True)
+    nome = db.Column(db.String(100), unique=True, nullable=False)
+
+
+class UserAgentLog(_DicionarioLog, db.Model):
+    """Dicionário dos user agents registrados em log_atividades"""
+    __tablename__ = 'log_user_agents'
+    COLUNA_CHAVE = 'hash'
+    _ids = {}
+    _textos = {}
+    
+    id = db.Column(db.Integer, primary_key=True)
+    # Unicidade pelo hash: user agents podem exceder o limite de índices de texto
+    hash = db.Column(db.String(40), unique=True, nullable=False)
+    texto = db.Column(db.Text, nullable=False)
+    
+    @classmethod
+    def _chave(cls, texto):
+        return hashlib.sha1(texto.encode('utf-8')).hexdigest()
+    
+    @classmethod
+    def _valores(cls, texto):
+        return {'hash': cls._chave(texto), 'texto': texto}
+
+
 class LogAtividade(db.Model):
     __tablename__ = 'log_atividades'
+    __table_args__ = (
+        db.Index('ix_log_atividades_usuario', 'usuario_id', 'tipo_usuario', 'data_criacao'),
+        db.Index('ix_log_atividades_tipo_data', 'tipo_usuario', 'data_criacao'),
+        db.Index('ix_log_atividades_acao_id_data', 'acao_id', 'data_criacao'),
+        db.Index('ix_log_atividades_data_criacao', 'data_criacao'),
+        # IDs nunca reutilizados: os logs arquivados mantêm o id e podem voltar à tabela
+        {'sqlite_autoincrement': True},
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     usuario_id = db.Column(db.Integer, nullable=True)  # ID do usuário (cliente ou admin)
     tipo_usuario = db.Column(db.String(20), nullable=False)  # 'cliente' ou 'administrador'
-    acao = db.Column(db.String(100), nullable=False)
+    # Ação e user agent são armazenados como ids dos dicionários (log_acoes, log_user_agents)
+    acao_id = db.Column(db.Integer, db.ForeignKey('log_acoes.id'), nullable=False)
     detalhes = db.Column(db.Text, nullable=True)
     ip_address = db.Column(db.String(45), nullable=True)
-    user_agent = db.Column(db.Text, nullable=True)
+    user_agent_id = db.Column(db.Integer, db.ForeignKey('log_user_agents.id'), nullable=True)
     data_criacao = db.Column(db.DateTime, default=datetime.utcnow)
     
+    @hybrid_property
+    def acao(self):
+        return AcaoLog.texto_por_id(self.acao_id)
+    
+    @acao.setter
+    def acao(self, valor):
+        self.acao_id = AcaoLog.obter_id(valor)
+    
+    @acao.expression
+    def acao(cls):
+        return db.select(AcaoLog.nome).where(AcaoLog.id == cls.acao_id).scalar_subquery()
+    
+    @hybrid_property
+    def user_agent(self):
+        return UserAgentLog.texto_por_id(self.user_agent_id)
+    
+    @user_agent.setter
+    def user_agent(self, valor):
+        self.user_agent_id = UserAgentLog.obter_id(valor)
+    
+    @user_agent.expression
+    def user_agent(cls):
+        return db.select(UserAgentLog.texto).where(UserAgentLog.id == cls.user_agent_id).scalar_subquery()
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -108,9 +362,32 @@ class LogAtividade(db.Model):
             'detalhes': self.detalhes,
             'ip_address': self.ip_address,
             'user_agent': self.user_agent,
-            'data_criacao': self.data_criacao.isoformat() if self.data_criacao else None
+            'data_criacao': self.data_criacao
         }
     
     def __repr__(self):
         return f'<LogAtividade {self.tipo_usuario} {self.usuario_id} - {self.acao}>'
 
+
+
+class IPBloqueado(db.Model):
+    """Endereço ou faixa (CIDR, IPv4 ou IPv6) bloqueada no middleware de segurança"""
+    __tablename__ = 'ips_bloqueados'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    cidr = db.Column(db.String(49), unique=True, nullable=False)  # Forma normalizada (ex: 10.0.0.0/8)
+    motivo = db.Column(db.String(255), nullable=True)
+    criado_por = db.Column(db.Integer, nullable=True)  # ID do administrador
+    data_criacao = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'cidr': self.cidr,
+            'motivo': self.motivo,
+            'criado_por': self.criado_por,
+            'data_criacao': self.data_criacao
+        }
+    
+    def __repr__(self):
+        return f'<IPBloqueado {self.cidr}>'
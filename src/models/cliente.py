@@ -1,10 +1,15 @@
 from src.extensions import db
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy.orm.attributes import flag_modified
+from src.utils.senhas import get_servico_senhas
 from datetime import datetime
 import json
 
 class Cliente(db.Model):
     __tablename__ = 'clientes'
+    __table_args__ = (
+        db.Index('ix_clientes_status', 'ativo', 'aprovado', 'data_criacao'),
+        db.Index('ix_clientes_data_criacao', 'data_criacao'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     nome = db.Column(db.String(100), nullable=False)
@@ -18,18 +23,32 @@ class Cliente(db.Model):
     aprovado = db.Column(db.Boolean, default=False)
     data_criacao = db.Column(db.DateTime, default=datetime.utcnow)
     data_atualizacao = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Versão dos dados, configurações e tags do cliente (ETags, src/utils/etag.py)
+    versao_dados = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     # Configurações do cliente
     configuracoes = db.relationship('ConfiguracaoCliente', backref='cliente', uselist=False, cascade='all, delete-orphan')
     tags = db.relationship('TagCliente', backref='cliente', cascade='all, delete-orphan')
     
     def set_senha(self, senha):
-        """Define a senha do cliente com hash"""
-        self.senha_hash = generate_password_hash(senha)
+        """Define a senha do cliente com hash (bcrypt, calculado no pool de processos)"""
+        self.senha_hash = get_servico_senhas().gerar_hash(senha)
     
     def check_senha(self, senha):
-        """Verifica se a senha está correta"""
-        return check_password_hash(self.senha_hash, senha)
+        """
+        Verifica se a senha está correta
+        
+        Hashes com outro algoritmo ou custo são refeitos com a configuração
+        atual; o novo hash é gravado no próximo commit da sessão.
+        """
+        servico = get_servico_senhas()
+        if not servico.verificar(self.senha_hash, senha):
+            return False
+        if servico.precisa_rehash(self.senha_hash):
+            self.senha_hash = servico.gerar_hash(senha)
+            # Troca de hash não é atualização do cadastro: mantém data_atualizacao (sem onupdate)
+            flag_modified(self, 'data_atualizacao')
+        return True
     
     def to_dict(self):
         return {
@@ -42,13 +61,17 @@ class Cliente(db.Model):
             'razao_social': self.razao_social,
             'ativo': self.ativo,
             'aprovado': self.aprovado,
-            'data_criacao': self.data_criacao.isoformat() if self.data_criacao else None,
-            'data_atualizacao': self.data_atualizacao.isoformat() if self.data_atualizacao else None
+            'data_criacao': self.data_criacao,
+            'data_atualizacao': self.data_atualizacao
         }
 
 
 class ConfiguracaoCliente(db.Model):
     __tablename__ = 'configuracoes_cliente'
+    __table_args__ = (
+        # Uma configuração por cliente
+        db.Index('uq_configuracoes_cliente_cliente_id', 'cliente_id', unique=True),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     cliente_id = db.Column(db.Integer, db.ForeignKey('clientes.id'), nullable=False)
@@ -95,6 +118,24 @@ class ConfiguracaoCliente(db.Model):
         """Define a lista de IDs dos funis"""
         self.funil_ids = json.dumps(ids_list)
     
+    def to_snapshot(self):
+        """Snapshot compacto das configurações e tags ativas usado pelos workflows n8n"""
+        return {
+            'configuracoes': {
+                'kommo_token': self.kommo_token,
+                'kommo_domain': self.kommo_domain,
+                'chatgpt_api_key': self.chatgpt_api_key,
+                'chatgpt_model': self.chatgpt_model,
+                'pipeline_id': self.pipeline_id,
+                'funil_ids': self.get_funil_ids_list(),
+                'prompt_agente_ia': self.prompt_agente_ia,
+                'prompt_audio': self.prompt_audio,
+                'prompt_imagem': self.prompt_imagem,
+                'usar_n8n': self.usar_n8n
+            },
+            'tags_permitidas': [tag.nome for tag in self.cliente.tags if tag.ativa]
+        }
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -111,13 +152,16 @@ class ConfiguracaoCliente(db.Model):
             'aprovacao_automatica': self.aprovacao_automatica,
             'usar_n8n': self.usar_n8n,
             'webhook_url': self.webhook_url,
-            'data_criacao': self.data_criacao.isoformat() if self.data_criacao else None,
-            'data_atualizacao': self.data_atualizacao.isoformat() if self.data_atualizacao else None
+            'data_criacao': self.data_criacao,
+            'data_atualizacao': self.data_atualizacao
         }
 
 
 class TagCliente(db.Model):
     __tablename__ = 'tags_cliente'
+    __table_args__ = (
+        db.Index('ix_tags_cliente_cliente_nome', 'cliente_id', 'nome'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     cliente_id = db.Column(db.Integer, db.ForeignKey('clientes.id'), nullable=False)
@@ -131,23 +175,13 @@ class TagCliente(db.Model):
         return {
             'id': self.id,
             'cliente_id': self.cliente_id,
-            'kommo_token': self.kommo_token,
-            'kommo_domain': self.kommo_domain,
-            'chatgpt_api_key': self.chatgpt_api_key,
-            'chatgpt_model': self.chatgpt_model,
+            'nome': self.nome,
+            'funil_id': self.funil_id,
             'pipeline_id': self.pipeline_id,
-            'funil_ids': self.funil_ids,
-            'prompt_agente_ia': self.prompt_agente_ia,
-            'prompt_audio': self.prompt_audio,
-            'prompt_imagem': self.prompt_imagem,
-            'aprovacao_automatica': self.aprovacao_automatica,
-            'usar_n8n': self.usar_n8n,
-            'webhook_url': self.webhook_url,
-            'data_criacao': self.data_criacao.isoformat() if self.data_criacao else None,
-            'data_atualizacao': self.data_atualizacao.isoformat() if self.data_atualizacao else None
+            'ativa': self.ativa,
+            'data_criacao': self.data_criacao
         }
 
 
 
 
-
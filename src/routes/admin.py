@@ -1,26 +1,94 @@
 from flask import Blueprint, request, jsonify, session
 from src.models.user import db
 from src.models.cliente import Cliente, ConfiguracaoCliente, TagCliente
-from src.models.administrador import Administrador, ControleRequisicoes, LogAtividade
-from src.utils.security import admin_required, super_admin_required, validar_entrada_segura, sanitizar_entrada, log_atividade_seguranca
+from src.models.administrador import Administrador, ControleRequisicoes, LogAtividade, AcaoLog, IPBloqueado
+from src.utils.security import admin_required, super_admin_required, log_atividade_seguranca
+from src.utils.sessao import invalidar_principal
+from src.utils.bloqueio_ip import get_bloqueio_ip, normalizar_cidr
+from src.utils.estatisticas import obter_estatisticas, invalidar_estatisticas, intervalo_de_datas, obter_uso
+from src.utils.paginacao import usar_paginacao_por_cursor, resposta_por_cursor
+from src.utils.busca_logs import filtrar_busca
+from src.utils.exportacao import exportar, FORMATOS
+from src.utils.retencao_logs import arquivar_logs, consultar_arquivo, listar_segmentos, restaurar_arquivo, LOG_RETENTION_DAYS
+from src.utils.validacao import esquema, Campo
 from datetime import datetime, timedelta
-from sqlalchemy import func
 
 admin_bp = Blueprint('admin', __name__)
 
+# -1 para ilimitado, ou número positivo
+ESQUEMA_LIMITE = esquema({
+    'limite_eventos': Campo(int, obrigatorio=True, minimo=-1,
+                            mensagem='Limite deve ser -1 (ilimitado) ou número positivo'),
+}, mensagem_obrigatorio='limite_eventos é obrigatório')
+
+ESQUEMA_ADMINISTRADOR = esquema({
+    'nome': Campo(str, obrigatorio=True, max=100),
+    'email': Campo(str, obrigatorio=True, max=120),
+    'senha': Campo(str, obrigatorio=True, max=1000, sanitizar=False, espacos=False),
+    'nivel_acesso': Campo(str, padrao='admin', escolhas=('admin', 'super_admin'),
+                          mensagem='Nível de acesso deve ser admin ou super_admin'),
+})
+
+ESQUEMA_IP_BLOQUEADO = esquema({
+    'cidr': Campo(str, obrigatorio=True, max=49),
+    'motivo': Campo(str, max=255),
+})
+
+# max_lotes limita o trabalho por requisição; o restante fica para a próxima chamada ou para o cron
+ESQUEMA_ARQUIVAMENTO = esquema({
+    'dias': Campo(int, padrao=LOG_RETENTION_DAYS, minimo=1,
+                  mensagem='dias e max_lotes devem ser inteiros positivos'),
+    'max_lotes': Campo(int, padrao=50, minimo=1,
+                       mensagem='dias e max_lotes devem ser inteiros positivos'),
+}, opcional=True)
+
+def filtrar_clientes(args):
+    """Consulta de clientes com os filtros da listagem (status)"""
+    status = args.get('status')  # 'ativo', 'inativo', 'aprovado', 'pendente'
+    
+    query = Cliente.query
+    
+    if status == 'ativo':
+        query = query.filter_by(ativo=True)
+    elif status == 'inativo':
+        query = query.filter_by(ativo=False)
+    elif status == 'aprovado':
+        query = query.filter_by(aprovado=True)
+    elif status == 'pendente':
+        query = query.filter_by(aprovado=False)
+    
+    return query
+
+def filtrar_logs(args):
+    """Consulta de logs com os filtros da listagem (tipo_usuario, acao, busca)"""
+    tipo_usuario = args.get('tipo_usuario')
+    acao = args.get('acao')
+    busca = args.get('busca')
+    
+    query = LogAtividade.query
+    
+    if tipo_usuario:
+        query = query.filter_by(tipo_usuario=tipo_usuario)
+    
+    if acao:
+        # Filtra no dicionário de ações (pequeno) e usa o índice de acao_id nos logs
+        query = query.filter(LogAtividade.acao_id.in_(
+            db.select(AcaoLog.id).where(AcaoLog.nome.contains(acao))
+        ))
+    
+    # Busca textual em ação, detalhes, IP e user agent (índice FTS)
+    if busca:
+        query = filtrar_busca(query, busca)
+    
+    return query
+
 @admin_bp.route('/dashboard', methods=['GET'])
 @admin_required
 def get_dashboard():
     """Dashboard do administrador"""
     try:
-        # Estatísticas gerais
-        total_clientes = Cliente.query.count()
-        clientes_ativos = Cliente.query.filter_by(ativo=True).count()
-        clientes_aprovados = Cliente.query.filter_by(aprovado=True).count()
-        clientes_pendentes = Cliente.query.filter_by(aprovado=False, ativo=True).count()
-        
-        # Estatísticas de eventos
-        total_eventos = db.session.query(func.sum(ControleRequisicoes.eventos_utilizados)).scalar() or 0
+        # Contadores agregados (uma consulta, em cache por STATS_CACHE_TTL)
+        estatisticas = obter_estatisticas()
         
         # Atividades recentes (últimas 24h)
         ontem = datetime.utcnow() - timedelta(days=1)
@@ -28,15 +96,16 @@ def get_dashboard():
             LogAtividade.data_criacao >= ontem
         ).order_by(LogAtividade.data_criacao.desc()).limit(10).all()
         
+        clientes = estatisticas['clientes']
         dashboard = {
             'clientes': {
-                'total': total_clientes,
-                'ativos': clientes_ativos,
-                'aprovados': clientes_aprovados,
-                'pendentes': clientes_pendentes
+                'total': clientes['total'],
+                'ativos': clientes['ativos'],
+                'aprovados': clientes['aprovados'],
+                'pendentes': clientes['pendentes']
             },
             'eventos': {
-                'total_utilizados': total_eventos
+                'total_utilizados': estatisticas['eventos']['total']
             },
             'atividades_recentes': [atividade.to_dict() for atividade in atividades_recentes]
         }
@@ -53,19 +122,15 @@ def get_clientes():
     try:
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 20, type=int)
-        status = request.args.get('status')  # 'ativo', 'inativo', 'aprovado', 'pendente'
         
-        query = Cliente.query
+        query = filtrar_clientes(request.args)
         
-        # Filtros
-        if status == 'ativo':
-            query = query.filter_by(ativo=True)
-        elif status == 'inativo':
-            query = query.filter_by(ativo=False)
-        elif status == 'aprovado':
-            query = query.filter_by(aprovado=True)
-        elif status == 'pendente':
-            query = query.filter_by(aprovado=False)
+        # Paginação por cursor: custo constante em qualquer página, sem COUNT(*)
+        if usar_paginacao_por_cursor():
+            try:
+                return jsonify(resposta_por_cursor(query, Cliente, 'clientes', per_page))
+            except ValueError as e:
+                return jsonify({'erro': str(e)}), 400
         
         clientes = query.order_by(Cliente.data_criacao.desc()).paginate(
             page=page, per_page=per_page, error_out=False
@@ -138,6 +203,8 @@ def aprovar_cliente(cliente_id):
             db.session.add(controle)
         
         db.session.commit()
+        invalidar_estatisticas()
+        invalidar_principal('cliente', cliente_id)
         
         admin_id = session['usuario_id']
         log_atividade_seguranca(admin_id, 'administrador', 'cliente_aprovado', f'Cliente ID: {cliente_id}')
@@ -163,6 +230,8 @@ def desativar_cliente(cliente_id):
         
         cliente.ativo = False
         db.session.commit()
+        invalidar_estatisticas()
+        invalidar_principal('cliente', cliente_id)
         
         admin_id = session['usuario_id']
         log_atividade_seguranca(admin_id, 'administrador', 'cliente_desativado', f'Cliente ID: {cliente_id}')
@@ -188,6 +257,8 @@ def reativar_cliente(cliente_id):
         
         cliente.ativo = True
         db.session.commit()
+        invalidar_estatisticas()
+        invalidar_principal('cliente', cliente_id)
         
         admin_id = session['usuario_id']
         log_atividade_seguranca(admin_id, 'administrador', 'cliente_reativado', f'Cliente ID: {cliente_id}')
@@ -206,16 +277,12 @@ def reativar_cliente(cliente_id):
 def atualizar_limite_eventos(cliente_id):
     """Atualizar limite de eventos do cliente"""
     try:
-        data = request.get_json()
-        
-        if 'limite_eventos' not in data:
-            return jsonify({'erro': 'limite_eventos é obrigatório'}), 400
+        dados, erro = ESQUEMA_LIMITE(request.get_json(silent=True))
         
-        limite = data['limite_eventos']
+        if erro:
+            return jsonify({'erro': erro}), 400
         
-        # -1 para ilimitado, ou número positivo
-        if limite != -1 and (not isinstance(limite, int) or limite < 0):
-            return jsonify({'erro': 'Limite deve ser -1 (ilimitado) ou número positivo'}), 400
+        limite = dados['limite_eventos']
         
         controle = ControleRequisicoes.query.filter_by(cliente_id=cliente_id).first()
         
@@ -257,29 +324,23 @@ def get_administradores():
 def criar_administrador():
     """Criar novo administrador (apenas super admin)"""
     try:
-        data = request.get_json()
+        # Validar e sanitizar entrada
+        dados, erro = ESQUEMA_ADMINISTRADOR(request.get_json(silent=True))
         
-        # Validar entrada
-        valido, mensagem = validar_entrada_segura(
-            data,
-            campos_obrigatorios=['nome', 'email', 'senha'],
-            tamanho_max={'nome': 100, 'email': 120}
-        )
-        
-        if not valido:
-            return jsonify({'erro': mensagem}), 400
+        if erro:
+            return jsonify({'erro': erro}), 400
         
         # Verificar se email já existe
-        if Administrador.query.filter_by(email=data['email']).first():
+        if Administrador.query.filter_by(email=dados['email']).first():
             return jsonify({'erro': 'Email já cadastrado'}), 409
         
         # Criar administrador
         admin = Administrador(
-            nome=sanitizar_entrada(data['nome']),
-            email=sanitizar_entrada(data['email']),
-            nivel_acesso=data.get('nivel_acesso', 'admin')
+            nome=dados['nome'],
+            email=dados['email'],
+            nivel_acesso=dados['nivel_acesso'] or 'admin'
         )
-        admin.set_senha(data['senha'])
+        admin.set_senha(dados['senha'])
         
         db.session.add(admin)
         db.session.commit()
@@ -297,6 +358,89 @@ def criar_administrador():
         db.session.rollback()
         return jsonify({'erro': 'Erro interno do servidor'}), 500
 
+@admin_bp.route('/ips-bloqueados', methods=['GET'])
+@admin_required
+def get_ips_bloqueados():
+    """Listar IPs e faixas bloqueados"""
+    try:
+        ips = IPBloqueado.query.order_by(IPBloqueado.data_criacao.desc()).all()
+        
+        return jsonify({
+            'ips': [ip.to_dict() for ip in ips],
+            'lista_ativa': get_bloqueio_ip().get_stats()
+        })
+    
+    except Exception as e:
+        return jsonify({'erro': 'Erro interno do servidor'}), 500
+
+@admin_bp.route('/ips-bloqueados', methods=['POST'])
+@super_admin_required
+def bloquear_ip():
+    """Bloquear um IP ou faixa CIDR (apenas super admin)"""
+    try:
+        dados, erro = ESQUEMA_IP_BLOQUEADO(request.get_json(silent=True))
+        
+        if erro:
+            return jsonify({'erro': erro}), 400
+        
+        try:
+            cidr = normalizar_cidr(dados['cidr'])
+        except ValueError:
+            return jsonify({'erro': 'IP ou faixa CIDR inválida'}), 400
+        
+        if IPBloqueado.query.filter_by(cidr=cidr).first():
+            return jsonify({'erro': 'IP ou faixa já bloqueada'}), 409
+        
+        super_admin_id = session['usuario_id']
+        ip = IPBloqueado(
+            cidr=cidr,
+            motivo=dados.get('motivo'),
+            criado_por=super_admin_id
+        )
+        
+        db.session.add(ip)
+        db.session.commit()
+        get_bloqueio_ip().recarregar()
+        
+        log_atividade_seguranca(super_admin_id, 'administrador', 'ip_bloqueio_adicionado', f'CIDR: {cidr}')
+        
+        return jsonify({
+            'sucesso': True,
+            'mensagem': 'IP bloqueado com sucesso',
+            'ip': ip.to_dict()
+        }), 201
+    
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'erro': 'Erro interno do servidor'}), 500
+
+@admin_bp.route('/ips-bloqueados/<int:ip_id>', methods=['DELETE'])
+@super_admin_required
+def desbloquear_ip(ip_id):
+    """Remover um IP ou faixa da lista de bloqueio (apenas super admin)"""
+    try:
+        ip = IPBloqueado.query.get(ip_id)
+        
+        if not ip:
+            return jsonify({'erro': 'IP bloqueado não encontrado'}), 404
+        
+        cidr = ip.cidr
+        db.session.delete(ip)
+        db.session.commit()
+        get_bloqueio_ip().recarregar()
+        
+        super_admin_id = session['usuario_id']
+        log_atividade_seguranca(super_admin_id, 'administrador', 'ip_bloqueio_removido', f'CIDR: {cidr}')
+        
+        return jsonify({
+            'sucesso': True,
+            'mensagem': 'IP desbloqueado com sucesso'
+        })
+    
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'erro': 'Erro interno do servidor'}), 500
+
 @admin_bp.route('/logs', methods=['GET'])
 @admin_required
 def get_logs():
@@ -304,17 +448,15 @@ def get_logs():
     try:
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 50, type=int)
-        tipo_usuario = request.args.get('tipo_usuario')
-        acao = request.args.get('acao')
         
-        query = LogAtividade.query
+        query = filtrar_logs(request.args)
         
-        # Filtros
-        if tipo_usuario:
-            query = query.filter_by(tipo_usuario=tipo_usuario)
-        
-        if acao:
-            query = query.filter(LogAtividade.acao.contains(acao))
+        # Paginação por cursor: custo constante em qualquer página, sem COUNT(*)
+        if usar_paginacao_por_cursor():
+            try:
+                return jsonify(resposta_por_cursor(query, LogAtividade, 'logs', per_page))
+            except ValueError as e:
+                return jsonify({'erro': str(e)}), 400
         
         logs = query.order_by(LogAtividade.data_criacao.desc()).paginate(
             page=page, per_page=per_page, error_out=False
@@ -336,48 +478,153 @@ def get_logs():
 def get_estatisticas_admin():
     """Estatísticas detalhadas para administrador"""
     try:
-        # Estatísticas por período
-        hoje = datetime.utcnow().date()
-        ontem = hoje - timedelta(days=1)
-        semana_passada = hoje - timedelta(days=7)
-        mes_passado = hoje - timedelta(days=30)
-        
-        # Novos clientes por período
-        novos_hoje = Cliente.query.filter(func.date(Cliente.data_criacao) == hoje).count()
-        novos_ontem = Cliente.query.filter(func.date(Cliente.data_criacao) == ontem).count()
-        novos_semana = Cliente.query.filter(Cliente.data_criacao >= semana_passada).count()
-        novos_mes = Cliente.query.filter(Cliente.data_criacao >= mes_passado).count()
-        
-        # Eventos por período
-        eventos_hoje = db.session.query(func.sum(ControleRequisicoes.eventos_utilizados)).filter(
-            func.date(ControleRequisicoes.periodo_inicio) == hoje
-        ).scalar() or 0
-        
-        estatisticas = {
-            'clientes': {
-                'total': Cliente.query.count(),
-                'ativos': Cliente.query.filter_by(ativo=True).count(),
-                'aprovados': Cliente.query.filter_by(aprovado=True).count(),
-                'pendentes': Cliente.query.filter_by(aprovado=False, ativo=True).count(),
-                'novos': {
-                    'hoje': novos_hoje,
-                    'ontem': novos_ontem,
-                    'semana': novos_semana,
-                    'mes': novos_mes
-                }
-            },
-            'eventos': {
-                'total': db.session.query(func.sum(ControleRequisicoes.eventos_utilizados)).scalar() or 0,
-                'hoje': eventos_hoje
-            },
-            'tags': {
-                'total': TagCliente.query.count(),
-                'ativas': TagCliente.query.filter_by(ativa=True).count()
-            }
-        }
+        estatisticas = obter_estatisticas()
         
         return jsonify(estatisticas)
     
     except Exception as e:
         return jsonify({'erro': 'Erro interno do servidor'}), 500
 
+@admin_bp.route('/uso', methods=['GET'])
+@admin_required
+def get_uso():
+    """Consumo de eventos por período (consolidado diário)"""
+    try:
+        try:
+            inicio, fim = intervalo_de_datas(request.args.get('inicio'), request.args.get('fim'))
+            uso = obter_uso(inicio, fim, request.args.get('cliente_id', type=int),
+                            request.args.get('granularidade'))
+        except ValueError as e:
+            return jsonify({'erro': str(e)}), 400
+        
+        return jsonify(uso)
+    
+    except Exception as e:
+        return jsonify({'erro': 'Erro interno do servidor'}), 500
+
+def _parametros_exportacao():
+    formato = request.args.get('formato', 'ndjson').lower()
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato inválido: {formato}")
+    compactar = request.args.get('gzip', '').lower() in ('1', 'true')
+    return formato, compactar
+
+@admin_bp.route('/logs/export', methods=['GET'])
+@admin_required
+def exportar_logs():
+    """Exporta os logs de atividade em streaming (NDJSON ou CSV, gzip opcional)"""
+    try:
+        formato, compactar = _parametros_exportacao()
+        query = filtrar_logs(request.args).order_by(LogAtividade.data_criacao.desc(), LogAtividade.id.desc())
+        
+        log_atividade_seguranca(session['usuario_id'], 'administrador', 'logs_exportados', f'Formato: {formato}')
+        
+        return exportar(query, formato, ['id', 'usuario_id', 'tipo_usuario', 'acao', 'detalhes',
+                                         'ip_address', 'user_agent', 'data_criacao'],
+                        'logs_atividade', compactar)
+    
+    except ValueError as e:
+        return jsonify({'erro': str(e)}), 400
+    except Exception as e:
+        return jsonify({'erro': 'Erro interno do servidor'}), 500
+
+@admin_bp.route('/clientes/export', methods=['GET'])
+@admin_required
+def exportar_clientes():
+    """Exporta os clientes em streaming (NDJSON ou CSV, gzip opcional)"""
+    try:
+        formato, compactar = _parametros_exportacao()
+        query = filtrar_clientes(request.args).order_by(Cliente.data_criacao.desc(), Cliente.id.desc())
+        
+        log_atividade_seguranca(session['usuario_id'], 'administrador', 'clientes_exportados', f'Formato: {formato}')
+        
+        return exportar(query, formato, ['id', 'nome', 'email', 'telefone', 'empresa', 'cnpj',
+                                         'razao_social', 'ativo', 'aprovado', 'data_criacao',
+                                         'data_atualizacao'],
+                        'clientes', compactar)
+    
+    except ValueError as e:
+        return jsonify({'erro': str(e)}), 400
+    except Exception as e:
+        return jsonify({'erro': 'Erro interno do servidor'}), 500
+
+def _intervalo_arquivo(dados):
+    """Lê inicio/fim (ISO) de um dicionário; ValueError se ausentes ou inválidos"""
+    if not dados.get('inicio') or not dados.get('fim'):
+        raise ValueError('Informe inicio e fim')
+    inicio = datetime.fromisoformat(str(dados['inicio']))
+    fim = datetime.fromisoformat(str(dados['fim']))
+    if inicio >= fim:
+        raise ValueError('Data inicial deve ser anterior à final')
+    return inicio, fim
+
+@admin_bp.route('/logs/arquivar', methods=['POST'])
+@super_admin_required
+def arquivar_logs_antigos():
+    """Move logs antigos para o arquivo comprimido (apenas super admin)"""
+    try:
+        dados, erro = ESQUEMA_ARQUIVAMENTO(request.get_json(silent=True))
+        if erro:
+            return jsonify({'erro': erro}), 400
+        
+        dias = dados['dias'] or LOG_RETENTION_DAYS
+        max_lotes = dados['max_lotes'] or 50
+        
+        resultado = arquivar_logs(dias, max_lotes=max_lotes, log=lambda mensagem: None)
+        
+        log_atividade_seguranca(session['usuario_id'], 'administrador', 'logs_arquivados',
+                               f"Logs: {resultado['arquivados']}, retenção: {dias} dias")
+        
+        return jsonify({'sucesso': True, **resultado})
+    
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'erro': 'Erro interno do servidor'}), 500
+
+@admin_bp.route('/logs/arquivo', methods=['GET'])
+@admin_required
+def get_logs_arquivados():
+    """Consulta logs arquivados por período (sem período, lista os segmentos)"""
+    try:
+        if not request.args.get('inicio') and not request.args.get('fim'):
+            return jsonify({'segmentos': listar_segmentos()})
+        
+        try:
+            inicio, fim = _intervalo_arquivo(request.args)
+        except ValueError as e:
+            return jsonify({'erro': str(e)}), 400
+        
+        resultado = consultar_arquivo(
+            inicio, fim,
+            tipo_usuario=request.args.get('tipo_usuario'),
+            acao=request.args.get('acao'),
+            usuario_id=request.args.get('usuario_id', type=int),
+            limite=min(request.args.get('limite', 100, type=int), 1000)
+        )
+        
+        return jsonify(resultado)
+    
+    except Exception as e:
+        return jsonify({'erro': 'Erro interno do servidor'}), 500
+
+@admin_bp.route('/logs/arquivo/restaurar', methods=['POST'])
+@super_admin_required
+def restaurar_logs_arquivados():
+    """Devolve à tabela os logs arquivados de um período (apenas super admin)"""
+    try:
+        try:
+            inicio, fim = _intervalo_arquivo(request.get_json(silent=True) or {})
+        except ValueError as e:
+            return jsonify({'erro': str(e)}), 400
+        
+        resultado = restaurar_arquivo(inicio, fim)
+        
+        log_atividade_seguranca(session['usuario_id'], 'administrador', 'logs_restaurados',
+                               f"Período: {inicio.isoformat()} a {fim.isoformat()}, logs: {resultado['restaurados']}, "
+                               f"conflitos: {len(resultado['conflitos'])}")
+        
+        return jsonify({'sucesso': True, **resultado})
+    
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'erro': 'Erro interno do servidor'}), 500
@@ -0,0 +1,334 @@
+"""
+Rotas assíncronas da aplicação ASGI (src/asgi.py)
+
+Versões das rotas de src/routes/n8n.py e src/routes/integrations.py que
+chamam serviços externos (n8n, Kommo CRM, ChatGPT). As respostas e
+validações são as mesmas; as consultas ao banco rodam no pool de threads
+com `req.sincrono`, e as chamadas externas no event loop.
+"""
+from flask import session, request
+from src.models.cliente import ConfiguracaoCliente
+from src.utils.security import login_required, admin_required, cliente_required
+from src.utils.asgi import RoteadorASGI
+from src.routes.n8n import (
+    preparar_snapshot_config, configuracao_n8n, resposta_processamento,
+    ESQUEMA_TESTE_N8N, ESQUEMA_MENSAGEM, ESQUEMA_ETAPA
+)
+from src.routes.integrations import (
+    resposta_teste_kommo, resposta_teste_chatgpt, dados_lead, prompts_cliente,
+    analisar_com_chatgpt, resposta_analise,
+    ESQUEMA_TESTE_KOMMO, ESQUEMA_TESTE_CHATGPT, ESQUEMA_LEAD, ESQUEMA_ANALISE
+)
+from src import integrations
+
+rotas = RoteadorASGI()
+
+
+def _config_cliente():
+    return ConfiguracaoCliente.query.filter_by(cliente_id=session['usuario_id']).first()
+
+
+def _preparar_n8n(acao, validar):
+    """Valida a requisição e consome o evento do cliente; retorna dict ou resposta de erro"""
+    cliente_id = session['usuario_id']
+    config = _config_cliente()
+
+    if not config or not config.usar_n8n:
+        return {'erro': 'N8N não está habilitado para este cliente'}, 400
+
+    dados, erro = validar(request.get_json(silent=True))
+
+    if erro:
+        return {'erro': erro}, 400
+
+    snapshot = preparar_snapshot_config(cliente_id, config, acao)
+    if snapshot is None:
+        return {'erro': 'Limite de eventos excedido'}, 429
+
+    return {'cliente_id': cliente_id, 'dados': dados, 'snapshot': snapshot}
+
+
+def _preparar_kommo():
+    """Credenciais do Kommo CRM do cliente; retorna dict ou resposta de erro"""
+    config = _config_cliente()
+
+    if not config or not config.kommo_token or not config.kommo_domain:
+        return {'erro': 'Configurações do Kommo CRM não encontradas'}, 400
+
+    return {'domain': config.kommo_domain, 'token': config.kommo_token, 'pipeline_id': config.pipeline_id}
+
+
+# ===== n8n =====
+
+@rotas.rota('POST', '/api/n8n/test', admin_required)
+async def test_n8n(req):
+    """Testa a conexão com n8n"""
+    try:
+        dados, erro = ESQUEMA_TESTE_N8N(req.json())
+
+        if erro:
+            return {'erro': erro}, 400
+
+        base_url = dados['base_url']
+        api_key = dados['api_key'] or None
+
+        return await integrations.test_n8n_connection_async(req.http, base_url, api_key)
+
+    except Exception as e:
+        return {'erro': f'Erro interno do servidor: {str(e)}'}, 500
+
+
+@rotas.rota('POST', '/api/n8n/process/message', cliente_required)
+async def process_message(req):
+    """Processa mensagem através do workflow n8n"""
+    try:
+        preparo = await req.sincrono(_preparar_n8n, 'process_message', ESQUEMA_MENSAGEM)
+        if isinstance(preparo, tuple):
+            return preparo
+
+        processor = integrations.create_sdr_processor_async(req.http, *configuracao_n8n(), preparo['snapshot'])
+        result = await processor.process_whatsapp_message(preparo['cliente_id'], preparo['dados']['message_data'])
+
+        return resposta_processamento(result)
+
+    except Exception as e:
+        return {'erro': f'Erro interno do servidor: {str(e)}'}, 500
+
+
+@rotas.rota('POST', '/api/n8n/change-stage', cliente_required)
+async def change_lead_stage(req):
+    """Muda etapa de um lead através do workflow n8n"""
+    try:
+        preparo = await req.sincrono(_preparar_n8n, 'change_stage', ESQUEMA_ETAPA)
+        if isinstance(preparo, tuple):
+            return preparo
+
+        dados = preparo['dados']
+        processor = integrations.create_sdr_processor_async(req.http, *configuracao_n8n(), preparo['snapshot'])
+        result = await processor.change_lead_stage(
+            preparo['cliente_id'],
+            dados['lead_data'],
+            dados['new_stage']
+        )
+
+        return resposta_processamento(result)
+
+    except Exception as e:
+        return {'erro': f'Erro interno do servidor: {str(e)}'}, 500
+
+
+# ===== Testes de conexão =====
+
+async def _testar_kommo(req):
+    """Retorna (resultado, None) ou (None, mensagem de erro de validação)"""
+    dados, erro = ESQUEMA_TESTE_KOMMO(req.json())
+
+    if erro:
+        return None, erro
+
+    return await integrations.test_kommo_connection_async(req.http, dados['domain'], dados['token']), None
+
+
+async def _testar_chatgpt(req):
+    """Retorna (resultado, None) ou (None, mensagem de erro de validação)"""
+    dados, erro = ESQUEMA_TESTE_CHATGPT(req.json())
+
+    if erro:
+        return None, erro
+
+    model = dados['model'] or 'gpt-3.5-turbo'
+    return await integrations.test_chatgpt_connection_async(req.http, dados['api_key'], model), None
+
+
+@rotas.rota('POST', '/api/integrations/test/kommo', login_required)
+async def test_kommo(req):
+    """Testa a conexão com Kommo CRM"""
+    try:
+        result, erro = await _testar_kommo(req)
+        if erro:
+            return {'erro': erro}, 400
+
+        return resposta_teste_kommo(result)
+
+    except Exception as e:
+        return {'erro': 'Erro interno do servidor'}, 500
+
+
+@rotas.rota('POST', '/api/integrations/test/chatgpt', login_required)
+async def test_chatgpt(req):
+    """Testa a conexão com ChatGPT"""
+    try:
+        result, erro = await _testar_chatgpt(req)
+        if erro:
+            return {'erro': erro}, 400
+
+        return resposta_teste_chatgpt(result)
+
+    except Exception as e:
+        return {'erro': 'Erro interno do servidor'}, 500
+
+
+@rotas.rota('POST', '/api/integrations/admin/test/kommo', admin_required)
+async def admin_test_kommo(req):
+    """Testa conexão Kommo para administrador"""
+    try:
+        result, erro = await _testar_kommo(req)
+        if erro:
+            return {'erro': erro}, 400
+
+        return result
+
+    except Exception as e:
+        return {'erro': 'Erro interno do servidor'}, 500
+
+
+@rotas.rota('POST', '/api/integrations/admin/test/chatgpt', admin_required)
+async def admin_test_chatgpt(req):
+    """Testa conexão ChatGPT para administrador"""
+    try:
+        result, erro = await _testar_chatgpt(req)
+        if erro:
+            return {'erro': erro}, 400
+
+        return result
+
+    except Exception as e:
+        return {'erro': 'Erro interno do servidor'}, 500
+
+
+# ===== Kommo CRM =====
+
+@rotas.rota('GET', '/api/integrations/kommo/pipelines', cliente_required)
+async def get_kommo_pipelines(req):
+    """Obtém pipelines do Kommo CRM do cliente"""
+    try:
+        kommo = await req.sincrono(_preparar_kommo)
+        if isinstance(kommo, tuple):
+            return kommo
+
+        kommo_client = integrations.create_kommo_client_async(req.http, kommo['domain'], kommo['token'])
+        pipelines = await kommo_client.get_pipelines()
+
+        return {
+            'sucesso': True,
+            'pipelines': pipelines
+        }
+
+    except Exception as e:
+        return {'erro': f'Erro ao obter pipelines: {str(e)}'}, 500
+
+
+@rotas.rota('GET', '/api/integrations/kommo/pipeline/<int:pipeline_id>/statuses', cliente_required)
+async def get_kommo_pipeline_statuses(req, pipeline_id):
+    """Obtém status de um pipeline específico"""
+    try:
+        kommo = await req.sincrono(_preparar_kommo)
+        if isinstance(kommo, tuple):
+            return kommo
+
+        kommo_client = integrations.create_kommo_client_async(req.http, kommo['domain'], kommo['token'])
+        statuses = await kommo_client.get_pipeline_statuses(pipeline_id)
+
+        return {
+            'sucesso': True,
+            'statuses': statuses
+        }
+
+    except Exception as e:
+        return {'erro': f'Erro ao obter status do pipeline: {str(e)}'}, 500
+
+
+@rotas.rota('GET', '/api/integrations/kommo/leads', cliente_required)
+async def get_kommo_leads(req):
+    """Obtém leads do Kommo CRM"""
+    try:
+        kommo = await req.sincrono(_preparar_kommo)
+        if isinstance(kommo, tuple):
+            return kommo
+
+        # Parâmetros da requisição
+        limit = min(int(req.args.get('limit', 50)), 250)
+        page = int(req.args.get('page', 1))
+
+        kommo_client = integrations.create_kommo_client_async(req.http, kommo['domain'], kommo['token'])
+        leads = await kommo_client.get_leads(limit=limit, page=page)
+
+        return {
+            'sucesso': True,
+            'leads': leads
+        }
+
+    except Exception as e:
+        return {'erro': f'Erro ao obter leads: {str(e)}'}, 500
+
+
+@rotas.rota('POST', '/api/integrations/kommo/lead', cliente_required)
+async def create_kommo_lead(req):
+    """Cria um novo lead no Kommo CRM"""
+    try:
+        kommo = await req.sincrono(_preparar_kommo)
+        if isinstance(kommo, tuple):
+            return kommo
+
+        dados, erro = ESQUEMA_LEAD(req.json())
+
+        if erro:
+            return {'erro': erro}, 400
+
+        kommo_client = integrations.create_kommo_client_async(req.http, kommo['domain'], kommo['token'])
+        result = await kommo_client.create_lead(dados_lead(dados, kommo['pipeline_id']))
+
+        return {
+            'sucesso': True,
+            'lead': result
+        }
+
+    except Exception as e:
+        return {'erro': f'Erro ao criar lead: {str(e)}'}, 500
+
+
+# ===== ChatGPT =====
+
+def _preparar_chatgpt():
+    """Credenciais e prompts do ChatGPT do cliente; retorna dict ou resposta de erro"""
+    config = _config_cliente()
+
+    if not config or not config.chatgpt_api_key:
+        return {'erro': 'Configurações do ChatGPT não encontradas'}, 400
+
+    return {
+        'cliente_id': session['usuario_id'],
+        'api_key': config.chatgpt_api_key,
+        'model': config.chatgpt_model,
+        'prompts': prompts_cliente(config)
+    }
+
+
+@rotas.rota('POST', '/api/integrations/chatgpt/analyze', cliente_required)
+async def analyze_with_chatgpt(req):
+    """Analisa conteúdo usando ChatGPT"""
+    try:
+        chatgpt = await req.sincrono(_preparar_chatgpt)
+        if isinstance(chatgpt, tuple):
+            return chatgpt
+
+        dados, erro = ESQUEMA_ANALISE(req.json())
+
+        if erro:
+            return {'erro': erro}, 400
+
+        content = dados['content']
+        analysis_type = dados['type']
+
+        chatgpt_client = integrations.create_chatgpt_client_async(req.http, chatgpt['api_key'], chatgpt['model'])
+
+        analise = analisar_com_chatgpt(
+            chatgpt_client, analysis_type, content, dados, chatgpt['prompts'], chatgpt['cliente_id']
+        )
+        if analise is None:
+            return {'erro': 'Tipo de análise não suportado'}, 400
+
+        return resposta_analise(await analise)
+
+    except Exception as e:
+        return {'erro': f'Erro interno do servidor: {str(e)}'}, 500
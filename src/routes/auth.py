@@ -2,11 +2,32 @@ from flask import Blueprint, request, jsonify, session
 from src.models.user import db
 from src.models.cliente import Cliente, ConfiguracaoCliente
 from src.models.administrador import Administrador, LogAtividade
+from src.utils.senhas import ServicoSenhasOcupado
+from src.utils.security import principal_sessao
+from src.utils.sessao import invalidar_principal
+from src.utils.validacao import esquema, Campo
 from datetime import datetime
 import re
 
 auth_bp = Blueprint('auth', __name__)
 
+# Senhas são usadas como vieram: sem sanitização nem remoção de espaços
+ESQUEMA_LOGIN = esquema({
+    'email': Campo(str, obrigatorio=True, max=120, sanitizar=False, minusculas=True),
+    'senha': Campo(str, obrigatorio=True, max=1000, sanitizar=False, espacos=False),
+    'tipo': Campo(str, padrao='cliente', max=20),  # "cliente" ou "administrador"
+}, mensagem_obrigatorio='Email e senha são obrigatórios')
+
+ESQUEMA_CADASTRO = esquema({
+    'nome': Campo(str, obrigatorio=True, max=100),
+    'email': Campo(str, obrigatorio=True, max=120, sanitizar=False, minusculas=True),
+    'senha': Campo(str, obrigatorio=True, max=1000, sanitizar=False, espacos=False),
+    'telefone': Campo(str, padrao='', max=20),
+    'empresa': Campo(str, padrao='', max=100),
+    'cnpj': Campo(str, padrao='', max=18),
+    'razao_social': Campo(str, padrao='', max=200),
+})
+
 def validar_email(email):
     """Valida formato do email"""
     pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
@@ -43,14 +64,14 @@ def log_atividade(usuario_id, tipo_usuario, acao, detalhes=None):
 def login():
     """Login para cliente ou administrador"""
     try:
-        data = request.get_json()
+        dados, erro = ESQUEMA_LOGIN(request.get_json(silent=True))
         
-        if not data or not data.get("email") or not data.get("senha"):
-            return jsonify({"erro": "Email e senha são obrigatórios"}), 400
+        if erro:
+            return jsonify({"erro": erro}), 400
         
-        email = data["email"].lower().strip()
-        senha = data["senha"]
-        tipo_usuario = data.get("tipo", "cliente")  # "cliente" ou "administrador"
+        email = dados["email"]
+        senha = dados["senha"]
+        tipo_usuario = dados["tipo"]
         print(f"DEBUG: Tentativa de login iniciada. Email: {email}, Tipo: {tipo_usuario}")
         
         if not validar_email(email):
@@ -72,6 +93,7 @@ def login():
             session['usuario_id'] = admin.id
             session['tipo_usuario'] = 'administrador'
             session['nivel_acesso'] = admin.nivel_acesso
+            invalidar_principal('administrador', admin.id)
             
             log_atividade(admin.id, 'administrador', 'login_sucesso')
             
@@ -96,6 +118,7 @@ def login():
             # Cria sessão
             session['usuario_id'] = cliente.id
             session['tipo_usuario'] = 'cliente'
+            invalidar_principal('cliente', cliente.id)
             
             log_atividade(cliente.id, 'cliente', 'login_sucesso')
             
@@ -105,6 +128,8 @@ def login():
                 'tipo': 'cliente'
             })
     
+    except ServicoSenhasOcupado:
+        return jsonify({'erro': 'Muitas tentativas simultâneas, tente novamente em instantes'}), 503
     except Exception as e:
         return jsonify({'erro': 'Erro interno do servidor'}), 500
 
@@ -112,21 +137,19 @@ def login():
 def cadastro():
     """Cadastro de novo cliente"""
     try:
-        data = request.get_json()
-        
-        # Validações obrigatórias
-        campos_obrigatorios = ['nome', 'email', 'senha']
-        for campo in campos_obrigatorios:
-            if not data.get(campo):
-                return jsonify({'erro': f'Campo {campo} é obrigatório'}), 400
-        
-        nome = data['nome'].strip()
-        email = data['email'].lower().strip()
-        senha = data['senha']
-        telefone = data.get('telefone', '').strip()
-        empresa = data.get('empresa', '').strip()
-        cnpj = data.get('cnpj', '').strip()
-        razao_social = data.get('razao_social', '').strip()
+        # Validações obrigatórias, tipos e tamanhos
+        dados, erro = ESQUEMA_CADASTRO(request.get_json(silent=True))
+        
+        if erro:
+            return jsonify({'erro': erro}), 400
+        
+        nome = dados['nome']
+        email = dados['email']
+        senha = dados['senha']
+        telefone = dados['telefone'] or ''
+        empresa = dados['empresa'] or ''
+        cnpj = dados['cnpj'] or ''
+        razao_social = dados['razao_social'] or ''
         
         # Validações
         if len(nome) < 2:
@@ -173,6 +196,9 @@ def cadastro():
             'cliente_id': cliente.id
         }), 201
     
+    except ServicoSenhasOcupado:
+        db.session.rollback()
+        return jsonify({'erro': 'Muitas tentativas simultâneas, tente novamente em instantes'}), 503
     except Exception as e:
         db.session.rollback()
         return jsonify({'erro': 'Erro interno do servidor'}), 500
@@ -196,39 +222,19 @@ def logout():
 
 @auth_bp.route('/verificar-sessao', methods=['GET'])
 def verificar_sessao():
-    """Verifica se o usuário está logado"""
+    """Verifica se o usuário está logado (estado do usuário em cache por SESSAO_CACHE_TTL)"""
     try:
-        usuario_id = session.get('usuario_id')
-        tipo_usuario = session.get('tipo_usuario')
+        principal = principal_sessao()
         
-        if not usuario_id or not tipo_usuario:
+        if principal is None:
             return jsonify({'logado': False}), 401
         
-        if tipo_usuario == 'administrador':
-            admin = Administrador.query.filter_by(id=usuario_id, ativo=True).first()
-            if not admin:
-                session.clear()
-                return jsonify({'logado': False}), 401
-            
-            return jsonify({
-                'logado': True,
-                'usuario': admin.to_dict(),
-                'tipo': 'administrador'
-            })
-        
-        else:
-            cliente = Cliente.query.filter_by(id=usuario_id, ativo=True, aprovado=True).first()
-            if not cliente:
-                session.clear()
-                return jsonify({'logado': False}), 401
-            
-            return jsonify({
-                'logado': True,
-                'usuario': cliente.to_dict(),
-                'tipo': 'cliente'
-            })
+        return jsonify({
+            'logado': True,
+            'usuario': principal['usuario'],
+            'tipo': principal['tipo']
+        })
     
     except Exception as e:
         return jsonify({'erro': 'Erro interno do servidor'}), 500
 
-
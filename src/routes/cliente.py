@@ -2,13 +2,56 @@ from flask import Blueprint, request, jsonify, session
 from src.models.user import db
 from src.models.cliente import Cliente, ConfiguracaoCliente, TagCliente
 from src.models.administrador import ControleRequisicoes
-from src.utils.security import cliente_required, login_required, validar_entrada_segura, sanitizar_entrada, log_atividade_seguranca
+from src.utils.security import cliente_required, login_required, log_atividade_seguranca
+from src.utils.etag import etag_condicional
+from src.utils.sessao import invalidar_principal
+from src.utils.estatisticas import intervalo_de_datas, obter_uso
+from src.utils.validacao import esquema, Campo
 import json
 
 cliente_bp = Blueprint('cliente', __name__)
 
+ESQUEMA_PERFIL = esquema({
+    'nome': Campo(str, obrigatorio=True, max=100),
+    'email': Campo(str, obrigatorio=True, max=120),
+    'telefone': Campo(str, padrao='', max=20),
+    'empresa': Campo(str, padrao='', max=100),
+    'cnpj': Campo(str, padrao='', max=18),
+    'razao_social': Campo(str, padrao='', max=200),
+})
+
+# Todos os campos são opcionais: só os enviados são atualizados
+ESQUEMA_CONFIGURACOES = esquema({
+    'kommo_token': Campo(str, max=5000),
+    'kommo_domain': Campo(str, max=255),
+    'chatgpt_api_key': Campo(str, max=500),
+    'chatgpt_model': Campo(str, max=50),
+    'pipeline_id': Campo((str, int), max=50),
+    'funil_ids': Campo(list),
+    'prompt_agente_ia': Campo(str, max=50000),
+    'prompt_audio': Campo(str, max=50000),
+    'prompt_imagem': Campo(str, max=50000),
+    'aprovacao_automatica': Campo(bool),
+    'usar_n8n': Campo(bool),
+}, opcional=True)
+
+ESQUEMA_TAG = esquema({
+    'nome': Campo(str, obrigatorio=True, max=100),
+    'funil_id': Campo((str, int), obrigatorio=True, max=50),
+    'pipeline_id': Campo((str, int), obrigatorio=True, max=50),
+    'ativa': Campo(bool, padrao=True),
+})
+
+ESQUEMA_TAG_ATUALIZACAO = esquema({
+    'nome': Campo(str, max=100, vazio=False),
+    'funil_id': Campo((str, int), max=50),
+    'pipeline_id': Campo((str, int), max=50),
+    'ativa': Campo(bool),
+}, opcional=True)
+
 @cliente_bp.route('/perfil', methods=['GET'])
 @cliente_required
+@etag_condicional(lambda: session['usuario_id'])
 def get_perfil():
     """Obter perfil do cliente logado"""
     try:
@@ -39,38 +82,33 @@ def atualizar_perfil():
         if not cliente:
             return jsonify({'erro': 'Cliente não encontrado'}), 404
         
-        data = request.get_json()
-        
-        # Validar entrada
-        valido, mensagem = validar_entrada_segura(
-            data,
-            campos_obrigatorios=['nome', 'email'],
-            tamanho_max={'nome': 100, 'email': 120, 'telefone': 20, 'empresa': 100, 'cnpj': 18, 'razao_social': 200}
-        )
+        # Validar e sanitizar entrada
+        dados, erro = ESQUEMA_PERFIL(request.get_json(silent=True))
         
-        if not valido:
-            return jsonify({'erro': mensagem}), 400
+        if erro:
+            return jsonify({'erro': erro}), 400
         
         # Atualizar campos
-        cliente.nome = sanitizar_entrada(data['nome'])
-        cliente.telefone = sanitizar_entrada(data.get('telefone', ''))
-        cliente.empresa = sanitizar_entrada(data.get('empresa', ''))
-        cliente.cnpj = sanitizar_entrada(data.get('cnpj', ''))
-        cliente.razao_social = sanitizar_entrada(data.get('razao_social', ''))
+        cliente.nome = dados['nome']
+        cliente.telefone = dados['telefone']
+        cliente.empresa = dados['empresa']
+        cliente.cnpj = dados['cnpj']
+        cliente.razao_social = dados['razao_social']
         
         # Verificar se email já existe (exceto o próprio)
-        if data['email'] != cliente.email:
+        if dados['email'] != cliente.email:
             email_existente = Cliente.query.filter(
-                Cliente.email == data['email'],
+                Cliente.email == dados['email'],
                 Cliente.id != cliente_id
             ).first()
             
             if email_existente:
                 return jsonify({'erro': 'Email já está em uso'}), 409
             
-            cliente.email = sanitizar_entrada(data['email'])
+            cliente.email = dados['email']
         
         db.session.commit()
+        invalidar_principal('cliente', cliente_id)
         
         log_atividade_seguranca(cliente_id, 'cliente', 'perfil_atualizado')
         
@@ -86,6 +124,7 @@ def atualizar_perfil():
 
 @cliente_bp.route('/configuracoes', methods=['GET'])
 @cliente_required
+@etag_condicional(lambda: session['usuario_id'])
 def get_configuracoes():
     """Obter configurações do cliente"""
     try:
@@ -115,41 +154,44 @@ def atualizar_configuracoes():
             config = ConfiguracaoCliente(cliente_id=cliente_id)
             db.session.add(config)
         
-        data = request.get_json()
+        dados, erro = ESQUEMA_CONFIGURACOES(request.get_json(silent=True))
+        
+        if erro:
+            return jsonify({'erro': erro}), 400
         
         # Atualizar configurações
-        if 'kommo_token' in data:
-            config.kommo_token = sanitizar_entrada(data['kommo_token'])
+        if 'kommo_token' in dados:
+            config.kommo_token = dados['kommo_token']
         
-        if 'kommo_domain' in data:
-            config.kommo_domain = sanitizar_entrada(data['kommo_domain'])
+        if 'kommo_domain' in dados:
+            config.kommo_domain = dados['kommo_domain']
         
-        if 'chatgpt_api_key' in data:
-            config.chatgpt_api_key = sanitizar_entrada(data['chatgpt_api_key'])
+        if 'chatgpt_api_key' in dados:
+            config.chatgpt_api_key = dados['chatgpt_api_key']
         
-        if 'chatgpt_model' in data:
-            config.chatgpt_model = sanitizar_entrada(data['chatgpt_model'])
+        if 'chatgpt_model' in dados:
+            config.chatgpt_model = dados['chatgpt_model']
         
-        if 'pipeline_id' in data:
-            config.pipeline_id = sanitizar_entrada(data['pipeline_id'])
+        if 'pipeline_id' in dados:
+            config.pipeline_id = dados['pipeline_id']
         
-        if 'funil_ids' in data:
-            config.set_funil_ids_list(data['funil_ids'])
+        if 'funil_ids' in dados:
+            config.set_funil_ids_list(dados['funil_ids'])
         
-        if 'prompt_agente_ia' in data:
-            config.prompt_agente_ia = sanitizar_entrada(data['prompt_agente_ia'])
+        if 'prompt_agente_ia' in dados:
+            config.prompt_agente_ia = dados['prompt_agente_ia']
         
-        if 'prompt_audio' in data:
-            config.prompt_audio = sanitizar_entrada(data['prompt_audio'])
+        if 'prompt_audio' in dados:
+            config.prompt_audio = dados['prompt_audio']
         
-        if 'prompt_imagem' in data:
-            config.prompt_imagem = sanitizar_entrada(data['prompt_imagem'])
+        if 'prompt_imagem' in dados:
+            config.prompt_imagem = dados['prompt_imagem']
         
-        if 'aprovacao_automatica' in data:
-            config.aprovacao_automatica = bool(data['aprovacao_automatica'])
+        if 'aprovacao_automatica' in dados:
+            config.aprovacao_automatica = dados['aprovacao_automatica']
         
-        if 'usar_n8n' in data:
-            config.usar_n8n = bool(data['usar_n8n'])
+        if 'usar_n8n' in dados:
+            config.usar_n8n = dados['usar_n8n']
         
         db.session.commit()
         
@@ -167,6 +209,7 @@ def atualizar_configuracoes():
 
 @cliente_bp.route('/tags', methods=['GET'])
 @cliente_required
+@etag_condicional(lambda: session['usuario_id'])
 def get_tags():
     """Obter tags do cliente"""
     try:
@@ -184,22 +227,16 @@ def criar_tag():
     """Criar nova tag"""
     try:
         cliente_id = session['usuario_id']
-        data = request.get_json()
+        # Validar e sanitizar entrada
+        dados, erro = ESQUEMA_TAG(request.get_json(silent=True))
         
-        # Validar entrada
-        valido, mensagem = validar_entrada_segura(
-            data,
-            campos_obrigatorios=['nome', 'funil_id', 'pipeline_id'],
-            tamanho_max={'nome': 100, 'funil_id': 50, 'pipeline_id': 50}
-        )
-        
-        if not valido:
-            return jsonify({'erro': mensagem}), 400
+        if erro:
+            return jsonify({'erro': erro}), 400
         
         # Verificar se tag já existe
         tag_existente = TagCliente.query.filter_by(
             cliente_id=cliente_id,
-            nome=data['nome']
+            nome=dados['nome']
         ).first()
         
         if tag_existente:
@@ -208,10 +245,10 @@ def criar_tag():
         # Criar nova tag
         tag = TagCliente(
             cliente_id=cliente_id,
-            nome=sanitizar_entrada(data['nome']),
-            funil_id=sanitizar_entrada(data['funil_id']),
-            pipeline_id=sanitizar_entrada(data['pipeline_id']),
-            ativa=data.get('ativa', True)
+            nome=dados['nome'],
+            funil_id=dados['funil_id'],
+            pipeline_id=dados['pipeline_id'],
+            ativa=dados['ativa']
         )
         
         db.session.add(tag)
@@ -240,20 +277,23 @@ def atualizar_tag(tag_id):
         if not tag:
             return jsonify({'erro': 'Tag não encontrada'}), 404
         
-        data = request.get_json()
+        dados, erro = ESQUEMA_TAG_ATUALIZACAO(request.get_json(silent=True))
+        
+        if erro:
+            return jsonify({'erro': erro}), 400
         
         # Atualizar campos
-        if 'nome' in data:
-            tag.nome = sanitizar_entrada(data['nome'])
+        if 'nome' in dados:
+            tag.nome = dados['nome']
         
-        if 'funil_id' in data:
-            tag.funil_id = sanitizar_entrada(data['funil_id'])
+        if 'funil_id' in dados:
+            tag.funil_id = dados['funil_id']
         
-        if 'pipeline_id' in data:
-            tag.pipeline_id = sanitizar_entrada(data['pipeline_id'])
+        if 'pipeline_id' in dados:
+            tag.pipeline_id = dados['pipeline_id']
         
-        if 'ativa' in data:
-            tag.ativa = bool(data['ativa'])
+        if 'ativa' in dados:
+            tag.ativa = dados['ativa']
         
         db.session.commit()
         
@@ -328,3 +368,22 @@ def get_estatisticas():
     except Exception as e:
         return jsonify({'erro': 'Erro interno do servidor'}), 500
 
+
+@cliente_bp.route('/uso', methods=['GET'])
+@cliente_required
+def get_uso():
+    """Consumo de eventos do cliente por período"""
+    try:
+        cliente_id = session['usuario_id']
+        
+        try:
+            inicio, fim = intervalo_de_datas(request.args.get('inicio'), request.args.get('fim'))
+            uso = obter_uso(inicio, fim, cliente_id, request.args.get('granularidade'))
+        except ValueError as e:
+            return jsonify({'erro': str(e)}), 400
+        
+        uso.pop('por_cliente', None)
+        return jsonify(uso)
+    
+    except Exception as e:
+        return jsonify({'erro': 'Erro interno do servidor'}), 500
@@ -5,42 +5,146 @@ from flask import Blueprint, request, jsonify, session
 from src.models.user import db
 from src.models.cliente import ConfiguracaoCliente
 from src.models.administrador import Administrador
-from src.utils.security import login_required, admin_required, cliente_required, sanitizar_entrada
-from src.integrations.kommo_crm import test_kommo_connection, create_kommo_client
-from src.integrations.chatgpt import test_chatgpt_connection, create_chatgpt_client
+from src.utils.security import login_required, admin_required, cliente_required
+from src.utils.validacao import esquema, Campo
+from src import integrations
 
 integrations_bp = Blueprint('integrations', __name__)
 
+# Esquemas dos corpos JSON, compartilhados com as rotas assíncronas
+
+ESQUEMA_TESTE_KOMMO = esquema({
+    'domain': Campo(str, obrigatorio=True, max=255),
+    'token': Campo(str, obrigatorio=True, max=5000),
+}, mensagem_obrigatorio='Domínio e token são obrigatórios')
+
+ESQUEMA_TESTE_CHATGPT = esquema({
+    'api_key': Campo(str, obrigatorio=True, max=500),
+    'model': Campo(str, padrao='gpt-3.5-turbo', max=50),
+}, mensagem_obrigatorio='API Key é obrigatória')
+
+ESQUEMA_LEAD = esquema({
+    'name': Campo(str, obrigatorio=True, max=255),
+    'price': Campo((int, float), padrao=0),
+    'pipeline_id': Campo((str, int), max=50),
+    'status_id': Campo((str, int), max=50),
+}, mensagem_obrigatorio='Nome do lead é obrigatório')
+
+# Imagem em base64 e contexto da conversa seguem sem sanitização
+ESQUEMA_ANALISE = esquema({
+    'content': Campo(str, obrigatorio=True, max=100000),
+    'type': Campo(str, obrigatorio=True, max=20),
+    'image_base64': Campo(str, sanitizar=False, espacos=False),
+    'context': Campo(str, padrao='', sanitizar=False, espacos=False),
+}, mensagem_obrigatorio='Conteúdo e tipo são obrigatórios')
+
+# Montagem de dados e respostas compartilhada com as rotas assíncronas (src/routes/assincronas.py)
+
+def resposta_teste_kommo(result):
+    """Resposta do teste de conexão com o Kommo CRM"""
+    if result['success']:
+        return {
+            'sucesso': True,
+            'mensagem': result['message'],
+            'dados': {
+                'account_name': result.get('account_name'),
+                'account_id': result.get('account_id')
+            }
+        }, 200
+    
+    return {
+        'sucesso': False,
+        'mensagem': result['message']
+    }, 400
+
+def resposta_teste_chatgpt(result):
+    """Resposta do teste de conexão com o ChatGPT"""
+    if result['success']:
+        return {
+            'sucesso': True,
+            'mensagem': result['message'],
+            'dados': {
+                'model': result.get('model'),
+                'response': result.get('response')
+            }
+        }, 200
+    
+    return {
+        'sucesso': False,
+        'mensagem': result['message']
+    }, 400
+
+def dados_lead(dados, pipeline_padrao):
+    """Dados do lead (validados por ESQUEMA_LEAD) a criar no Kommo, sem campos vazios"""
+    lead_data = {
+        'name': dados['name'],
+        'price': dados['price'],
+        'pipeline_id': dados.get('pipeline_id', pipeline_padrao),
+        'status_id': dados.get('status_id')
+    }
+    
+    return {k: v for k, v in lead_data.items() if v is not None}
+
+def prompts_cliente(config):
+    """Prompts personalizados do cliente usados nas análises"""
+    return {
+        'audio': config.prompt_audio or None,
+        'imagem': config.prompt_imagem or None,
+        'agente': config.prompt_agente_ia or None
+    }
+
+def analisar_com_chatgpt(chatgpt_client, analysis_type, content, data, prompts, cliente_id):
+    """
+    Executa a análise do tipo pedido
+    
+    Com o cliente assíncrono o retorno é uma corrotina. Retorna None para
+    tipos não suportados.
+    """
+    if analysis_type == 'audio':
+        return chatgpt_client.analyze_audio_transcript(content, prompts['audio'])
+    if analysis_type == 'image':
+        return chatgpt_client.analyze_image_description(
+            content, prompts['imagem'], image_base64=data.get('image_base64'), cliente_id=cliente_id
+        )
+    if analysis_type == 'intent':
+        return chatgpt_client.classify_lead_intent(content)
+    if analysis_type == 'contact':
+        return chatgpt_client.extract_contact_info(content)
+    if analysis_type == 'response':
+        return chatgpt_client.generate_sales_response(data.get('context') or '', content, prompts['agente'])
+    return None
+
+def resposta_analise(result):
+    """Resposta da análise com ChatGPT"""
+    if result['success']:
+        return {
+            'sucesso': True,
+            'analise': result['response'],
+            'usage': result.get('usage')
+        }, 200
+    
+    return {
+        'sucesso': False,
+        'mensagem': f'Erro na análise: {result["error"]}'
+    }, 400
+
 @integrations_bp.route('/test/kommo', methods=['POST'])
 @login_required
 def test_kommo():
     """Testa a conexão com Kommo CRM"""
     try:
-        data = request.get_json()
+        dados, erro = ESQUEMA_TESTE_KOMMO(request.get_json(silent=True))
         
-        if not data or 'domain' not in data or 'token' not in data:
-            return jsonify({'erro': 'Domínio e token são obrigatórios'}), 400
+        if erro:
+            return jsonify({'erro': erro}), 400
         
-        domain = sanitizar_entrada(data['domain'])
-        token = sanitizar_entrada(data['token'])
+        domain = dados['domain']
+        token = dados['token']
         
         # Testa a conexão
-        result = test_kommo_connection(domain, token)
-        
-        if result['success']:
-            return jsonify({
-                'sucesso': True,
-                'mensagem': result['message'],
-                'dados': {
-                    'account_name': result.get('account_name'),
-                    'account_id': result.get('account_id')
-                }
-            })
-        else:
-            return jsonify({
-                'sucesso': False,
-                'mensagem': result['message']
-            }), 400
+        result = integrations.test_kommo_connection(domain, token)
+        
+        return resposta_teste_kommo(result)
             
     except Exception as e:
         return jsonify({'erro': 'Erro interno do servidor'}), 500
@@ -50,31 +154,18 @@ def test_kommo():
 def test_chatgpt():
     """Testa a conexão com ChatGPT"""
     try:
-        data = request.get_json()
+        dados, erro = ESQUEMA_TESTE_CHATGPT(request.get_json(silent=True))
         
-        if not data or 'api_key' not in data:
-            return jsonify({'erro': 'API Key é obrigatória'}), 400
+        if erro:
+            return jsonify({'erro': erro}), 400
         
-        api_key = sanitizar_entrada(data['api_key'])
-        model = sanitizar_entrada(data.get('model', 'gpt-3.5-turbo'))
+        api_key = dados['api_key']
+        model = dados['model'] or 'gpt-3.5-turbo'
         
         # Testa a conexão
-        result = test_chatgpt_connection(api_key, model)
-        
-        if result['success']:
-            return jsonify({
-                'sucesso': True,
-                'mensagem': result['message'],
-                'dados': {
-                    'model': result.get('model'),
-                    'response': result.get('response')
-                }
-            })
-        else:
-            return jsonify({
-                'sucesso': False,
-                'mensagem': result['message']
-            }), 400
+        result = integrations.test_chatgpt_connection(api_key, model)
+        
+        return resposta_teste_chatgpt(result)
             
     except Exception as e:
         return jsonify({'erro': 'Erro interno do servidor'}), 500
@@ -91,7 +182,7 @@ def get_kommo_pipelines():
             return jsonify({'erro': 'Configurações do Kommo CRM não encontradas'}), 400
         
         # Cria cliente Kommo
-        kommo_client = create_kommo_client(config.kommo_domain, config.kommo_token)
+        kommo_client = integrations.create_kommo_client(config.kommo_domain, config.kommo_token)
         
         # Obtém pipelines
         pipelines = kommo_client.get_pipelines()
@@ -116,7 +207,7 @@ def get_kommo_pipeline_statuses(pipeline_id):
             return jsonify({'erro': 'Configurações do Kommo CRM não encontradas'}), 400
         
         # Cria cliente Kommo
-        kommo_client = create_kommo_client(config.kommo_domain, config.kommo_token)
+        kommo_client = integrations.create_kommo_client(config.kommo_domain, config.kommo_token)
         
         # Obtém status do pipeline
         statuses = kommo_client.get_pipeline_statuses(pipeline_id)
@@ -145,7 +236,7 @@ def get_kommo_leads():
         page = int(request.args.get('page', 1))
         
         # Cria cliente Kommo
-        kommo_client = create_kommo_client(config.kommo_domain, config.kommo_token)
+        kommo_client = integrations.create_kommo_client(config.kommo_domain, config.kommo_token)
         
         # Obtém leads
         leads = kommo_client.get_leads(limit=limit, page=page)
@@ -169,24 +260,16 @@ def create_kommo_lead():
         if not config or not config.kommo_token or not config.kommo_domain:
             return jsonify({'erro': 'Configurações do Kommo CRM não encontradas'}), 400
         
-        data = request.get_json()
+        dados, erro = ESQUEMA_LEAD(request.get_json(silent=True))
         
-        if not data or 'name' not in data:
-            return jsonify({'erro': 'Nome do lead é obrigatório'}), 400
+        if erro:
+            return jsonify({'erro': erro}), 400
         
         # Cria cliente Kommo
-        kommo_client = create_kommo_client(config.kommo_domain, config.kommo_token)
+        kommo_client = integrations.create_kommo_client(config.kommo_domain, config.kommo_token)
         
         # Dados do lead
-        lead_data = {
-            'name': sanitizar_entrada(data['name']),
-            'price': data.get('price', 0),
-            'pipeline_id': data.get('pipeline_id', config.pipeline_id),
-            'status_id': data.get('status_id')
-        }
-        
-        # Remove campos vazios
-        lead_data = {k: v for k, v in lead_data.items() if v is not None}
+        lead_data = dados_lead(dados, config.pipeline_id)
         
         # Cria lead
         result = kommo_client.create_lead(lead_data)
@@ -210,46 +293,23 @@ def analyze_with_chatgpt():
         if not config or not config.chatgpt_api_key:
             return jsonify({'erro': 'Configurações do ChatGPT não encontradas'}), 400
         
-        data = request.get_json()
+        dados, erro = ESQUEMA_ANALISE(request.get_json(silent=True))
         
-        if not data or 'content' not in data or 'type' not in data:
-            return jsonify({'erro': 'Conteúdo e tipo são obrigatórios'}), 400
+        if erro:
+            return jsonify({'erro': erro}), 400
         
-        content = sanitizar_entrada(data['content'])
-        analysis_type = sanitizar_entrada(data['type'])
+        content = dados['content']
+        analysis_type = dados['type']
         
         # Cria cliente ChatGPT
-        chatgpt_client = create_chatgpt_client(config.chatgpt_api_key, config.chatgpt_model)
+        chatgpt_client = integrations.create_chatgpt_client(config.chatgpt_api_key, config.chatgpt_model)
         
         # Analisa baseado no tipo
-        if analysis_type == 'audio':
-            custom_prompt = config.prompt_audio if config.prompt_audio else None
-            result = chatgpt_client.analyze_audio_transcript(content, custom_prompt)
-        elif analysis_type == 'image':
-            custom_prompt = config.prompt_imagem if config.prompt_imagem else None
-            result = chatgpt_client.analyze_image_description(content, custom_prompt)
-        elif analysis_type == 'intent':
-            result = chatgpt_client.classify_lead_intent(content)
-        elif analysis_type == 'contact':
-            result = chatgpt_client.extract_contact_info(content)
-        elif analysis_type == 'response':
-            context = data.get('context', '')
-            custom_prompt = config.prompt_agente_ia if config.prompt_agente_ia else None
-            result = chatgpt_client.generate_sales_response(context, content, custom_prompt)
-        else:
+        result = analisar_com_chatgpt(chatgpt_client, analysis_type, content, dados, prompts_cliente(config), cliente_id)
+        if result is None:
             return jsonify({'erro': 'Tipo de análise não suportado'}), 400
         
-        if result['success']:
-            return jsonify({
-                'sucesso': True,
-                'analise': result['response'],
-                'usage': result.get('usage')
-            })
-        else:
-            return jsonify({
-                'sucesso': False,
-                'mensagem': f'Erro na análise: {result["error"]}'
-            }), 400
+        return resposta_analise(result)
             
     except Exception as e:
         return jsonify({'erro': f'Erro interno do servidor: {str(e)}'}), 500
@@ -259,15 +319,15 @@ def analyze_with_chatgpt():
 def admin_test_kommo():
     """Testa conexão Kommo para administrador"""
     try:
-        data = request.get_json()
+        dados, erro = ESQUEMA_TESTE_KOMMO(request.get_json(silent=True))
         
-        if not data or 'domain' not in data or 'token' not in data:
-            return jsonify({'erro': 'Domínio e token são obrigatórios'}), 400
+        if erro:
+            return jsonify({'erro': erro}), 400
         
-        domain = sanitizar_entrada(data['domain'])
-        token = sanitizar_entrada(data['token'])
+        domain = dados['domain']
+        token = dados['token']
         
-        result = test_kommo_connection(domain, token)
+        result = integrations.test_kommo_connection(domain, token)
         
         return jsonify(result)
         
@@ -279,15 +339,15 @@ def admin_test_kommo():
 def admin_test_chatgpt():
     """Testa conexão ChatGPT para administrador"""
     try:
-        data = request.get_json()
+        dados, erro = ESQUEMA_TESTE_CHATGPT(request.get_json(silent=True))
         
-        if not data or 'api_key' not in data:
-            return jsonify({'erro': 'API Key é obrigatória'}), 400
+        if erro:
+            return jsonify({'erro': erro}), 400
         
-        api_key = sanitizar_entrada(data['api_key'])
-        model = sanitizar_entrada(data.get('model', 'gpt-3.5-turbo'))
+        api_key = dados['api_key']
+        model = dados['model'] or 'gpt-3.5-turbo'
         
-        result = test_chatgpt_connection(api_key, model)
+        result = integrations.test_chatgpt_connection(api_key, model)
         
         return jsonify(result)
         
@@ -4,28 +4,105 @@ Rotas para gerenciar workflows n8n
 from flask import Blueprint, request, jsonify, session
 from src.models.user import db
 from src.models.cliente import Cliente, ConfiguracaoCliente
-from src.models.administrador import Administrador
-from src.utils.security import login_required, admin_required, cliente_required, sanitizar_entrada
-from src.integrations.n8n_workflows import create_sdr_processor, test_n8n_connection
+from src.models.administrador import Administrador, ControleRequisicoes
+from src.utils.security import login_required, admin_required, cliente_required
+from src.utils.media import receber_midia, MidiaExcedeLimite
+from src.utils.validacao import esquema, Campo
+from src import integrations
 import os
 
 n8n_bp = Blueprint('n8n', __name__)
 
+# Esquemas dos corpos JSON, compartilhados com as rotas assíncronas
+
+ESQUEMA_TESTE_N8N = esquema({
+    'base_url': Campo(str, obrigatorio=True, max=500),
+    'api_key': Campo(str, padrao='', max=500),
+}, mensagem_obrigatorio='URL base do n8n é obrigatória')
+
+ESQUEMA_MENSAGEM = esquema({
+    'message_data': Campo(dict, obrigatorio=True),
+}, mensagem_obrigatorio='Dados da mensagem são obrigatórios')
+
+ESQUEMA_AUDIO = esquema({
+    'audio_data': Campo(dict, obrigatorio=True),
+}, mensagem_obrigatorio='Dados do áudio são obrigatórios')
+
+ESQUEMA_IMAGEM = esquema({
+    'image_data': Campo(dict, obrigatorio=True),
+}, mensagem_obrigatorio='Dados da imagem são obrigatórios')
+
+ESQUEMA_ETAPA = esquema({
+    'lead_data': Campo(dict, obrigatorio=True),
+    'new_stage': Campo(str, obrigatorio=True, max=100),
+}, mensagem_obrigatorio='Dados do lead e nova etapa são obrigatórios')
+
+def limite_eventos_excedido(cliente_id):
+    """
+    Verifica o limite de eventos sem consumir um evento
+
+    As rotas de mídia chamam antes de ler o corpo: um cliente sem eventos
+    recebe o 429 sem que o upload seja gravado e decodificado. O evento é
+    consumido depois, por preparar_snapshot_config.
+    """
+    controle = ControleRequisicoes.query.filter_by(cliente_id=cliente_id, ativo=True).first()
+    return controle is not None and not controle.pode_usar_evento()
+
+def preparar_snapshot_config(cliente_id, config, acao):
+    """
+    Consome um evento do cliente e retorna o snapshot de configuração enviado ao n8n.
+    
+    Como o n8n não precisa mais buscar as configurações em /api/webhook/sdr,
+    o evento é contabilizado aqui. Retorna None se o limite foi excedido.
+    """
+    controle = ControleRequisicoes.query.filter_by(cliente_id=cliente_id, ativo=True).first()
+    if controle and not controle.pode_usar_evento():
+        return None
+    
+    if controle:
+        controle.usar_evento(acao)
+        db.session.commit()
+    
+    return config.to_snapshot()
+
+def configuracao_n8n():
+    """URL do n8n, URL da aplicação e chave da API do n8n (variáveis de ambiente)"""
+    return (
+        os.environ.get('N8N_BASE_URL', 'https://n8n.exemplo.com'),
+        os.environ.get('APP_BASE_URL', 'https://sdria.alveseco.com.br'),
+        os.environ.get('N8N_API_KEY')
+    )
+
+def resposta_processamento(result):
+    """Resposta das rotas de processamento a partir do resultado do workflow"""
+    if result['success']:
+        return {
+            'sucesso': True,
+            'mensagem': result['message'],
+            'resultado': result.get('result')
+        }, 200
+    
+    return {
+        'sucesso': False,
+        'mensagem': result['message'],
+        'erro': result.get('error')
+    }, 400
+
 @n8n_bp.route('/test', methods=['POST'])
 @admin_required
 def test_n8n():
     """Testa a conexão com n8n"""
     try:
-        data = request.get_json()
+        dados, erro = ESQUEMA_TESTE_N8N(request.get_json(silent=True))
         
-        if not data or 'base_url' not in data:
-            return jsonify({'erro': 'URL base do n8n é obrigatória'}), 400
+        if erro:
+            return jsonify({'erro': erro}), 400
         
-        base_url = sanitizar_entrada(data['base_url'])
-        api_key = sanitizar_entrada(data.get('api_key', '')) or None
+        base_url = dados['base_url']
+        api_key = dados['api_key'] or None
         
         # Testa a conexão
-        result = test_n8n_connection(base_url, api_key)
+        result = integrations.test_n8n_connection(base_url, api_key)
         
         return jsonify(result)
         
@@ -43,34 +120,25 @@ def process_message():
         if not config or not config.usar_n8n:
             return jsonify({'erro': 'N8N não está habilitado para este cliente'}), 400
         
-        data = request.get_json()
+        dados, erro = ESQUEMA_MENSAGEM(request.get_json(silent=True))
         
-        if not data or 'message_data' not in data:
-            return jsonify({'erro': 'Dados da mensagem são obrigatórios'}), 400
+        if erro:
+            return jsonify({'erro': erro}), 400
         
-        # Configurações do n8n (podem vir do ambiente ou configuração)
-        n8n_base_url = os.environ.get('N8N_BASE_URL', 'https://n8n.exemplo.com')
-        app_base_url = os.environ.get('APP_BASE_URL', 'https://sdria.alveseco.com.br')
-        n8n_api_key = os.environ.get('N8N_API_KEY')
+        # Configurações do n8n
+        n8n_base_url, app_base_url, n8n_api_key = configuracao_n8n()
+        
+        snapshot = preparar_snapshot_config(cliente_id, config, 'process_message')
+        if snapshot is None:
+            return jsonify({'erro': 'Limite de eventos excedido'}), 429
         
         # Cria processador SDR
-        processor = create_sdr_processor(n8n_base_url, app_base_url, n8n_api_key)
+        processor = integrations.create_sdr_processor(n8n_base_url, app_base_url, n8n_api_key, snapshot)
         
         # Processa mensagem
-        result = processor.process_whatsapp_message(cliente_id, data['message_data'])
-        
-        if result['success']:
-            return jsonify({
-                'sucesso': True,
-                'mensagem': result['message'],
-                'resultado': result.get('result')
-            })
-        else:
-            return jsonify({
-                'sucesso': False,
-                'mensagem': result['message'],
-                'erro': result.get('error')
-            }), 400
+        result = processor.process_whatsapp_message(cliente_id, dados['message_data'])
+        
+        return resposta_processamento(result)
             
     except Exception as e:
         return jsonify({'erro': f'Erro interno do servidor: {str(e)}'}), 500
@@ -86,35 +154,45 @@ def process_audio():
         if not config or not config.usar_n8n:
             return jsonify({'erro': 'N8N não está habilitado para este cliente'}), 400
         
-        data = request.get_json()
+        if limite_eventos_excedido(cliente_id):
+            return jsonify({'erro': 'Limite de eventos excedido'}), 429
         
-        if not data or 'audio_data' not in data:
-            return jsonify({'erro': 'Dados do áudio são obrigatórios'}), 400
+        # Mídias binárias, multipart ou base64 são lidas em streaming; JSON segue o fluxo legado
+        media = receber_midia('audio')
+        if media is None:
+            dados, erro = ESQUEMA_AUDIO(request.get_json(silent=True))
+            if erro:
+                return jsonify({'erro': erro}), 400
+            
+            audio_data = dados['audio_data']
+        else:
+            audio_data = media.metadata
         
         # Configurações do n8n
-        n8n_base_url = os.environ.get('N8N_BASE_URL', 'https://n8n.exemplo.com')
-        app_base_url = os.environ.get('APP_BASE_URL', 'https://sdria.alveseco.com.br')
-        n8n_api_key = os.environ.get('N8N_API_KEY')
+        n8n_base_url, app_base_url, n8n_api_key = configuracao_n8n()
+        
+        snapshot = preparar_snapshot_config(cliente_id, config, 'process_audio')
+        if snapshot is None:
+            if media is not None:
+                media.close()
+            return jsonify({'erro': 'Limite de eventos excedido'}), 429
         
         # Cria processador SDR
-        processor = create_sdr_processor(n8n_base_url, app_base_url, n8n_api_key)
+        processor = integrations.create_sdr_processor(n8n_base_url, app_base_url, n8n_api_key, snapshot)
         
         # Processa áudio
-        result = processor.process_audio_message(cliente_id, data['audio_data'])
-        
-        if result['success']:
-            return jsonify({
-                'sucesso': True,
-                'mensagem': result['message'],
-                'resultado': result.get('result')
-            })
-        else:
-            return jsonify({
-                'sucesso': False,
-                'mensagem': result['message'],
-                'erro': result.get('error')
-            }), 400
+        try:
+            result = processor.process_audio_message(cliente_id, audio_data, media)
+        finally:
+            if media is not None:
+                media.close()
+        
+        return resposta_processamento(result)
             
+    except MidiaExcedeLimite as e:
+        return jsonify({'erro': str(e)}), 413
+    except ValueError as e:
+        return jsonify({'erro': str(e)}), 400
     except Exception as e:
         return jsonify({'erro': f'Erro interno do servidor: {str(e)}'}), 500
 
@@ -129,35 +207,45 @@ def process_image():
         if not config or not config.usar_n8n:
             return jsonify({'erro': 'N8N não está habilitado para este cliente'}), 400
         
-        data = request.get_json()
+        if limite_eventos_excedido(cliente_id):
+            return jsonify({'erro': 'Limite de eventos excedido'}), 429
         
-        if not data or 'image_data' not in data:
-            return jsonify({'erro': 'Dados da imagem são obrigatórios'}), 400
+        # Mídias binárias, multipart ou base64 são lidas em streaming; JSON segue o fluxo legado
+        media = receber_midia('image')
+        if media is None:
+            dados, erro = ESQUEMA_IMAGEM(request.get_json(silent=True))
+            if erro:
+                return jsonify({'erro': erro}), 400
+            
+            image_data = dados['image_data']
+        else:
+            image_data = media.metadata
         
         # Configurações do n8n
-        n8n_base_url = os.environ.get('N8N_BASE_URL', 'https://n8n.exemplo.com')
-        app_base_url = os.environ.get('APP_BASE_URL', 'https://sdria.alveseco.com.br')
-        n8n_api_key = os.environ.get('N8N_API_KEY')
+        n8n_base_url, app_base_url, n8n_api_key = configuracao_n8n()
+        
+        snapshot = preparar_snapshot_config(cliente_id, config, 'process_image')
+        if snapshot is None:
+            if media is not None:
+                media.close()
+            return jsonify({'erro': 'Limite de eventos excedido'}), 429
         
         # Cria processador SDR
-        processor = create_sdr_processor(n8n_base_url, app_base_url, n8n_api_key)
+        processor = integrations.create_sdr_processor(n8n_base_url, app_base_url, n8n_api_key, snapshot)
         
         # Processa imagem
-        result = processor.process_image_message(cliente_id, data['image_data'])
-        
-        if result['success']:
-            return jsonify({
-                'sucesso': True,
-                'mensagem': result['message'],
-                'resultado': result.get('result')
-            })
-        else:
-            return jsonify({
-                'sucesso': False,
-                'mensagem': result['message'],
-                'erro': result.get('error')
-            }), 400
+        try:
+            result = processor.process_image_message(cliente_id, image_data, media)
+        finally:
+            if media is not None:
+                media.close()
+        
+        return resposta_processamento(result)
             
+    except MidiaExcedeLimite as e:
+        return jsonify({'erro': str(e)}), 413
+    except ValueError as e:
+        return jsonify({'erro': str(e)}), 400
     except Exception as e:
         return jsonify({'erro': f'Erro interno do servidor: {str(e)}'}), 500
 
@@ -172,38 +260,29 @@ def change_lead_stage():
         if not config or not config.usar_n8n:
             return jsonify({'erro': 'N8N não está habilitado para este cliente'}), 400
         
-        data = request.get_json()
+        dados, erro = ESQUEMA_ETAPA(request.get_json(silent=True))
         
-        if not data or 'lead_data' not in data or 'new_stage' not in data:
-            return jsonify({'erro': 'Dados do lead e nova etapa são obrigatórios'}), 400
+        if erro:
+            return jsonify({'erro': erro}), 400
         
         # Configurações do n8n
-        n8n_base_url = os.environ.get('N8N_BASE_URL', 'https://n8n.exemplo.com')
-        app_base_url = os.environ.get('APP_BASE_URL', 'https://sdria.alveseco.com.br')
-        n8n_api_key = os.environ.get('N8N_API_KEY')
+        n8n_base_url, app_base_url, n8n_api_key = configuracao_n8n()
+        
+        snapshot = preparar_snapshot_config(cliente_id, config, 'change_stage')
+        if snapshot is None:
+            return jsonify({'erro': 'Limite de eventos excedido'}), 429
         
         # Cria processador SDR
-        processor = create_sdr_processor(n8n_base_url, app_base_url, n8n_api_key)
+        processor = integrations.create_sdr_processor(n8n_base_url, app_base_url, n8n_api_key, snapshot)
         
         # Muda etapa
         result = processor.change_lead_stage(
             cliente_id, 
-            data['lead_data'], 
-            sanitizar_entrada(data['new_stage'])
+            dados['lead_data'], 
+            dados['new_stage']
         )
         
-        if result['success']:
-            return jsonify({
-                'sucesso': True,
-                'mensagem': result['message'],
-                'resultado': result.get('result')
-            })
-        else:
-            return jsonify({
-                'sucesso': False,
-                'mensagem': result['message'],
-                'erro': result.get('error')
-            }), 400
+        return resposta_processamento(result)
             
     except Exception as e:
         return jsonify({'erro': f'Erro interno do servidor: {str(e)}'}), 500
@@ -269,7 +348,11 @@ def get_n8n_status(cliente_id):
             'workflows_disponiveis': [
                 'SDR WHATSAPP IA - DINÂMICO',
                 'MUDA ETAPA IA TAG - DINÂMICO'
-            ]
+            ],
+            'imagens': {
+                **integrations.get_image_preprocessor().get_stats(cliente_id),
+                'cache_analises': integrations.get_image_analysis_cache().get_metrics(cliente_id)
+            }
         }
         
         return jsonify({
@@ -3,6 +3,8 @@ from src.models.user import db
 from src.models.cliente import Cliente, ConfiguracaoCliente
 from src.models.administrador import ControleRequisicoes
 from src.utils.security import log_atividade_seguranca
+from src.utils.etag import etag_condicional
+from src import integrations
 import json
 
 webhook_bp = Blueprint('webhook', __name__)
@@ -24,41 +26,42 @@ def webhook_sdr():
             log_atividade_seguranca(None, 'sistema', 'webhook_cliente_invalido', f'Cliente ID: {cliente_id}')
             return jsonify({'erro': 'Cliente não encontrado ou inativo'}), 404
         
-        # Verificar controle de requisições
-        controle = ControleRequisicoes.query.filter_by(cliente_id=cliente_id, ativo=True).first()
-        if controle and not controle.pode_usar_evento():
-            log_atividade_seguranca(cliente_id, 'cliente', 'webhook_limite_excedido')
-            return jsonify({'erro': 'Limite de eventos excedido'}), 429
-        
         # Obter configurações do cliente
         config = ConfiguracaoCliente.query.filter_by(cliente_id=cliente_id).first()
         if not config:
             return jsonify({'erro': 'Configurações do cliente não encontradas'}), 404
         
+        # Verificar controle de requisições (antes de expor o snapshot com as credenciais)
+        controle = ControleRequisicoes.query.filter_by(cliente_id=cliente_id, ativo=True).first()
+        if controle and not controle.pode_usar_evento():
+            log_atividade_seguranca(cliente_id, 'cliente', 'webhook_limite_excedido')
+            return jsonify({'erro': 'Limite de eventos excedido'}), 429
+        
+        snapshot = config.to_snapshot()
+        versao = integrations.config_snapshot_version(snapshot)
+
+        # Versão já conhecida pelo n8n: responde só que não mudou (sem credenciais, não consome evento)
+        if request.args.get('configVersion') == versao:
+            return jsonify({
+                'cliente_id': cliente_id,
+                'config_version': versao,
+                'config_inalterada': True
+            }), 200
+
         # Obter dados do webhook
         webhook_data = request.get_json() or request.form.to_dict()
         
         # Incrementar contador de eventos
         if controle:
-            controle.usar_evento()
+            controle.usar_evento('webhook_sdr')
             db.session.commit()
         
         # Preparar resposta com configurações do cliente
         response_data = {
             'cliente_id': cliente_id,
-            'configuracoes': {
-                'kommo_token': config.kommo_token,
-                'kommo_domain': config.kommo_domain,
-                'chatgpt_api_key': config.chatgpt_api_key,
-                'chatgpt_model': config.chatgpt_model,
-                'pipeline_id': config.pipeline_id,
-                'funil_ids': config.get_funil_ids_list(),
-                'prompt_agente_ia': config.prompt_agente_ia,
-                'prompt_audio': config.prompt_audio,
-                'prompt_imagem': config.prompt_imagem,
-                'usar_n8n': config.usar_n8n
-            },
-            'tags_permitidas': [tag.nome for tag in cliente.tags if tag.ativa],
+            'config_version': versao,
+            'config_inalterada': False,
+            **snapshot,
             'webhook_data': webhook_data
         }
         
@@ -71,6 +74,7 @@ def webhook_sdr():
         return jsonify({'erro': 'Erro interno do servidor'}), 500
 
 @webhook_bp.route('/config/<int:cliente_id>', methods=['GET'])
+@etag_condicional(lambda cliente_id: cliente_id)
 def get_config_cliente(cliente_id):
     """Endpoint para obter configurações de um cliente específico"""
     try:
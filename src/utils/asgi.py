@@ -0,0 +1,293 @@
+"""
+Ponte ASGI para a aplicação Flask
+
+AplicacaoASGI atende com handlers assíncronos as rotas registradas em um
+RoteadorASGI e repassa as demais para a aplicação Flask (WSGI), executada em
+um pool de threads. Enquanto esperam Kommo, OpenAI ou n8n (aiohttp), os
+handlers assíncronos não ocupam threads: um processo mantém milhares de
+chamadas externas em andamento.
+
+O acesso ao banco e as regras existentes (sessão, decorators de acesso,
+middleware de segurança) rodam no pool, dentro do contexto de requisição do
+Flask, com `await req.sincrono(funcao)`. Os handlers não devem alterar a
+sessão: a resposta é montada em um novo contexto de requisição.
+"""
+import asyncio
+import io
+import os
+import re
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+from src.utils.media import MEDIA_MAX_BYTES
+
+# Threads para o banco e para as rotas WSGI
+ASGI_THREADS = int(os.environ.get('ASGI_THREADS', 16))
+# Conexões HTTP simultâneas com os serviços externos (0 = sem limite)
+ASGI_HTTP_LIMIT = int(os.environ.get('ASGI_HTTP_LIMIT', 0))
+ASGI_HTTP_TIMEOUT = float(os.environ.get('ASGI_HTTP_TIMEOUT', 120))
+
+# Corpos de rotas WSGI acima deste tamanho vão para disco
+_SPOOL_BYTES = 1024 * 1024
+
+
+def construir_environ(scope, corpo, tamanho):
+    """
+    Monta o environ WSGI a partir do scope ASGI e de um arquivo com o corpo
+
+    O corpo já foi recebido por inteiro: CONTENT_LENGTH é o seu tamanho, mesmo
+    em requisições chunked (o Werkzeug ignoraria um corpo sem tamanho).
+    """
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_PROTOCOL': f"HTTP/{scope['http_version']}",
+        'SERVER_NAME': (scope.get('server') or ('localhost', 80))[0],
+        'SERVER_PORT': str((scope.get('server') or ('localhost', 80))[1]),
+        'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': corpo,
+        'wsgi.errors': io.StringIO(),
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for nome, valor in scope.get('headers', []):
+        nome = nome.decode('latin-1').upper().replace('-', '_')
+        if nome not in ('CONTENT_LENGTH', 'CONTENT_TYPE'):
+            nome = 'HTTP_' + nome
+        valor = valor.decode('latin-1')
+        environ[nome] = f'{environ[nome]},{valor}' if nome in environ else valor
+    environ.pop('HTTP_TRANSFER_ENCODING', None)
+    environ['CONTENT_LENGTH'] = str(tamanho)
+    return environ
+
+
+def _cabecalhos(lista):
+    return [(nome.lower().encode('latin-1'), valor.encode('latin-1')) for nome, valor in lista]
+
+
+class RoteadorASGI:
+    """Tabela de rotas assíncronas (mesma sintaxe de caminho do Flask, com <int:nome>)"""
+
+    def __init__(self):
+        self._rotas = []
+
+    def rota(self, metodo, caminho, protecao=None):
+        """
+        Registra um handler `async def handler(req, **parametros)`
+
+        Args:
+            metodo: Método HTTP
+            caminho: Caminho completo (ex: /api/n8n/test)
+            protecao: Decorator de acesso do Flask (ex: cliente_required)
+        """
+        padrao = re.compile('^' + re.sub(r'<int:(\w+)>', r'(?P<\1>\\d+)', caminho) + '$')
+
+        def registrar(handler):
+            self._rotas.append((metodo, padrao, protecao, handler))
+            return handler
+        return registrar
+
+    def resolver(self, metodo, caminho):
+        """Retorna (handler, protecao, parametros) ou None"""
+        for metodo_rota, padrao, protecao, handler in self._rotas:
+            if metodo_rota == metodo:
+                match = padrao.match(caminho)
+                if match:
+                    return handler, protecao, {k: int(v) for k, v in match.groupdict().items()}
+        return None
+
+
+class Requisicao:
+    """Requisição recebida por um handler assíncrono"""
+
+    def __init__(self, aplicacao, scope, corpo):
+        self._aplicacao = aplicacao
+        self.scope = scope
+        self.corpo = corpo
+        self.args = {k: v[0] for k, v in parse_qs(scope['query_string'].decode('latin-1')).items()}
+
+    @property
+    def http(self):
+        """aiohttp.ClientSession compartilhada pelo processo"""
+        return self._aplicacao.http
+
+    def environ(self):
+        return construir_environ(self.scope, io.BytesIO(self.corpo), len(self.corpo))
+
+    def json(self):
+        """Corpo JSON da requisição (None se vazio)"""
+        return self._aplicacao.flask_app.json.loads(self.corpo) if self.corpo else None
+
+    async def sincrono(self, funcao, *args):
+        """Executa `funcao` no pool de threads, no contexto de requisição do Flask"""
+        flask_app = self._aplicacao.flask_app
+        environ = self.environ()
+
+        def executar():
+            with flask_app.request_context(environ):
+                return funcao(*args)
+
+        return await asyncio.get_running_loop().run_in_executor(self._aplicacao.executor, executar)
+
+
+class AplicacaoASGI:
+    """Aplicação ASGI: rotas assíncronas do roteador e as demais via Flask (WSGI)"""
+
+    def __init__(self, flask_app, roteador):
+        self.flask_app = flask_app
+        self.roteador = roteador
+        self._http = None
+        self._executor = None
+
+    @property
+    def executor(self):
+        # Criado no primeiro uso: threads não sobrevivem a um fork do processo
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=ASGI_THREADS, thread_name_prefix='asgi')
+        return self._executor
+
+    @property
+    def http(self):
+        if self._http is None or self._http.closed:
+            import aiohttp
+            self._http = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=ASGI_HTTP_LIMIT),
+                timeout=aiohttp.ClientTimeout(total=ASGI_HTTP_TIMEOUT)
+            )
+        return self._http
+
+    async def encerrar(self):
+        if self._http is not None:
+            await self._http.close()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+        if scope['type'] != 'http':
+            return
+
+        rota = self.roteador.resolver(scope['method'], scope['path'])
+        if rota is None:
+            return await self._wsgi(scope, receive, send)
+
+        corpo = bytearray()
+        async for parte in self._corpo(receive):
+            corpo += parte
+            if len(corpo) > MEDIA_MAX_BYTES:
+                return await self._enviar(send, scope, b'', (
+                    {'erro': 'Requisição excede o tamanho máximo permitido'}, 413
+                ))
+        req = Requisicao(self, scope, bytes(corpo))
+
+        handler, protecao, parametros = rota
+        try:
+            # Middleware de segurança e decorator de acesso, como na rota Flask
+            rv = await req.sincrono(self._preprocessar, protecao)
+            if rv is None:
+                rv = await handler(req, **parametros)
+        except Exception as e:
+            self.flask_app.logger.exception(f'Erro na rota assíncrona {scope["path"]}: {e}')
+            rv = {'erro': 'Erro interno do servidor'}, 500
+        await self._enviar(send, scope, req.corpo, rv)
+
+    def _preprocessar(self, protecao):
+        rv = self.flask_app.preprocess_request()
+        if rv is None and protecao is not None:
+            rv = protecao(lambda: None)()
+        return rv
+
+    async def _enviar(self, send, scope, corpo, rv):
+        # Resposta montada pelo Flask: JSON, after_request (cabeçalhos de segurança) e cookie de sessão
+        with self.flask_app.request_context(construir_environ(scope, io.BytesIO(corpo), len(corpo))):
+            resposta = self.flask_app.process_response(self.flask_app.make_response(rv))
+        try:
+            await send({
+                'type': 'http.response.start',
+                'status': resposta.status_code,
+                'headers': _cabecalhos(resposta.headers.to_wsgi_list())
+            })
+            await send({'type': 'http.response.body', 'body': resposta.get_data()})
+        finally:
+            resposta.close()
+
+    @staticmethod
+    async def _corpo(receive):
+        while True:
+            mensagem = await receive()
+            if mensagem['type'] == 'http.disconnect':
+                return
+            yield mensagem.get('body', b'')
+            if not mensagem.get('more_body'):
+                return
+
+    async def _wsgi(self, scope, receive, send):
+        """Executa a aplicação Flask no pool de threads, enviando a resposta em streaming"""
+        corpo = tempfile.SpooledTemporaryFile(max_size=_SPOOL_BYTES)
+        tamanho = 0
+        async for parte in self._corpo(receive):
+            tamanho += len(parte)
+            # Mesmo limite do MAX_CONTENT_LENGTH, aplicado antes de gravar (corpos chunked não o declaram)
+            if tamanho > MEDIA_MAX_BYTES:
+                corpo.close()
+                return await self._enviar(send, scope, b'', (
+                    {'erro': 'Requisição excede o tamanho máximo permitido'}, 413
+                ))
+            corpo.write(parte)
+        corpo.seek(0)
+
+        loop = asyncio.get_running_loop()
+
+        def enviar(mensagem):
+            asyncio.run_coroutine_threadsafe(send(mensagem), loop).result()
+
+        def executar():
+            inicio = {}
+
+            def start_response(status, headers, exc_info=None):
+                inicio['mensagem'] = {
+                    'type': 'http.response.start',
+                    'status': int(status.split(' ', 1)[0]),
+                    'headers': _cabecalhos(headers)
+                }
+                return escrever
+
+            def escrever(dados):
+                if 'mensagem' in inicio:
+                    enviar(inicio.pop('mensagem'))
+                enviar({'type': 'http.response.body', 'body': dados, 'more_body': True})
+
+            saida = self.flask_app(construir_environ(scope, corpo, tamanho), start_response)
+            try:
+                for bloco in saida:
+                    if not bloco:
+                        continue
+                    if 'mensagem' in inicio:
+                        enviar(inicio.pop('mensagem'))
+                    enviar({'type': 'http.response.body', 'body': bloco, 'more_body': True})
+                if 'mensagem' in inicio:
+                    enviar(inicio.pop('mensagem'))
+                enviar({'type': 'http.response.body', 'body': b''})
+            finally:
+                if hasattr(saida, 'close'):
+                    saida.close()
+                corpo.close()
+
+        await loop.run_in_executor(self.executor, executar)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            mensagem = await receive()
+            if mensagem['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif mensagem['type'] == 'lifespan.shutdown':
+                await self.encerrar()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
@@ -0,0 +1,268 @@
+"""
+Lista de bloqueio de IPs (endereços e faixas CIDR, IPv4 e IPv6)
+
+As faixas vêm da tabela ips_bloqueados (API em /api/admin/ips-bloqueados) e,
+opcionalmente, de um arquivo com um CIDR por linha (IP_BLOQUEIO_ARQUIVO).
+Elas são convertidas em intervalos de inteiros ordenados e mesclados. Um
+índice pelos 16 bits mais altos do endereço limita a busca binária aos
+intervalos do mesmo bloco, e o tempo de consulta quase não varia com o
+tamanho da lista.
+
+A cada IP_BLOQUEIO_RECARGA segundos uma requisição confere se a tabela ou o
+arquivo mudaram e, se sim, reconstrói a lista sem reiniciar a aplicação.
+
+    python -m src.utils.bloqueio_ip --medir
+"""
+import argparse
+import ipaddress
+import json
+import os
+import random
+import socket
+import threading
+import time
+from bisect import bisect_left, bisect_right
+
+IP_BLOQUEIO_ARQUIVO = os.environ.get('IP_BLOQUEIO_ARQUIVO', '')
+IP_BLOQUEIO_RECARGA = float(os.environ.get('IP_BLOQUEIO_RECARGA', 10))
+
+# Bits do endereço descartados para obter o bloco do índice (16 bits mais altos)
+_DESLOCAMENTO = {4: 32 - 16, 6: 128 - 16}
+# Listas menores que isso dispensam o índice
+_MINIMO_INDICE = 1024
+
+
+def normalizar_cidr(texto):
+    """
+    Forma normalizada de um IP ou faixa (ex: '10.1.2.3/8' -> '10.0.0.0/8')
+
+    Raises:
+        ValueError: Se o texto não for um IP ou CIDR válido
+    """
+    return str(ipaddress.ip_network(str(texto).strip(), strict=False))
+
+
+def ip_para_inteiro(ip):
+    """
+    Converte um IP em (valor, versão); IPv4 mapeado em IPv6 conta como IPv4
+
+    Raises:
+        OSError, TypeError: Se o texto não for um IP válido
+    """
+    if ':' in ip:
+        valor = int.from_bytes(socket.inet_pton(socket.AF_INET6, ip.split('%', 1)[0]), 'big')
+        if valor >> 32 == 0xffff:
+            return valor & 0xffffffff, 4
+        return valor, 6
+    return int.from_bytes(socket.inet_pton(socket.AF_INET, ip), 'big'), 4
+
+
+class ListaBloqueio:
+    """Faixas bloqueadas como intervalos ordenados e disjuntos, por versão de IP"""
+
+    def __init__(self, redes=()):
+        """
+        Args:
+            redes: Objetos ipaddress.IPv4Network/IPv6Network
+        """
+        intervalos = {4: [], 6: []}
+        for rede in redes:
+            intervalos[rede.version].append((int(rede.network_address), int(rede.broadcast_address)))
+
+        self.total = sum(len(lista) for lista in intervalos.values())
+        self._inicios = {}
+        self._fins = {}
+        self._indices = {}
+        for versao, lista in intervalos.items():
+            lista.sort()
+            inicios, fins = [], []
+            for inicio, fim in lista:
+                # Faixas sobrepostas ou adjacentes viram um único intervalo
+                if fins and inicio <= fins[-1] + 1:
+                    fins[-1] = max(fins[-1], fim)
+                else:
+                    inicios.append(inicio)
+                    fins.append(fim)
+            self._inicios[versao] = inicios
+            self._fins[versao] = fins
+            # indice[k]: primeiro intervalo que começa no bloco k ou depois
+            deslocamento = _DESLOCAMENTO[versao]
+            self._indices[versao] = [
+                bisect_left(inicios, bloco << deslocamento) for bloco in range((1 << 16) + 1)
+            ] if len(inicios) >= _MINIMO_INDICE else None
+
+    def contem(self, ip):
+        """Indica se o IP está em alguma faixa (IPs inválidos não estão)"""
+        try:
+            valor, versao = ip_para_inteiro(ip)
+        except (OSError, TypeError, ValueError):
+            return False
+        indice = self._indices[versao]
+        if indice is None:
+            i = bisect_right(self._inicios[versao], valor) - 1
+        else:
+            # Intervalos do bloco ou, se nenhum começa antes do IP, o último do bloco anterior
+            bloco = valor >> _DESLOCAMENTO[versao]
+            i = bisect_right(self._inicios[versao], valor, indice[bloco], indice[bloco + 1]) - 1
+        return i >= 0 and valor <= self._fins[versao][i]
+
+    def get_stats(self):
+        return {
+            'faixas': self.total,
+            'intervalos_ipv4': len(self._inicios[4]),
+            'intervalos_ipv6': len(self._inicios[6])
+        }
+
+
+def ler_arquivo(caminho):
+    """Faixas de um arquivo (um IP ou CIDR por linha; '#' inicia comentário)"""
+    redes = []
+    with open(caminho) as f:
+        for numero, linha in enumerate(f, 1):
+            linha = linha.split('#', 1)[0].strip()
+            if not linha:
+                continue
+            try:
+                redes.append(ipaddress.ip_network(linha, strict=False))
+            except ValueError:
+                print(f'Lista de bloqueio: linha {numero} inválida em {caminho}: {linha}')
+    return redes
+
+
+class BloqueioIP:
+    """Lista de bloqueio do processo, recarregada quando a tabela ou o arquivo mudam"""
+
+    def __init__(self, arquivo=IP_BLOQUEIO_ARQUIVO, intervalo=IP_BLOQUEIO_RECARGA):
+        self.arquivo = arquivo
+        self.intervalo = intervalo
+        self.lista = ListaBloqueio()
+        self._assinatura = None
+        self._proxima_verificacao = 0.0
+        self._lock = threading.Lock()
+
+    def bloqueado(self, ip):
+        """Indica se o IP está bloqueado (usa o contexto da aplicação para consultar o banco)"""
+        if time.monotonic() >= self._proxima_verificacao:
+            self._verificar()
+        return self.lista.contem(ip)
+
+    def recarregar(self):
+        """Confere a tabela e o arquivo na próxima consulta (ex: após a API alterar a lista)"""
+        self._proxima_verificacao = 0.0
+
+    def _verificar(self):
+        # Uma thread confere; as demais seguem com a lista atual
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._proxima_verificacao = time.monotonic() + self.intervalo
+            assinatura = self._assinatura_atual()
+            if assinatura != self._assinatura:
+                self.lista = ListaBloqueio(self._carregar())
+                self._assinatura = assinatura
+        except Exception as e:
+            from src.models.user import db
+            db.session.rollback()
+            print(f'Erro ao recarregar a lista de bloqueio de IPs: {e}')
+        finally:
+            self._lock.release()
+
+    def _assinatura_atual(self):
+        from src.models.user import db
+        from src.models.administrador import IPBloqueado
+
+        tabela = tuple(db.session.query(
+            db.func.count(IPBloqueado.id), db.func.max(IPBloqueado.id), db.func.max(IPBloqueado.data_criacao)
+        ).one())
+        arquivo = None
+        if self.arquivo:
+            try:
+                stat = os.stat(self.arquivo)
+                arquivo = (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                pass
+        return tabela, arquivo
+
+    def _carregar(self):
+        from src.models.user import db
+        from src.models.administrador import IPBloqueado
+
+        redes = [ipaddress.ip_network(cidr, strict=False) for cidr in db.session.scalars(db.select(IPBloqueado.cidr))]
+        if self.arquivo and os.path.exists(self.arquivo):
+            redes.extend(ler_arquivo(self.arquivo))
+        return redes
+
+    def get_stats(self):
+        return {**self.lista.get_stats(), 'arquivo': self.arquivo or None}
+
+
+_bloqueio = None
+
+
+def get_bloqueio_ip():
+    """
+    Retorna a lista de bloqueio compartilhada do processo
+
+    Returns:
+        Instância de BloqueioIP
+    """
+    global _bloqueio
+    if _bloqueio is None:
+        _bloqueio = BloqueioIP()
+    return _bloqueio
+
+
+def _rede_aleatoria(gerador):
+    if gerador.random() < 0.5:
+        prefixo = gerador.randint(16, 32)
+        return ipaddress.ip_network((gerador.getrandbits(32), prefixo), strict=False)
+    prefixo = gerador.randint(32, 128)
+    return ipaddress.ip_network((gerador.getrandbits(128), prefixo), strict=False)
+
+
+def benchmark_bloqueio(tamanhos=(1000, 10000, 100000), consultas=200000, semente=42):
+    """
+    Tempo de construção e de consulta da lista por número de faixas
+
+    Consulta IPs aleatórios (metade IPv4, metade IPv6); o tempo por consulta
+    deve se manter praticamente constante com o crescimento da lista.
+    """
+    gerador = random.Random(semente)
+    ips = [
+        str(ipaddress.IPv4Address(gerador.getrandbits(32))) if i % 2 else
+        str(ipaddress.IPv6Address(gerador.getrandbits(128)))
+        for i in range(consultas)
+    ]
+    resultados = []
+    for tamanho in tamanhos:
+        redes = [_rede_aleatoria(gerador) for _ in range(tamanho)]
+        inicio = time.perf_counter()
+        lista = ListaBloqueio(redes)
+        construcao = time.perf_counter() - inicio
+
+        contem = lista.contem
+        inicio = time.perf_counter()
+        bloqueados = sum(1 for ip in ips if contem(ip))
+        consulta = time.perf_counter() - inicio
+
+        resultados.append({
+            'faixas': tamanho,
+            'construcao_ms': round(construcao * 1000, 1),
+            'consulta_ns': round(consulta / consultas * 1e9),
+            'bloqueados': bloqueados
+        })
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Lista de bloqueio de IPs')
+    parser.add_argument('--medir', action='store_true', help='Executa o benchmark de consultas')
+    parser.add_argument('--faixas', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--consultas', type=int, default=200000)
+    args = parser.parse_args()
+    if args.medir:
+        print(json.dumps(benchmark_bloqueio(args.faixas, args.consultas), indent=2))
+
+
+if __name__ == '__main__':
+    main()
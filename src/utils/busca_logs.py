@@ -0,0 +1,71 @@
+from src.models.user import db
+from src.models.administrador import LogAtividade
+from sqlalchemy import Integer, column, or_, text
+import re
+
+# Busca textual em acao, detalhes, ip_address e user_agent dos logs, usando o
+# índice criado pela migração 0002 (FTS5 no SQLite, tsvector no Postgres).
+# Sem índice disponível, recorre a LIKE (varredura completa).
+
+_TOKEN = re.compile(r"[\w.:\-]+", re.UNICODE)
+_fts_disponivel = {}
+
+
+def _termos(busca):
+    """Separa a busca em termos (mantém IPs e versões inteiros)"""
+    return _TOKEN.findall(busca)[:10]
+
+
+def _tem_fts(dialeto):
+    """Verifica (uma vez por banco) se o índice de busca existe"""
+    chave = str(db.engine.url)
+    if chave not in _fts_disponivel:
+        if dialeto == 'sqlite':
+            sql = "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'log_atividades_fts'"
+        else:
+            sql = ("SELECT 1 FROM information_schema.columns "
+                   "WHERE table_name = 'log_atividades' AND column_name = 'busca'")
+        _fts_disponivel[chave] = db.session.execute(text(sql)).first() is not None
+    return _fts_disponivel[chave]
+
+
+def filtrar_busca(query, busca):
+    """
+    Restringe uma consulta de LogAtividade aos logs que contêm todos os termos
+
+    Cada termo casa por prefixo ("192.168" encontra "192.168.0.1").
+
+    Args:
+        query: Consulta de LogAtividade
+        busca: Texto digitado pelo usuário
+
+    Returns:
+        Consulta filtrada
+    """
+    termos = _termos(busca)
+    if not termos:
+        return query
+
+    dialeto = db.engine.dialect.name
+
+    if dialeto == 'sqlite' and _tem_fts(dialeto):
+        # Termos entre aspas: caracteres especiais da sintaxe FTS5 viram texto
+        expressao = ' AND '.join('"{}"*'.format(t.replace('"', '""')) for t in termos)
+        return query.filter(LogAtividade.id.in_(
+            text('SELECT rowid FROM log_atividades_fts WHERE log_atividades_fts MATCH :busca')
+            .bindparams(busca=expressao).columns(column('rowid', Integer))
+        ))
+
+    if dialeto == 'postgresql' and _tem_fts(dialeto):
+        expressao = ' & '.join(re.sub(r"[^\w.:\-]", '', t) + ':*' for t in termos)
+        return query.filter(text("log_atividades.busca @@ to_tsquery('simple', :busca)").bindparams(busca=expressao))
+
+    for termo in termos:
+        padrao = f'%{termo}%'
+        query = query.filter(or_(
+            LogAtividade.acao.ilike(padrao),
+            LogAtividade.detalhes.ilike(padrao),
+            LogAtividade.ip_address.ilike(padrao),
+            LogAtividade.user_agent.ilike(padrao)
+        ))
+    return query
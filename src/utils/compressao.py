@@ -0,0 +1,95 @@
+"""
+Compressão das respostas (gzip e, com o pacote brotli instalado, br)
+
+comprimir_resposta roda no after_request. Ela comprime respostas de texto
+(JSON, HTML, CSS, JS) maiores que COMPRESSAO_MINIMO bytes, com a
+codificação negociada pelo Accept-Encoding do cliente. As respostas do
+webhook, com os prompts completos, caem de dezenas de KB para poucos KB.
+
+Respostas em streaming (exportações, que já comprimem com ?gzip=1, e
+arquivos estáticos) e respostas já codificadas não são alteradas.
+"""
+import os
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSAO_ATIVA = os.environ.get('COMPRESSAO_ATIVA', 'true').lower() == 'true'
+COMPRESSAO_MINIMO = int(os.environ.get('COMPRESSAO_MINIMO', 1024))
+COMPRESSAO_NIVEL_GZIP = int(os.environ.get('COMPRESSAO_NIVEL_GZIP', 6))
+# Níveis 4-5 do brotli comprimem mais que o gzip 6 em tempo parecido; 11 é lento demais por requisição
+COMPRESSAO_NIVEL_BROTLI = int(os.environ.get('COMPRESSAO_NIVEL_BROTLI', 5))
+
+TIPOS_COMPRIMIVEIS = frozenset({
+    'application/json', 'application/javascript', 'application/x-ndjson',
+    'text/html', 'text/css', 'text/javascript', 'text/plain', 'text/csv', 'image/svg+xml'
+})
+
+
+def comprimir(dados, codificacao):
+    """Comprime bytes em 'gzip' ou 'br'"""
+    if codificacao == 'br':
+        return brotli.compress(dados, quality=COMPRESSAO_NIVEL_BROTLI)
+    compressor = zlib.compressobj(COMPRESSAO_NIVEL_GZIP, zlib.DEFLATED, 31)  # wbits=31: formato gzip
+    return compressor.compress(dados) + compressor.flush()
+
+
+def escolher_codificacao(aceitas):
+    """
+    Codificação preferida pelo cliente entre as disponíveis
+
+    Args:
+        aceitas: request.accept_encodings
+
+    Returns:
+        'br', 'gzip' ou None
+    """
+    gzip = aceitas.quality('gzip')
+    if brotli is not None:
+        br = aceitas.quality('br')
+        # Empate fica com o brotli (menor)
+        if br > 0 and br >= gzip:
+            return 'br'
+    return 'gzip' if gzip > 0 else None
+
+
+def comprimir_resposta(response):
+    """after_request: comprime a resposta se o cliente aceitar e valer a pena"""
+    if (not COMPRESSAO_ATIVA
+            or response.direct_passthrough
+            or response.is_streamed
+            or response.status_code < 200 or response.status_code in (204, 206, 304)
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in TIPOS_COMPRIMIVEIS):
+        return response
+
+    if response.content_length is not None and response.content_length < COMPRESSAO_MINIMO:
+        return response
+
+    # A representação varia com o Accept-Encoding mesmo quando não é comprimida
+    response.vary.add('Accept-Encoding')
+
+    codificacao = escolher_codificacao(request.accept_encodings)
+    if codificacao is None:
+        return response
+
+    dados = response.get_data()
+    if len(dados) < COMPRESSAO_MINIMO:
+        return response
+
+    comprimido = comprimir(dados, codificacao)
+    if len(comprimido) >= len(dados):
+        return response
+
+    response.set_data(comprimido)
+    response.headers['Content-Encoding'] = codificacao
+    # Corpo comprimido é outra representação: a ETag forte passa a fraca
+    etag, fraca = response.get_etag()
+    if etag and not fraca:
+        response.set_etag(etag, weak=True)
+    return response
@@ -0,0 +1,218 @@
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DisconnectionError
+from sqlalchemy.pool import Pool
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+# Banco padrão quando DATABASE_URL não está definido
+SQLITE_PADRAO = f"sqlite:///{os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'app.db')}"
+
+
+def obter_database_url():
+    """Retorna a URL do banco a partir de DATABASE_URL (SQLite local como padrão)"""
+    url = os.environ.get('DATABASE_URL') or SQLITE_PADRAO
+    # Provedores como Heroku/Render ainda usam o esquema antigo postgres://
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+    return url
+
+
+def opcoes_engine(url):
+    """
+    Opções do engine SQLAlchemy de acordo com o banco.
+
+    No Postgres o pool é configurável por variáveis de ambiente:
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT e DB_POOL_RECYCLE.
+    """
+    if not url.startswith('postgresql'):
+        return {}
+
+    return {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+        # Descarta conexões derrubadas pelo servidor antes de usá-las
+        'pool_pre_ping': True
+    }
+
+
+def configurar_banco(app, db):
+    """Configura a URL e o pool do banco e inicializa o Flask-SQLAlchemy"""
+    url = obter_database_url()
+    app.config['SQLALCHEMY_DATABASE_URI'] = url
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = opcoes_engine(url)
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+
+    if url.startswith('sqlite') and SQLITE_CHECKPOINT_INTERVAL > 0:
+        with app.app_context():
+            iniciar_checkpoint_sqlite(db.engine)
+
+
+# Perfil de produção do SQLite, aplicado a cada nova conexão. Em WAL leitores
+# não bloqueiam o escritor (e vice-versa); busy_timeout faz o escritor esperar
+# o lock em vez de falhar com "database is locked".
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+SQLITE_CACHE_SIZE_KB = int(os.environ.get('SQLITE_CACHE_SIZE_KB', 20000))
+SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 128 * 1024 * 1024))
+SQLITE_CHECKPOINT_INTERVAL = int(os.environ.get('SQLITE_CHECKPOINT_INTERVAL', 300))
+
+
+def aplicar_pragmas_sqlite(dbapi_connection):
+    """Aplica WAL, synchronous=NORMAL, busy_timeout, cache e mmap a uma conexão sqlite3"""
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute('PRAGMA journal_mode=WAL')
+        # Com WAL, NORMAL só pode perder as últimas transações em queda de energia, nunca corromper
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute(f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}')
+        # Valor negativo = tamanho em KiB
+        cursor.execute(f'PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}')
+        cursor.execute(f'PRAGMA mmap_size={SQLITE_MMAP_SIZE}')
+        cursor.execute('PRAGMA temp_store=MEMORY')
+    finally:
+        cursor.close()
+
+
+@event.listens_for(Engine, 'connect')
+def _configurar_conexao_sqlite(dbapi_connection, connection_record):
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        aplicar_pragmas_sqlite(dbapi_connection)
+
+
+_checkpoint = {'engine': None, 'pid': None}
+
+
+def _executar_checkpoints(engine, intervalo):
+    while True:
+        time.sleep(intervalo)
+        try:
+            with engine.connect() as conn:
+                # TRUNCATE zera o arquivo -wal; o autocheckpoint do SQLite não
+                # consegue fazer isso enquanto houver leitores ativos
+                conn.exec_driver_sql('PRAGMA wal_checkpoint(TRUNCATE)')
+        except Exception as e:
+            print(f"Erro no checkpoint do SQLite: {e}")
+
+
+def iniciar_checkpoint_sqlite(engine, intervalo=None):
+    """Inicia (uma vez por processo) a thread que faz checkpoint periódico do WAL"""
+    if _checkpoint['pid'] == os.getpid():
+        return
+    _checkpoint.update(engine=engine, pid=os.getpid())
+    threading.Thread(
+        target=_executar_checkpoints,
+        args=(engine, intervalo or SQLITE_CHECKPOINT_INTERVAL),
+        name='sqlite-checkpoint',
+        daemon=True
+    ).start()
+
+
+def _reiniciar_checkpoint_apos_fork():
+    # Threads não sobrevivem ao fork: cada worker inicia a sua
+    if _checkpoint['engine'] is not None:
+        iniciar_checkpoint_sqlite(_checkpoint['engine'])
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reiniciar_checkpoint_apos_fork)
+
+
+def benchmark_sqlite(escritores=4, leitores=4, duracao=3.0, caminho=None):
+    """
+    Compara o modo de journal padrão com o perfil de produção sob escrita e
+    leitura concorrentes (padrão de controle_requisicoes/log_atividades)
+
+    Args:
+        escritores: Threads fazendo INSERT + COMMIT
+        leitores: Threads fazendo consultas agregadas
+        duracao: Segundos de execução de cada perfil
+        caminho: Diretório dos bancos temporários
+
+    Returns:
+        Escritas, leituras e erros "database is locked" por perfil
+    """
+    def _rodar(perfil):
+        fd, arquivo = tempfile.mkstemp(prefix=f'sdria-bench-{perfil}-', suffix='.db', dir=caminho)
+        os.close(fd)
+
+        def _conectar():
+            # timeout=0: sem espera implícita do módulo sqlite3 no perfil padrão
+            conn = sqlite3.connect(arquivo, timeout=0, check_same_thread=False)
+            if perfil == 'producao':
+                aplicar_pragmas_sqlite(conn)
+            return conn
+
+        conn = _conectar()
+        conn.execute('CREATE TABLE log (id INTEGER PRIMARY KEY, cliente_id INTEGER, detalhes TEXT)')
+        conn.commit()
+        conn.close()
+
+        resultado = {'escritas': 0, 'leituras': 0, 'erros_lock': 0}
+        lock = threading.Lock()
+        fim = time.perf_counter() + duracao
+
+        def _contar(chave):
+            with lock:
+                resultado[chave] += 1
+
+        def _escrever(n):
+            conn = _conectar()
+            while time.perf_counter() < fim:
+                try:
+                    conn.execute('INSERT INTO log (cliente_id, detalhes) VALUES (?, ?)', (n, 'x' * 200))
+                    conn.commit()
+                    _contar('escritas')
+                except sqlite3.OperationalError:
+                    conn.rollback()
+                    _contar('erros_lock')
+            conn.close()
+
+        def _ler(n):
+            conn = _conectar()
+            while time.perf_counter() < fim:
+                try:
+                    conn.execute('SELECT COUNT(*) FROM log WHERE cliente_id = ?', (n,)).fetchone()
+                    _contar('leituras')
+                except sqlite3.OperationalError:
+                    _contar('erros_lock')
+            conn.close()
+
+        threads = [threading.Thread(target=_escrever, args=(i,)) for i in range(escritores)]
+        threads += [threading.Thread(target=_ler, args=(i,)) for i in range(leitores)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        for sufixo in ('', '-wal', '-shm'):
+            if os.path.exists(arquivo + sufixo):
+                os.remove(arquivo + sufixo)
+        return resultado
+
+    return {'padrao': _rodar('padrao'), 'producao': _rodar('producao')}
+
+
+# Proteção contra fork (workers do gunicorn com --preload): uma conexão aberta
+# no processo pai não pode ser reutilizada pelo filho. Cada conexão guarda o
+# PID que a criou; no checkout por outro processo ela é descartada (sem fechar
+# o socket do pai) e o pool abre uma nova.
+
+@event.listens_for(Pool, 'connect')
+def _registrar_pid(dbapi_connection, connection_record):
+    connection_record.info['pid'] = os.getpid()
+
+
+@event.listens_for(Pool, 'checkout')
+def _verificar_pid(dbapi_connection, connection_record, connection_proxy):
+    pid = os.getpid()
+    if connection_record.info.get('pid', pid) != pid:
+        connection_record.dbapi_connection = connection_proxy.dbapi_connection = None
+        raise DisconnectionError(
+            f"Conexão criada no processo {connection_record.info['pid']} usada no processo {pid}"
+        )
@@ -0,0 +1,203 @@
+from src.models.user import db
+from src.models.cliente import Cliente, TagCliente
+from src.models.administrador import ControleRequisicoes, UsoDiario
+from sqlalchemy import case, func, select, true
+from datetime import date, datetime, timedelta
+import os
+import threading
+import time
+
+# Tempo em segundos que os contadores agregados ficam em cache por processo
+STATS_CACHE_TTL = float(os.environ.get('STATS_CACHE_TTL', 15))
+
+_lock = threading.Lock()
+_cache = {'valor': None, 'expira_em': 0.0}
+
+
+def _contar(condicao):
+    """COUNT condicional: soma 1 para as linhas que atendem a condição"""
+    return func.coalesce(func.sum(case((condicao, 1), else_=0)), 0)
+
+
+def calcular_estatisticas(agora=None):
+    """
+    Calcula todos os contadores de clientes, eventos e tags em uma única consulta
+
+    Cada tabela é agregada uma vez (agregação condicional) e os períodos usam
+    intervalos semiabertos [início, fim) sobre data_criacao, sem func.date(),
+    para que os índices possam ser usados.
+
+    Args:
+        agora: Instante de referência (padrão: utcnow)
+
+    Returns:
+        Contadores agrupados por clientes, eventos e tags
+    """
+    agora = agora or datetime.utcnow()
+    hoje = datetime.combine(agora.date(), datetime.min.time())
+    amanha = hoje + timedelta(days=1)
+    ontem = hoje - timedelta(days=1)
+    semana_passada = hoje - timedelta(days=7)
+    mes_passado = hoje - timedelta(days=30)
+
+    clientes = select(
+        func.count(Cliente.id).label('total'),
+        _contar(Cliente.ativo == True).label('ativos'),
+        _contar(Cliente.aprovado == True).label('aprovados'),
+        _contar((Cliente.aprovado == False) & (Cliente.ativo == True)).label('pendentes'),
+        _contar((Cliente.data_criacao >= hoje) & (Cliente.data_criacao < amanha)).label('novos_hoje'),
+        _contar((Cliente.data_criacao >= ontem) & (Cliente.data_criacao < hoje)).label('novos_ontem'),
+        _contar(Cliente.data_criacao >= semana_passada).label('novos_semana'),
+        _contar(Cliente.data_criacao >= mes_passado).label('novos_mes')
+    ).subquery()
+
+    eventos = select(
+        func.coalesce(func.sum(ControleRequisicoes.eventos_utilizados), 0).label('eventos_total')
+    ).subquery()
+
+    # Eventos consumidos hoje vêm do consolidado diário (índice por dia)
+    eventos_dia = select(
+        func.coalesce(func.sum(UsoDiario.eventos), 0).label('eventos_hoje')
+    ).where(UsoDiario.dia == hoje.date()).subquery()
+
+    tags = select(
+        func.count(TagCliente.id).label('tags_total'),
+        _contar(TagCliente.ativa == True).label('tags_ativas')
+    ).subquery()
+
+    # Cada subconsulta retorna uma linha: a junção sem condição também
+    consulta = select(clientes, eventos, eventos_dia, tags).select_from(
+        clientes.join(eventos, true()).join(eventos_dia, true()).join(tags, true())
+    )
+    linha = db.session.execute(consulta).one()._mapping
+
+    return {
+        'clientes': {
+            'total': linha['total'],
+            'ativos': linha['ativos'],
+            'aprovados': linha['aprovados'],
+            'pendentes': linha['pendentes'],
+            'novos': {
+                'hoje': linha['novos_hoje'],
+                'ontem': linha['novos_ontem'],
+                'semana': linha['novos_semana'],
+                'mes': linha['novos_mes']
+            }
+        },
+        'eventos': {
+            'total': linha['eventos_total'],
+            'hoje': linha['eventos_hoje']
+        },
+        'tags': {
+            'total': linha['tags_total'],
+            'ativas': linha['tags_ativas']
+        }
+    }
+
+
+GRANULARIDADES = ('dia', 'semana', 'mes')
+
+
+def _inicio_do_bucket(dia, granularidade):
+    if granularidade == 'semana':
+        return dia - timedelta(days=dia.weekday())
+    if granularidade == 'mes':
+        return dia.replace(day=1)
+    return dia
+
+
+def _proximo_bucket(dia, granularidade):
+    if granularidade == 'semana':
+        return dia + timedelta(days=7)
+    if granularidade == 'mes':
+        return (dia.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return dia + timedelta(days=1)
+
+
+def intervalo_de_datas(inicio=None, fim=None, dias_padrao=30):
+    """
+    Converte datas ISO (YYYY-MM-DD) em um intervalo [inicio, fim)
+
+    Sem datas, retorna os últimos `dias_padrao` dias incluindo hoje.
+    Levanta ValueError para datas inválidas ou intervalo vazio.
+    """
+    fim = date.fromisoformat(fim) if fim else datetime.utcnow().date() + timedelta(days=1)
+    inicio = date.fromisoformat(inicio) if inicio else fim - timedelta(days=dias_padrao)
+    if inicio >= fim:
+        raise ValueError('Data inicial deve ser anterior à final')
+    return inicio, fim
+
+
+def obter_uso(inicio: date, fim: date, cliente_id=None, granularidade=None):
+    """
+    Consumo de eventos no intervalo [inicio, fim) a partir do consolidado diário
+
+    A consulta lê no máximo uma linha por cliente/dia/ação; a série para
+    gráficos é reduzida em Python para dia, semana ou mês.
+
+    Args:
+        inicio: Primeiro dia (inclusivo)
+        fim: Último dia (exclusivo)
+        cliente_id: Restringe a um cliente (opcional)
+        granularidade: 'dia', 'semana' ou 'mes' (padrão: escolhida pelo tamanho do intervalo)
+
+    Returns:
+        Total, totais por ação, por cliente e a série temporal
+    """
+    if granularidade is None:
+        dias = (fim - inicio).days
+        granularidade = 'dia' if dias <= 62 else 'semana' if dias <= 366 else 'mes'
+    if granularidade not in GRANULARIDADES:
+        raise ValueError(f"Granularidade inválida: {granularidade}")
+
+    consulta = db.session.query(
+        UsoDiario.dia, UsoDiario.cliente_id, UsoDiario.acao, UsoDiario.eventos
+    ).filter(UsoDiario.dia >= inicio, UsoDiario.dia < fim)
+    if cliente_id is not None:
+        consulta = consulta.filter(UsoDiario.cliente_id == cliente_id)
+
+    por_acao = {}
+    por_cliente = {}
+    buckets = {}
+    for dia, cid, acao, eventos in consulta:
+        por_acao[acao] = por_acao.get(acao, 0) + eventos
+        por_cliente[cid] = por_cliente.get(cid, 0) + eventos
+        bucket = _inicio_do_bucket(dia, granularidade)
+        buckets[bucket] = buckets.get(bucket, 0) + eventos
+
+    # Série contínua (buckets sem uso com zero) para os gráficos
+    serie = []
+    bucket = _inicio_do_bucket(inicio, granularidade)
+    while bucket < fim:
+        serie.append({'inicio': bucket.isoformat(), 'eventos': buckets.get(bucket, 0)})
+        bucket = _proximo_bucket(bucket, granularidade)
+
+    return {
+        'inicio': inicio.isoformat(),
+        'fim': fim.isoformat(),
+        'granularidade': granularidade,
+        'total': sum(por_acao.values()),
+        'por_acao': por_acao,
+        'por_cliente': {str(cid): total for cid, total in por_cliente.items()},
+        'serie': serie
+    }
+
+
+def obter_estatisticas():
+    """
+    Retorna as estatísticas do cache ou recalcula após STATS_CACHE_TTL
+
+    O cálculo acontece sob lock: requisições simultâneas com o cache expirado
+    esperam o mesmo resultado em vez de repetir a consulta.
+    """
+    with _lock:
+        if _cache['valor'] is None or time.monotonic() >= _cache['expira_em']:
+            _cache['valor'] = calcular_estatisticas()
+            _cache['expira_em'] = time.monotonic() + STATS_CACHE_TTL
+        return _cache['valor']
+
+
+def invalidar_estatisticas():
+    """Descarta o cache (ex: após aprovar ou desativar um cliente)"""
+    with _lock:
+        _cache['valor'] = None
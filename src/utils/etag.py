@@ -0,0 +1,168 @@
+from functools import wraps
+from flask import request, make_response
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+import hashlib
+import os
+import secrets
+import time
+
+# Versão por cliente, incrementada a cada escrita em Cliente, ConfiguracaoCliente
+# ou TagCliente. As ETags derivam dessa versão, e uma requisição condicional é
+# respondida com 304 sem executar a view.
+#
+# A versão fica em clientes.versao_dados, incrementada na mesma transação da
+# escrita, e vale para todos os workers. Cada processo guarda a versão lida
+# por ETAG_VERSAO_TTL segundos: uma revalidação dentro desse prazo não usa o
+# banco, e uma escrita feita em outro worker aparece em até ETAG_VERSAO_TTL
+# segundos (as do próprio processo, no commit). Com REDIS_URL configurado, um
+# contador no Redis, incrementado após o commit, substitui a consulta e o cache.
+
+_epoch = ''  # Com Redis: invalida ETags emitidas antes de o Redis perder os contadores
+_redis = None
+
+REDIS_PREFIXO = 'sdria:versao_cliente'
+ETAG_VERSAO_TTL = float(os.environ.get('ETAG_VERSAO_TTL', 2))
+
+_cache_versoes = {}  # cliente_id -> (versão, expira_em)
+
+# Colunas que nenhuma resposta com ETag expõe (ou que só mudam junto com outra coluna)
+_COLUNAS_SEM_ETAG = frozenset({'senha_hash', 'versao_dados', 'data_atualizacao'})
+
+
+def _get_redis():
+    """Retorna o cliente Redis se REDIS_URL estiver configurado"""
+    global _redis, _epoch
+    if _redis is None and os.environ.get('REDIS_URL'):
+        import redis
+        _redis = redis.Redis.from_url(os.environ['REDIS_URL'])
+        _redis.setnx(f'{REDIS_PREFIXO}:epoch', secrets.token_hex(4))
+        _epoch = _redis.get(f'{REDIS_PREFIXO}:epoch').decode()
+    return _redis
+
+
+def obter_versao_cliente(cliente_id):
+    """Retorna a versão atual dos dados de um cliente"""
+    cliente_id = int(cliente_id)
+    r = _get_redis()
+    if r is not None:
+        return int(r.get(f'{REDIS_PREFIXO}:{cliente_id}') or 0)
+
+    agora = time.monotonic()
+    em_cache = _cache_versoes.get(cliente_id)
+    if em_cache is not None and em_cache[1] > agora:
+        return em_cache[0]
+
+    from src.models.user import db
+    from src.models.cliente import Cliente
+    versao = db.session.scalar(db.select(Cliente.versao_dados).where(Cliente.id == cliente_id)) or 0
+    if ETAG_VERSAO_TTL > 0:
+        _cache_versoes[cliente_id] = (versao, agora + ETAG_VERSAO_TTL)
+    return versao
+
+
+def incrementar_versao_cliente(cliente_id):
+    """Incrementa o contador do Redis de um cliente (a versão no banco sobe no flush)"""
+    _cache_versoes.pop(int(cliente_id), None)
+    r = _get_redis()
+    if r is not None:
+        r.incr(f'{REDIS_PREFIXO}:{int(cliente_id)}')
+
+
+def gerar_etag(cliente_id, recurso):
+    """Gera a ETag forte de um recurso do cliente na versão atual"""
+    chave = f'{recurso}:{cliente_id}:{obter_versao_cliente(cliente_id)}:{_epoch}'
+    return hashlib.sha1(chave.encode()).hexdigest()[:20]
+
+
+def _cliente_id_da_instancia(obj):
+    """Retorna o cliente afetado por uma instância versionada (ou None)"""
+    from src.models.cliente import Cliente, ConfiguracaoCliente, TagCliente
+
+    if isinstance(obj, Cliente):
+        return obj.id
+    if isinstance(obj, (ConfiguracaoCliente, TagCliente)):
+        return obj.cliente_id
+    return None
+
+
+def _alteracao_visivel(session, obj):
+    """Se um objeto alterado mudou alguma coluna exposta nas respostas com ETag"""
+    if not session.is_modified(obj, include_collections=False):
+        return False
+    estado = inspect(obj)
+    return any(
+        estado.attrs[coluna.key].history.has_changes()
+        for coluna in estado.mapper.column_attrs
+        if coluna.key not in _COLUNAS_SEM_ETAG
+    )
+
+
+@event.listens_for(Session, 'after_flush')
+def _coletar_clientes_alterados(session, flush_context):
+    from src.models.cliente import Cliente
+
+    ids = set()
+    # Objetos em session.dirty sem mudança efetiva (ex: rehash da senha no login) não contam
+    alterados = [obj for obj in session.dirty if _alteracao_visivel(session, obj)]
+    for obj in list(session.new) + alterados + list(session.deleted):
+        cliente_id = _cliente_id_da_instancia(obj)
+        if cliente_id is not None:
+            ids.add(cliente_id)
+    if not ids:
+        return
+
+    # Incrementa a versão na transação da escrita; data_atualizacao = ela mesma
+    # evita o onupdate (mudar uma tag não altera a data do cadastro)
+    tabela = Cliente.__table__
+    session.connection().execute(
+        tabela.update()
+        .where(tabela.c.id.in_(ids))
+        .values(versao_dados=tabela.c.versao_dados + 1, data_atualizacao=tabela.c.data_atualizacao)
+    )
+    session.info.setdefault('clientes_alterados', set()).update(ids)
+
+
+@event.listens_for(Session, 'after_commit')
+def _incrementar_versoes(session):
+    # Também chamado ao liberar um savepoint (ex: registro no dicionário de logs)
+    if session.in_nested_transaction():
+        return
+    for cliente_id in session.info.pop('clientes_alterados', ()):
+        incrementar_versao_cliente(cliente_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _descartar_versoes(session):
+    session.info.pop('clientes_alterados', None)
+
+
+def etag_condicional(obter_cliente_id):
+    """
+    Decorator para GETs com ETag derivada da versão do cliente.
+
+    Responde 304 a um If-None-Match com a ETag atual sem executar a view.
+    `obter_cliente_id` recebe os mesmos argumentos da view.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            cliente_id = obter_cliente_id(*args, **kwargs)
+            # A ETag é calculada antes da view: uma escrita concorrente gera no
+            # máximo uma revalidação extra; a versão em cache pode atrasar uma
+            # escrita de outro worker em até ETAG_VERSAO_TTL segundos
+            etag = gerar_etag(cliente_id, request.endpoint)
+
+            # Comparação fraca: com compressão a ETag volta como W/"..."
+            if request.if_none_match.contains_weak(etag):
+                response = make_response('', 304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return decorated_function
+    return decorator
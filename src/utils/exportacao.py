@@ -0,0 +1,104 @@
+from flask import Response, stream_with_context
+from src.models.user import db
+from src.utils.serializacao import serializar
+from datetime import date
+import csv
+import io
+import zlib
+
+# Exportação em streaming: as linhas são lidas do banco em lotes (yield_per,
+# cursor no servidor no Postgres), serializadas e enviadas conforme são
+# produzidas. O uso de memória independe do tamanho da exportação.
+
+EXPORT_BATCH_SIZE = 1000
+FORMATOS = {
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+}
+
+
+def _linhas(query, lote):
+    """Itera sobre os dicionários das linhas, liberando cada objeto da sessão"""
+    for item in query.yield_per(lote):
+        dados = item.to_dict()
+        # Sem o expunge o identity map manteria todas as linhas já exportadas
+        db.session.expunge(item)
+        yield dados
+
+
+def _ndjson(linhas):
+    for dados in linhas:
+        yield serializar(dados) + '\n'
+
+
+def _csv(linhas, campos):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=campos, extrasaction='ignore')
+    writer.writeheader()
+    for i, dados in enumerate(linhas, 1):
+        # Datas em ISO 8601, como no NDJSON e nas respostas da API
+        writer.writerow({k: v.isoformat() if isinstance(v, date) else v for k, v in dados.items()})
+        if i % 100 == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _agrupar(partes, tamanho=64 * 1024):
+    """Junta as partes em blocos de ~64 KiB (menos writes no socket)"""
+    bloco, total = [], 0
+    for parte in partes:
+        bloco.append(parte)
+        total += len(parte)
+        if total >= tamanho:
+            yield b''.join(bloco)
+            bloco, total = [], 0
+    if bloco:
+        yield b''.join(bloco)
+
+
+def _gzip(blocos):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: formato gzip
+    for bloco in blocos:
+        comprimido = compressor.compress(bloco)
+        if comprimido:
+            yield comprimido
+    yield compressor.flush()
+
+
+def exportar(query, formato, campos, nome, compactar=False, lote=EXPORT_BATCH_SIZE):
+    """
+    Resposta em streaming com as linhas da consulta em NDJSON ou CSV
+
+    Args:
+        query: Consulta ORM já filtrada e ordenada (itens com to_dict)
+        formato: 'ndjson' ou 'csv'
+        campos: Colunas do CSV, na ordem
+        nome: Nome base do arquivo
+        compactar: Comprime com gzip durante o envio
+        lote: Linhas lidas do banco por vez
+
+    Returns:
+        Response do Flask
+    """
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato inválido: {formato}")
+
+    mime_type, extensao = FORMATOS[formato]
+    linhas = _linhas(query, lote)
+    texto = _ndjson(linhas) if formato == 'ndjson' else _csv(linhas, campos)
+    corpo = _agrupar(parte.encode('utf-8') for parte in texto)
+
+    nome_arquivo = f'{nome}.{extensao}'
+    if compactar:
+        corpo = _gzip(corpo)
+        mime_type = 'application/gzip'
+        nome_arquivo += '.gz'
+
+    response = Response(stream_with_context(corpo), mimetype=mime_type)
+    response.headers['Content-Disposition'] = f'attachment; filename="{nome_arquivo}"'
+    response.headers['Cache-Control'] = 'no-store'
+    # Desativa o buffer de proxies (nginx/Traefik) para o download começar imediatamente
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,158 @@
+"""
+Inicialização da aplicação: bootstrap do banco e tempo de startup
+
+O bootstrap (tabelas, migrações e administrador padrão) é idempotente e deve
+rodar uma vez por deploy, antes de subir os processos web:
+
+    python -m src.utils.inicializacao            # bootstrap em DATABASE_URL
+    python -m src.utils.inicializacao --medir 5  # mede o tempo de startup
+
+Com AUTO_BOOTSTRAP=true (padrão, desenvolvimento) ele também roda a cada
+inicialização da aplicação; como não recria nada que já existe, custa poucas
+consultas.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+AUTO_BOOTSTRAP = os.environ.get('AUTO_BOOTSTRAP', 'True').lower() == 'true'
+ADMIN_EMAIL = os.environ.get('ADMIN_DEFAULT_EMAIL', 'admin@sdria.com')
+ADMIN_SENHA = os.environ.get('ADMIN_DEFAULT_PASSWORD', 'admin123')
+# Orçamento de tempo de startup (importação de src.main), em milissegundos
+STARTUP_BUDGET_MS = float(os.environ.get('STARTUP_BUDGET_MS', 1500))
+
+_RAIZ = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class RelatorioInicializacao:
+    """Marca o tempo de cada etapa da inicialização"""
+
+    def __init__(self, inicio=None):
+        self.inicio = inicio if inicio is not None else time.perf_counter()
+        self._ultimo = self.inicio
+        self.etapas = {}
+
+    def marcar(self, etapa):
+        agora = time.perf_counter()
+        self.etapas[etapa] = round((agora - self._ultimo) * 1000, 1)
+        self._ultimo = agora
+
+    @property
+    def total_ms(self):
+        return round((self._ultimo - self.inicio) * 1000, 1)
+
+    def to_dict(self):
+        from src import integrations
+        return {
+            'total_ms': self.total_ms,
+            'etapas_ms': dict(self.etapas),
+            'integracoes_carregadas': integrations.modulos_carregados()
+        }
+
+    def __str__(self):
+        etapas = ', '.join(f'{nome} {ms:.0f}' for nome, ms in self.etapas.items())
+        return f'Aplicação iniciada em {self.total_ms:.0f} ms ({etapas})'
+
+
+def criar_admin_padrao(log=print):
+    """Cria o administrador padrão se ainda não existir (nunca redefine a senha)"""
+    from src.models.user import db
+    from src.models.administrador import Administrador
+
+    if Administrador.query.filter_by(email=ADMIN_EMAIL).first():
+        return False
+
+    admin = Administrador(
+        nome='Administrador',
+        email=ADMIN_EMAIL,
+        nivel_acesso='super_admin'
+    )
+    admin.set_senha(ADMIN_SENHA)
+    db.session.add(admin)
+    db.session.commit()
+    log(f"Administrador padrão criado: {ADMIN_EMAIL} (altere a senha após o primeiro acesso)")
+    return True
+
+
+def inicializar_banco(log=print):
+    """
+    Bootstrap idempotente do banco (dentro de um app context)
+
+    Cria as tabelas novas, aplica as migrações pendentes e cria o
+    administrador padrão se necessário.
+
+    Returns:
+        Migrações aplicadas e se o administrador foi criado
+    """
+    from src.models.user import db
+    from src.migrations import aplicar_migracoes
+
+    db.create_all()
+    aplicadas = aplicar_migracoes(db.engine, log)
+    return {'migracoes': aplicadas, 'admin_criado': criar_admin_padrao(log)}
+
+
+def benchmark_inicializacao(execucoes=5, orcamento_ms=STARTUP_BUDGET_MS, env=None):
+    """
+    Mede o startup a frio: cada execução importa src.main em um processo novo
+
+    O bootstrap fica desligado (AUTO_BOOTSTRAP=false), como em produção.
+
+    Returns:
+        Tempos em ms (mediana, máximo), etapas da última execução e se a
+        mediana ficou dentro do orçamento
+    """
+    codigo = (
+        'import json, sys, time\n'
+        f'sys.path.insert(0, {_RAIZ!r})\n'
+        'inicio = time.perf_counter()\n'
+        'import src.main\n'
+        'total = (time.perf_counter() - inicio) * 1000\n'
+        'print(json.dumps({"total_ms": total, **{k: v for k, v in '
+        'src.main.app.extensions["inicializacao"].to_dict().items() if k != "total_ms"}}))\n'
+    )
+    ambiente = {**os.environ, 'AUTO_BOOTSTRAP': 'false', **(env or {})}
+
+    tempos, ultimo = [], None
+    for _ in range(execucoes):
+        saida = subprocess.run([sys.executable, '-c', codigo], env=ambiente, cwd=_RAIZ,
+                               capture_output=True, text=True, check=True).stdout
+        ultimo = json.loads(saida.strip().splitlines()[-1])
+        tempos.append(ultimo['total_ms'])
+
+    mediana = statistics.median(tempos)
+    return {
+        'mediana_ms': round(mediana, 1),
+        'maximo_ms': round(max(tempos), 1),
+        'orcamento_ms': orcamento_ms,
+        'dentro_do_orcamento': mediana <= orcamento_ms,
+        'etapas_ms': ultimo['etapas_ms'],
+        'integracoes_carregadas': ultimo['integracoes_carregadas']
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bootstrap do banco e medição do startup')
+    parser.add_argument('--medir', type=int, metavar='N', help='Mede o startup em N execuções (sem bootstrap)')
+    args = parser.parse_args()
+
+    if args.medir:
+        resultado = benchmark_inicializacao(args.medir)
+        print(json.dumps(resultado, indent=2, ensure_ascii=False))
+        sys.exit(0 if resultado['dentro_do_orcamento'] else 1)
+
+    # A importação de src.main não deve repetir o bootstrap
+    os.environ['AUTO_BOOTSTRAP'] = 'false'
+    sys.path.insert(0, _RAIZ)
+    from src.main import app
+    with app.app_context():
+        resultado = inicializar_banco()
+    print(f"Bootstrap concluído: {len(resultado['migracoes'])} migração(ões) aplicada(s)")
+
+
+if __name__ == '__main__':
+    main()
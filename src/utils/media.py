@@ -0,0 +1,238 @@
+from flask import Request, request
+import base64
+import binascii
+import io
+import mmap
+import os
+import shutil
+import tempfile
+
+# Limite de tamanho para mídias recebidas (também aplicado como MAX_CONTENT_LENGTH)
+MEDIA_MAX_BYTES = int(os.environ.get('MEDIA_MAX_BYTES', 25 * 1024 * 1024))
+# Acima deste tamanho a mídia é gravada em arquivo temporário
+MEDIA_SPOOL_BYTES = int(os.environ.get('MEDIA_SPOOL_BYTES', 1024 * 1024))
+CHUNK_SIZE = 64 * 1024
+
+TIPOS_BINARIOS = ('audio/', 'image/', 'video/', 'application/octet-stream')
+TIPOS_BASE64 = ('text/plain',)
+
+
+class MidiaExcedeLimite(Exception):
+    """Mídia maior que MEDIA_MAX_BYTES"""
+
+
+class RequisicaoMidia(Request):
+    """
+    Request que guarda os arquivos multipart já no formato do SpooledMedia
+
+    Partes até MEDIA_SPOOL_BYTES ficam em memória e as maiores vão direto para
+    um arquivo temporário com nome (o padrão do Werkzeug não tem caminho), que
+    receber_midia usa sem copiar de novo.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        tamanho = content_length or total_content_length
+        if tamanho is not None and tamanho <= MEDIA_SPOOL_BYTES:
+            return io.BytesIO()
+        return tempfile.NamedTemporaryFile(prefix='sdria-midia-')
+
+
+class SpooledMedia:
+    """Conteúdo de mídia mantido em memória até MEDIA_SPOOL_BYTES e em arquivo temporário acima disso"""
+
+    def __init__(self, mime_type=None, filename=None, metadata=None,
+                 spool_bytes=MEDIA_SPOOL_BYTES, max_bytes=MEDIA_MAX_BYTES):
+        self.mime_type = mime_type or 'application/octet-stream'
+        self.filename = filename or 'midia'
+        self.metadata = metadata or {}
+        self.spool_bytes = spool_bytes
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._file = io.BytesIO()
+        self._path = None
+
+    @classmethod
+    def do_upload(cls, arquivo, metadata=None, max_bytes=MEDIA_MAX_BYTES):
+        """
+        Usa o arquivo de um upload multipart (FileStorage) sem copiá-lo
+
+        Com RequisicaoMidia o stream é um BytesIO ou um arquivo temporário com
+        nome, usado diretamente como caminho da mídia.
+        """
+        stream = arquivo.stream
+        stream.seek(0, os.SEEK_END)
+        tamanho = stream.tell()
+        if tamanho > max_bytes:
+            raise MidiaExcedeLimite(f'Mídia excede o limite de {max_bytes} bytes')
+
+        media = cls(arquivo.mimetype, arquivo.filename, metadata, max_bytes=max_bytes)
+        media.size = tamanho
+        media._file = stream
+        nome = getattr(stream, 'name', None)
+        if isinstance(nome, str) and os.path.isfile(nome):
+            media._path = nome
+        return media
+
+    def write(self, data):
+        """Acrescenta dados, gravando em disco ao passar do limite de memória"""
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            raise MidiaExcedeLimite(f'Mídia excede o limite de {self.max_bytes} bytes')
+        if self._path is None and self.size > self.spool_bytes:
+            self._rollover()
+        self._file.write(data)
+
+    def _rollover(self):
+        fd, self._path = tempfile.mkstemp(prefix='sdria-midia-')
+        arquivo = os.fdopen(fd, 'w+b')
+        shutil.copyfileobj(self.open(), arquivo, CHUNK_SIZE)
+        self._file.close()
+        self._file = arquivo
+
+    @property
+    def in_memory(self):
+        return self._path is None
+
+    @property
+    def path(self):
+        """Caminho do arquivo em disco (grava o conteúdo em disco se ainda estiver em memória)"""
+        if self._path is None:
+            self._rollover()
+        self._file.flush()
+        return self._path
+
+    def open(self):
+        """Retorna o arquivo posicionado no início"""
+        self._file.flush()
+        self._file.seek(0)
+        return self._file
+
+    def iter_chunks(self, chunk_size=CHUNK_SIZE):
+        """Itera sobre o conteúdo em blocos"""
+        arquivo = self.open()
+        while True:
+            chunk = arquivo.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+    def getbuffer(self):
+        """Buffer somente leitura sem cópia (memoryview ou mmap do arquivo)"""
+        if self.in_memory and hasattr(self._file, 'getbuffer'):
+            return self._file.getbuffer().toreadonly()
+        if self.in_memory:
+            # Stream sem caminho nem getbuffer (ex: SpooledTemporaryFile do Werkzeug)
+            return memoryview(self.open().read())
+        if self.size == 0:
+            return memoryview(b'')
+        self._file.flush()
+        return mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        self._file.close()
+        if self._path:
+            try:
+                os.remove(self._path)
+            except OSError:
+                pass
+            self._path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Base64StreamDecoder:
+    """Decodifica base64 em blocos, sem materializar o texto completo"""
+
+    def __init__(self):
+        self._resto = b''
+        self._inicio = True
+
+    def feed(self, chunk):
+        """Decodifica o bloco recebido e retorna os bytes já completos"""
+        if self._inicio:
+            chunk, self._resto = (self._resto + chunk).lstrip(), b''
+            # Aceita data URLs (data:image/png;base64,....); o prefixo pode chegar em partes
+            prefixo = b'data:'.startswith(chunk) or chunk.startswith(b'data:')
+            if prefixo and b',' not in chunk:
+                if len(chunk) > 1024:
+                    raise ValueError('Conteúdo base64 inválido')
+                self._resto = chunk
+                return b''
+            if prefixo:
+                chunk = chunk.split(b',', 1)[1]
+            self._inicio = False
+
+        dados = self._resto + b''.join(chunk.split())
+        corte = len(dados) - len(dados) % 4
+        self._resto = dados[corte:]
+        try:
+            return base64.b64decode(dados[:corte], validate=True)
+        except binascii.Error:
+            raise ValueError('Conteúdo base64 inválido')
+
+    def flush(self):
+        """Decodifica o que restou (com padding)"""
+        if not self._resto:
+            return b''
+        try:
+            return base64.b64decode(self._resto + b'=' * (-len(self._resto) % 4))
+        except binascii.Error:
+            raise ValueError('Conteúdo base64 inválido')
+
+
+def verificar_tamanho_requisicao(max_bytes=MEDIA_MAX_BYTES):
+    """Rejeita a requisição antes de ler o corpo quando o Content-Length excede o limite"""
+    if request.content_length is not None and request.content_length > max_bytes:
+        raise MidiaExcedeLimite(f'Requisição excede o limite de {max_bytes} bytes')
+
+
+def _copiar_stream(origem, media, decoder=None):
+    while True:
+        chunk = origem.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        media.write(decoder.feed(chunk) if decoder else chunk)
+    if decoder:
+        media.write(decoder.flush())
+    return media
+
+
+def receber_midia(campo):
+    """
+    Lê a mídia da requisição em blocos, sem carregá-la inteira em memória.
+
+    Formatos aceitos:
+    - multipart/form-data com o arquivo no campo `campo` (metadados nos demais campos)
+    - corpo binário (audio/*, image/*, application/octet-stream), metadados na query string
+    - corpo em base64 (text/plain ou Content-Transfer-Encoding: base64), decodificado incrementalmente
+
+    Retorna None para corpos JSON, que seguem o fluxo legado.
+    """
+    verificar_tamanho_requisicao()
+    mime_type = request.mimetype or ''
+
+    if mime_type == 'multipart/form-data':
+        arquivo = request.files.get(campo)
+        if not arquivo:
+            return None
+        # O Werkzeug já gravou o arquivo (ver RequisicaoMidia); só é reaproveitado
+        return SpooledMedia.do_upload(arquivo, request.form.to_dict())
+
+    base64_body = (mime_type.startswith(TIPOS_BASE64) or
+                   request.headers.get('Content-Transfer-Encoding', '').lower() == 'base64')
+    if not base64_body and not mime_type.startswith(TIPOS_BINARIOS):
+        return None
+
+    metadata = request.args.to_dict()
+    media = SpooledMedia(metadata.pop('mime_type', None) or (None if base64_body else mime_type),
+                         metadata.pop('filename', None), metadata)
+    try:
+        return _copiar_stream(request.stream, media, Base64StreamDecoder() if base64_body else None)
+    except Exception:
+        media.close()
+        raise
+
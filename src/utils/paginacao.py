@@ -0,0 +1,124 @@
+from flask import request
+from sqlalchemy import and_, func, or_, select, text
+from datetime import datetime
+import base64
+import binascii
+import json
+
+# Paginação por chave (keyset) em (data_criacao, id), do mais recente para o
+# mais antigo. Em vez de OFFSET, cada página filtra a partir da última linha
+# da anterior, então a página 1000 custa o mesmo que a primeira.
+
+LIMITE_CONTAGEM_APROXIMADA = 10000
+
+
+def codificar_cursor(data_criacao, id, direcao):
+    """Gera um cursor opaco (base64 url-safe) para a linha informada"""
+    dados = {'d': data_criacao.isoformat() if data_criacao else None, 'i': id, 'r': direcao}
+    return base64.urlsafe_b64encode(json.dumps(dados, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """Retorna (data_criacao, id, direcao) de um cursor; ValueError se inválido"""
+    try:
+        dados = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        data_criacao = datetime.fromisoformat(dados['d']) if dados['d'] else None
+        id = int(dados['i'])
+        direcao = dados['r']
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise ValueError('Cursor inválido')
+    if direcao not in ('next', 'prev'):
+        raise ValueError('Cursor inválido')
+    return data_criacao, id, direcao
+
+
+def paginar_por_cursor(query, modelo, cursor=None, per_page=50):
+    """
+    Pagina uma consulta por (data_criacao, id) decrescente
+
+    Args:
+        query: Consulta já filtrada (sem order_by)
+        modelo: Modelo com colunas data_criacao e id
+        cursor: Cursor recebido de uma página anterior (None = primeira página)
+        per_page: Itens por página
+
+    Returns:
+        Itens da página e os cursores da próxima e da anterior (None quando não houver)
+    """
+    data_col, id_col = modelo.data_criacao, modelo.id
+    direcao = 'next'
+
+    if cursor:
+        data_criacao, id, direcao = decodificar_cursor(cursor)
+        if direcao == 'next':
+            query = query.filter(or_(data_col < data_criacao, and_(data_col == data_criacao, id_col < id)))
+        else:
+            query = query.filter(or_(data_col > data_criacao, and_(data_col == data_criacao, id_col > id)))
+
+    if direcao == 'next':
+        query = query.order_by(data_col.desc(), id_col.desc())
+    else:
+        query = query.order_by(data_col.asc(), id_col.asc())
+
+    # Uma linha a mais indica se existe outra página na mesma direção
+    itens = query.limit(per_page + 1).all()
+    mais = len(itens) > per_page
+    itens = itens[:per_page]
+    if direcao == 'prev':
+        itens.reverse()
+
+    tem_proxima = mais if direcao == 'next' else cursor is not None
+    tem_anterior = cursor is not None if direcao == 'next' else mais
+
+    return {
+        'itens': itens,
+        'next_cursor': codificar_cursor(itens[-1].data_criacao, itens[-1].id, 'next') if itens and tem_proxima else None,
+        'prev_cursor': codificar_cursor(itens[0].data_criacao, itens[0].id, 'prev') if itens and tem_anterior else None
+    }
+
+
+def contagem_aproximada(query, limite=LIMITE_CONTAGEM_APROXIMADA):
+    """
+    Estima o total de linhas de uma consulta sem um COUNT(*) completo
+
+    No Postgres usa a estimativa do planejador (EXPLAIN); nos demais bancos
+    conta até `limite` linhas.
+
+    Returns:
+        Total estimado e se o valor é exato
+    """
+    sessao = query.session
+    if sessao.get_bind().dialect.name == 'postgresql':
+        compilado = query.statement.compile(sessao.get_bind(), compile_kwargs={'literal_binds': True})
+        plano = sessao.execute(text(f'EXPLAIN (FORMAT JSON) {compilado}')).scalar()
+        if isinstance(plano, str):
+            plano = json.loads(plano)
+        return {'total': int(plano[0]['Plan']['Plan Rows']), 'exato': False}
+
+    subconsulta = query.with_entities(query.column_descriptions[0]['entity'].id).limit(limite + 1).subquery()
+    total = sessao.execute(select(func.count()).select_from(subconsulta)).scalar()
+    return {'total': min(total, limite), 'exato': total <= limite}
+
+
+def usar_paginacao_por_cursor():
+    """Modo cursor quando a requisição traz `cursor` ou `paginacao=cursor`"""
+    return 'cursor' in request.args or request.args.get('paginacao') == 'cursor'
+
+
+def resposta_por_cursor(query, modelo, chave, per_page):
+    """
+    Monta a resposta de uma listagem paginada por cursor
+
+    Com `total_aproximado=true` na query string inclui a estimativa de total.
+    Levanta ValueError para cursor inválido.
+    """
+    pagina = paginar_por_cursor(query, modelo, request.args.get('cursor') or None, per_page)
+    resposta = {
+        chave: [item.to_dict() for item in pagina['itens']],
+        'next_cursor': pagina['next_cursor'],
+        'prev_cursor': pagina['prev_cursor'],
+        'per_page': per_page
+    }
+    if request.args.get('total_aproximado', '').lower() in ('1', 'true'):
+        resposta['total_aproximado'] = contagem_aproximada(query)
+    return resposta
@@ -0,0 +1,300 @@
+"""
+Retenção e arquivamento de log_atividades
+
+Logs mais antigos que LOG_RETENTION_DAYS são movidos para segmentos mensais
+comprimidos (logs-AAAA-MM.ndjson.gz) em LOG_ARCHIVE_DIR e removidos da tabela
+em lotes pequenos, cada um em sua própria transação, sem locks longos.
+
+Cada lote é gravado (e sincronizado em disco) antes de ser apagado do banco:
+uma interrupção no meio pode no máximo duplicar linhas no arquivo, nunca
+perdê-las. As consultas ao arquivo descartam linhas repetidas.
+
+Uma linha arquivada é identificada por (id, data_criacao). Os ids da tabela
+não são reutilizados (AUTOINCREMENT, migração 0005), mas bancos anteriores a
+ela podem ter ids arquivados já ocupados por logs novos: na restauração essas
+linhas ficam no arquivo e são informadas como conflitos.
+
+Uso (ex: cron diário):
+    python -m src.utils.retencao_logs [--dias 90] [--lote 1000]
+"""
+from src.models.user import db
+from src.models.administrador import LogAtividade
+from src.utils.serializacao import serializar
+from datetime import datetime, timedelta
+import argparse
+import glob
+import gzip
+import json
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+LOG_RETENTION_DAYS = int(os.environ.get('LOG_RETENTION_DAYS', 90))
+LOG_ARCHIVE_DIR = os.environ.get('LOG_ARCHIVE_DIR') or os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), 'database', 'arquivo_logs'
+)
+LOG_ARCHIVE_BATCH = int(os.environ.get('LOG_ARCHIVE_BATCH', 1000))
+
+
+def _segmento(diretorio, mes):
+    return os.path.join(diretorio, f'logs-{mes}.ndjson.gz')
+
+
+def _mes(data_iso):
+    return data_iso[:7] if data_iso else '0000-00'
+
+
+class _Trava:
+    """Lock exclusivo no diretório do arquivo (um arquivamento/restauração por vez)"""
+
+    def __init__(self, diretorio):
+        os.makedirs(diretorio, exist_ok=True)
+        self._arquivo = open(os.path.join(diretorio, '.lock'), 'w')
+
+    def __enter__(self):
+        if fcntl:
+            fcntl.flock(self._arquivo, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl:
+            fcntl.flock(self._arquivo, fcntl.LOCK_UN)
+        self._arquivo.close()
+
+
+def arquivar_logs(dias=LOG_RETENTION_DAYS, lote=LOG_ARCHIVE_BATCH, diretorio=LOG_ARCHIVE_DIR,
+                  pausa=0.0, max_lotes=None, log=print):
+    """
+    Move os logs mais antigos que `dias` para o arquivo comprimido
+
+    Args:
+        dias: Idade mínima (em dias) dos logs arquivados
+        lote: Linhas por transação
+        diretorio: Diretório dos segmentos
+        pausa: Segundos entre lotes (alivia a concorrência com as requisições)
+        max_lotes: Limite de lotes nesta execução (None = até acabar)
+        log: Função de log
+
+    Returns:
+        Total de linhas arquivadas e segmentos alterados
+    """
+    limite = datetime.utcnow() - timedelta(days=dias)
+    total = 0
+    segmentos = set()
+    lotes = 0
+
+    with _Trava(diretorio):
+        while max_lotes is None or lotes < max_lotes:
+            logs = LogAtividade.query.filter(LogAtividade.data_criacao < limite).order_by(
+                LogAtividade.data_criacao, LogAtividade.id
+            ).limit(lote).all()
+            if not logs:
+                break
+
+            por_mes = {}
+            for item in logs:
+                dados = item.to_dict()
+                por_mes.setdefault(_mes(item.data_criacao.isoformat() if item.data_criacao else None), []).append(dados)
+
+            for mes, linhas in por_mes.items():
+                caminho = _segmento(diretorio, mes)
+                # Cada append gera um novo membro gzip; gzip.open lê todos em sequência
+                with gzip.open(caminho, 'at', encoding='utf-8') as f:
+                    for dados in linhas:
+                        f.write(serializar(dados) + '\n')
+                with open(caminho, 'rb') as f:
+                    os.fsync(f.fileno())
+                segmentos.add(os.path.basename(caminho))
+
+            ids = [item.id for item in logs]
+            LogAtividade.query.filter(LogAtividade.id.in_(ids)).delete(synchronize_session=False)
+            db.session.commit()
+            db.session.expunge_all()
+
+            total += len(ids)
+            lotes += 1
+            log(f'{total} logs arquivados')
+            if pausa:
+                time.sleep(pausa)
+
+    return {'arquivados': total, 'segmentos': sorted(segmentos)}
+
+
+def _meses_no_intervalo(inicio, fim):
+    """Meses (AAAA-MM) que intersectam [inicio, fim)"""
+    meses = []
+    atual = inicio.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    while atual < fim:
+        meses.append(atual.strftime('%Y-%m'))
+        atual = (atual.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return meses
+
+
+def _chave(dados):
+    """Identifica uma linha arquivada: o id sozinho pode ter sido reutilizado"""
+    return dados['id'], dados['data_criacao']
+
+
+def _ler_segmento(caminho, inicio_iso, fim_iso):
+    """Itera sobre as linhas de um segmento em [inicio, fim), sem linhas repetidas"""
+    vistos = set()
+    with gzip.open(caminho, 'rt', encoding='utf-8') as f:
+        for linha in f:
+            dados = json.loads(linha)
+            chave = _chave(dados)
+            if chave in vistos or not (inicio_iso <= (dados['data_criacao'] or '') < fim_iso):
+                continue
+            vistos.add(chave)
+            yield dados
+
+
+def _ler_segmentos(diretorio, inicio, fim):
+    """Itera sobre as linhas arquivadas em [inicio, fim)"""
+    for mes in _meses_no_intervalo(inicio, fim):
+        caminho = _segmento(diretorio, mes)
+        if os.path.exists(caminho):
+            yield from _ler_segmento(caminho, inicio.isoformat(), fim.isoformat())
+
+
+def listar_segmentos(diretorio=LOG_ARCHIVE_DIR):
+    """Segmentos existentes com mês e tamanho em bytes"""
+    return [
+        {'mes': os.path.basename(c)[5:12], 'arquivo': os.path.basename(c), 'bytes': os.path.getsize(c)}
+        for c in sorted(glob.glob(os.path.join(diretorio, 'logs-*.ndjson.gz')))
+    ]
+
+
+def consultar_arquivo(inicio, fim, tipo_usuario=None, acao=None, usuario_id=None,
+                      limite=100, diretorio=LOG_ARCHIVE_DIR):
+    """
+    Consulta logs arquivados em [inicio, fim)
+
+    Returns:
+        Até `limite` logs (mais antigos primeiro) e se há mais resultados
+    """
+    encontrados = []
+    for dados in _ler_segmentos(diretorio, inicio, fim):
+        if tipo_usuario and dados['tipo_usuario'] != tipo_usuario:
+            continue
+        if acao and acao not in (dados['acao'] or ''):
+            continue
+        if usuario_id is not None and dados['usuario_id'] != usuario_id:
+            continue
+        if len(encontrados) == limite:
+            return {'logs': encontrados, 'mais': True}
+        encontrados.append(dados)
+    return {'logs': encontrados, 'mais': False}
+
+
+def _log_de_dict(dados):
+    """Recria um LogAtividade a partir da linha arquivada (mesmo ID)"""
+    return LogAtividade(
+        id=dados['id'],
+        usuario_id=dados['usuario_id'],
+        tipo_usuario=dados['tipo_usuario'],
+        acao=dados['acao'],
+        detalhes=dados['detalhes'],
+        ip_address=dados['ip_address'],
+        user_agent=dados['user_agent'],
+        data_criacao=datetime.fromisoformat(dados['data_criacao']) if dados['data_criacao'] else None
+    )
+
+
+def restaurar_arquivo(inicio, fim, lote=LOG_ARCHIVE_BATCH, diretorio=LOG_ARCHIVE_DIR):
+    """
+    Devolve à tabela os logs arquivados em [inicio, fim) e os remove dos segmentos
+
+    Os logs restaurados voltam a ser arquivados na próxima execução se ainda
+    estiverem fora do período de retenção. Linhas cujo id já pertence a outro
+    log da tabela não são restauradas: continuam no segmento e voltam em
+    `conflitos`.
+
+    Returns:
+        Total de linhas restauradas e as linhas em conflito (id e data_criacao)
+    """
+    restaurados = 0
+    conflitos = []
+    inicio_iso, fim_iso = inicio.isoformat(), fim.isoformat()
+
+    with _Trava(diretorio):
+        for mes in _meses_no_intervalo(inicio, fim):
+            caminho = _segmento(diretorio, mes)
+            if not os.path.exists(caminho):
+                continue
+
+            # Primeiro grava no banco; só então reescreve o segmento sem as linhas que estão na tabela
+            na_tabela = set()
+            pendentes = []
+            for dados in _ler_segmento(caminho, inicio_iso, fim_iso):
+                pendentes.append(dados)
+                if len(pendentes) >= lote:
+                    restaurados += _inserir(pendentes, na_tabela, conflitos)
+                    pendentes = []
+            if pendentes:
+                restaurados += _inserir(pendentes, na_tabela, conflitos)
+
+            if not na_tabela:
+                continue
+            temporario = caminho + '.tmp'
+            with gzip.open(caminho, 'rt', encoding='utf-8') as origem, \
+                    gzip.open(temporario, 'wt', encoding='utf-8') as destino:
+                for linha in origem:
+                    if _chave(json.loads(linha)) not in na_tabela:
+                        destino.write(linha)
+            os.replace(temporario, caminho)
+
+    return {'restaurados': restaurados, 'conflitos': conflitos}
+
+
+def _inserir(linhas, na_tabela, conflitos):
+    """
+    Insere as linhas arquivadas cujo id está livre
+
+    Acrescenta a `na_tabela` as chaves das linhas inseridas e das que já
+    estavam na tabela (arquivamento interrompido antes do DELETE), e a
+    `conflitos` as linhas cujo id pertence a outro log.
+
+    Returns:
+        Quantidade de linhas inseridas
+    """
+    ids = [d['id'] for d in linhas]
+    ocupados = {
+        id: data_criacao.isoformat() if data_criacao else None
+        for id, data_criacao in db.session.query(LogAtividade.id, LogAtividade.data_criacao)
+        .filter(LogAtividade.id.in_(ids))
+    }
+    novos = []
+    for dados in linhas:
+        if dados['id'] not in ocupados:
+            novos.append(_log_de_dict(dados))
+            ocupados[dados['id']] = dados['data_criacao']
+            na_tabela.add(_chave(dados))
+        elif ocupados[dados['id']] == dados['data_criacao']:
+            na_tabela.add(_chave(dados))
+        else:
+            conflitos.append({'id': dados['id'], 'data_criacao': dados['data_criacao']})
+    db.session.add_all(novos)
+    db.session.commit()
+    db.session.expunge_all()
+    return len(novos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Arquiva logs de atividade antigos')
+    parser.add_argument('--dias', type=int, default=LOG_RETENTION_DAYS, help='Retenção na tabela, em dias')
+    parser.add_argument('--lote', type=int, default=LOG_ARCHIVE_BATCH, help='Linhas por transação')
+    parser.add_argument('--pausa', type=float, default=0.05, help='Segundos entre lotes')
+    args = parser.parse_args()
+
+    from src.main import app
+    with app.app_context():
+        resultado = arquivar_logs(args.dias, args.lote, pausa=args.pausa)
+    print(f"{resultado['arquivados']} logs arquivados em {len(resultado['segmentos'])} segmento(s)")
+
+
+if __name__ == '__main__':
+    main()
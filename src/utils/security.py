@@ -1,12 +1,24 @@
 from functools import wraps
 from flask import session, jsonify, request
-from src.models.administrador import LogAtividade
+from src.models.administrador import LogAtividade, AcaoLog
 from src.models.user import db
+from src.utils.media import MEDIA_MAX_BYTES
+from src.utils.sessao import obter_principal
+from src.utils.bloqueio_ip import get_bloqueio_ip
+from src.utils.validacao import limpar_texto
+from werkzeug.middleware.proxy_fix import ProxyFix
 import hashlib
 import hmac
+import ipaddress
+import os
 import time
 import secrets
 
+# Proxies reversos à frente da aplicação (Traefik): quantos e de quais endereços.
+# FORWARDED_ALLOW_IPS é a mesma variável lida pelo gunicorn e pelo uvicorn.
+PROXY_HOPS = int(os.environ.get('PROXY_HOPS', 1))
+FORWARDED_ALLOW_IPS = os.environ.get('FORWARDED_ALLOW_IPS', '127.0.0.1')
+
 # Chave master para segurança adicional (deve ser configurada via variável de ambiente)
 MASTER_KEY = "sdr-ia-master-security-key-2025"
 
@@ -43,9 +55,14 @@ def rate_limit_check(usuario_id, acao, limite=10, janela=60):
         from datetime import datetime, timedelta
         inicio_janela = datetime.utcnow() - timedelta(seconds=janela)
         
+        # Ação nunca registrada: não há tentativas
+        acao_id = AcaoLog.buscar_id(acao)
+        if acao_id is None:
+            return True
+        
         tentativas = LogAtividade.query.filter(
             LogAtividade.usuario_id == usuario_id,
-            LogAtividade.acao == acao,
+            LogAtividade.acao_id == acao_id,
             LogAtividade.data_criacao >= inicio_janela
         ).count()
         
@@ -70,11 +87,28 @@ def log_atividade_seguranca(usuario_id, tipo_usuario, acao, detalhes=None):
     except Exception as e:
         print(f"Erro ao registrar log de segurança: {e}")
 
+def principal_sessao():
+    """
+    Usuário da sessão atual (cache de src/utils/sessao.py)
+    
+    Retorna None sem login ou se o acesso foi revogado (usuário desativado,
+    cliente não aprovado); nesse caso a sessão é encerrada.
+    """
+    usuario_id = session.get('usuario_id')
+    tipo_usuario = session.get('tipo_usuario')
+    if not usuario_id or not tipo_usuario:
+        return None
+    
+    principal = obter_principal(tipo_usuario, usuario_id)
+    if principal is None:
+        session.clear()
+    return principal
+
 def login_required(f):
     """Decorator para exigir login"""
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if 'usuario_id' not in session:
+        if principal_sessao() is None:
             return jsonify({'erro': 'Login necessário'}), 401
         return f(*args, **kwargs)
     return decorated_function
@@ -83,7 +117,8 @@ def admin_required(f):
     """Decorator para exigir login de administrador"""
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if 'usuario_id' not in session or session.get('tipo_usuario') != 'administrador':
+        principal = principal_sessao()
+        if principal is None or principal['tipo'] != 'administrador':
             return jsonify({'erro': 'Acesso negado - Administrador necessário'}), 403
         return f(*args, **kwargs)
     return decorated_function
@@ -92,8 +127,9 @@ def super_admin_required(f):
     """Decorator para exigir super administrador"""
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if (session.get('tipo_usuario') != 'administrador' or 
-            session.get('nivel_acesso') != 'super_admin'):
+        principal = principal_sessao()
+        if (principal is None or principal['tipo'] != 'administrador' or 
+            principal['nivel_acesso'] != 'super_admin'):
             return jsonify({'erro': 'Acesso negado - Super Administrador necessário'}), 403
         return f(*args, **kwargs)
     return decorated_function
@@ -102,7 +138,8 @@ def cliente_required(f):
     """Decorator para exigir login de cliente"""
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if 'usuario_id' not in session or session.get('tipo_usuario') != 'cliente':
+        principal = principal_sessao()
+        if principal is None or principal['tipo'] != 'cliente':
             return jsonify({'erro': 'Acesso negado - Cliente necessário'}), 403
         return f(*args, **kwargs)
     return decorated_function
@@ -125,31 +162,57 @@ def validar_entrada_segura(data, campos_obrigatorios=None, tamanho_max=None):
     return True, "Válido"
 
 def sanitizar_entrada(texto):
-    """Sanitiza entrada de texto"""
+    """Sanitiza entrada de texto (remove caracteres perigosos e espaços das pontas)"""
     if not isinstance(texto, str):
         return texto
     
-    # Remove caracteres perigosos
-    caracteres_perigosos = ['<', '>', '"', "'", '&', '\x00']
-    for char in caracteres_perigosos:
-        texto = texto.replace(char, '')
-    
-    return texto.strip()
+    return limpar_texto(texto)
 
 def verificar_ip_suspeito(ip_address):
-    """Verifica se o IP é suspeito (implementação básica)"""
-    # Lista de IPs bloqueados (pode ser expandida)
-    ips_bloqueados = []
-    
-    return ip_address in ips_bloqueados
+    """Verifica se o IP está na lista de bloqueio (faixas CIDR da tabela ips_bloqueados e do arquivo)"""
+    return get_bloqueio_ip().bloqueado(ip_address)
 
 def middleware_seguranca():
     """Middleware de segurança para todas as requisições"""
+    # Rejeita corpos acima do limite antes de lê-los
+    if request.content_length is not None and request.content_length > MEDIA_MAX_BYTES:
+        return jsonify({'erro': 'Requisição excede o tamanho máximo permitido'}), 413
+    
     # Verifica IP suspeito
     if verificar_ip_suspeito(request.remote_addr):
         log_atividade_seguranca(None, 'sistema', 'ip_bloqueado', request.remote_addr)
         return jsonify({'erro': 'Acesso negado'}), 403
 
+class ProxyConfiavel(ProxyFix):
+    """
+    ProxyFix que só aplica X-Forwarded-For/-Proto a conexões vindas do proxy
+
+    O gunicorn entrega em REMOTE_ADDR o endereço do socket (o Traefik), e o
+    bloqueio de IPs, os logs e os limites precisam do cliente. Conexões de
+    fora de FORWARDED_ALLOW_IPS (ex: direto na porta publicada) mantêm o
+    REMOTE_ADDR, para que um X-Forwarded-For forjado não seja aceito.
+    """
+
+    def __init__(self, app, hops=PROXY_HOPS, permitidos=FORWARDED_ALLOW_IPS):
+        super().__init__(app, x_for=hops, x_proto=hops)
+        itens = [item.strip() for item in permitidos.split(',') if item.strip()]
+        self.qualquer = '*' in itens
+        self.redes = [ipaddress.ip_network(item, strict=False) for item in itens if item != '*']
+
+    def do_proxy(self, endereco):
+        if self.qualquer:
+            return True
+        try:
+            ip = ipaddress.ip_address(endereco or '')
+        except ValueError:
+            return False
+        return any(ip in rede for rede in self.redes)
+
+    def __call__(self, environ, start_response):
+        if self.do_proxy(environ.get('REMOTE_ADDR')):
+            return super().__call__(environ, start_response)
+        return self.app(environ, start_response)
+
 # Adiciona headers de segurança (registrado diretamente no app no main.py)
 def add_security_headers(response):
     response.headers['X-Content-Type-Options'] = 'nosniff'
@@ -0,0 +1,218 @@
+"""
+Serviço de hash de senhas
+
+Os hashes (bcrypt por padrão) são calculados em um pool de processos, com
+limite de operações simultâneas: uma rajada de logins não ocupa as threads
+dos workers web nem a CPU usada pelos webhooks. Acima do limite, a operação
+espera até SENHA_ESPERA_MAX segundos e então falha com ServicoSenhasOcupado.
+
+Hashes antigos (PBKDF2 do Werkzeug ou bcrypt com outro custo) continuam
+válidos e são refeitos com o algoritmo e o custo configurados no próximo
+login bem-sucedido.
+
+    python -m src.utils.senhas --medir 64
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import bcrypt
+from werkzeug.security import generate_password_hash, check_password_hash
+
+SENHA_ALGORITMO = os.environ.get('SENHA_ALGORITMO', 'bcrypt').lower()  # bcrypt ou pbkdf2
+SENHA_BCRYPT_ROUNDS = int(os.environ.get('SENHA_BCRYPT_ROUNDS', 12))
+SENHA_WORKERS = int(os.environ.get('SENHA_WORKERS', 2))  # 0 = calcula na própria thread
+SENHA_CONCORRENCIA = int(os.environ.get('SENHA_CONCORRENCIA', 8))
+SENHA_ESPERA_MAX = float(os.environ.get('SENHA_ESPERA_MAX', 2))
+SENHA_TIMEOUT = float(os.environ.get('SENHA_TIMEOUT', 30))
+
+# bcrypt considera apenas os primeiros 72 bytes da senha
+_BCRYPT_MAX_BYTES = 72
+
+
+class ServicoSenhasOcupado(Exception):
+    """Limite de operações de hash simultâneas atingido"""
+    pass
+
+
+def gerar_hash(senha, algoritmo=SENHA_ALGORITMO, rounds=SENHA_BCRYPT_ROUNDS):
+    """
+    Gera o hash de uma senha
+
+    Executada nos processos do pool: precisa ser uma função de módulo (picklable).
+    """
+    if algoritmo == 'bcrypt':
+        salt = bcrypt.gensalt(rounds=rounds)
+        return bcrypt.hashpw(senha.encode('utf-8')[:_BCRYPT_MAX_BYTES], salt).decode('ascii')
+    if algoritmo == 'pbkdf2':
+        return generate_password_hash(senha, method='pbkdf2')
+    raise ValueError(f'Algoritmo de senha não suportado: {algoritmo}')
+
+
+def verificar_hash(senha_hash, senha):
+    """Verifica uma senha contra um hash bcrypt ou do Werkzeug (executada no pool)"""
+    if not senha_hash:
+        return False
+    if senha_hash.startswith('$2'):
+        try:
+            return bcrypt.checkpw(senha.encode('utf-8')[:_BCRYPT_MAX_BYTES], senha_hash.encode('ascii'))
+        except ValueError:
+            return False
+    return check_password_hash(senha_hash, senha)
+
+
+def precisa_rehash(senha_hash, algoritmo=SENHA_ALGORITMO, rounds=SENHA_BCRYPT_ROUNDS):
+    """Indica se o hash foi gerado com outro algoritmo ou custo que os configurados"""
+    if algoritmo == 'bcrypt':
+        # Formato: $2b$<rounds>$<salt+hash>
+        partes = senha_hash.split('$')
+        return not (senha_hash.startswith('$2') and len(partes) > 2 and partes[2] == f'{rounds:02d}')
+    if algoritmo == 'pbkdf2':
+        return not senha_hash.startswith('pbkdf2:')
+    return False
+
+
+class ServicoSenhas:
+    """Executa os hashes de senha em um pool de processos com limite de concorrência"""
+
+    def __init__(self, workers=SENHA_WORKERS, concorrencia=SENHA_CONCORRENCIA,
+                 algoritmo=SENHA_ALGORITMO, rounds=SENHA_BCRYPT_ROUNDS):
+        """
+        Inicializa o serviço
+
+        Args:
+            workers: Processos do pool (0 = calcula na thread que chamou)
+            concorrencia: Operações simultâneas (em execução ou na fila do pool)
+            algoritmo: Algoritmo dos novos hashes (bcrypt ou pbkdf2)
+            rounds: Custo do bcrypt
+        """
+        self.workers = workers
+        self.algoritmo = algoritmo
+        self.rounds = rounds
+        self._vagas = threading.BoundedSemaphore(max(1, concorrencia))
+        self._pool = None
+        self._pool_pid = None
+        self._lock = threading.Lock()
+        self._recusadas = 0
+
+    def _get_pool(self):
+        # Cria o pool sob demanda e recria após fork (ex: workers do gunicorn)
+        with self._lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def _executar(self, funcao, *args):
+        if not self._vagas.acquire(timeout=SENHA_ESPERA_MAX):
+            with self._lock:
+                self._recusadas += 1
+            raise ServicoSenhasOcupado('Muitas operações de senha simultâneas')
+        try:
+            if self.workers <= 0:
+                return funcao(*args)
+            return self._get_pool().submit(funcao, *args).result(timeout=SENHA_TIMEOUT)
+        finally:
+            self._vagas.release()
+
+    def gerar_hash(self, senha):
+        """Hash da senha com o algoritmo e o custo configurados"""
+        return self._executar(gerar_hash, senha, self.algoritmo, self.rounds)
+
+    def verificar(self, senha_hash, senha):
+        """Verifica a senha (aceita hashes bcrypt e do Werkzeug)"""
+        return self._executar(verificar_hash, senha_hash, senha)
+
+    def precisa_rehash(self, senha_hash):
+        return precisa_rehash(senha_hash, self.algoritmo, self.rounds)
+
+    def get_stats(self):
+        return {
+            'algoritmo': self.algoritmo,
+            'rounds': self.rounds,
+            'workers': self.workers,
+            'recusadas': self._recusadas
+        }
+
+
+_servico = None
+
+
+def get_servico_senhas():
+    """
+    Retorna o serviço de senhas compartilhado do processo
+
+    Returns:
+        Instância de ServicoSenhas
+    """
+    global _servico
+    if _servico is None:
+        _servico = ServicoSenhas()
+    return _servico
+
+
+def benchmark_senhas(verificacoes=64, threads=16, servico=None):
+    """
+    Verificações simultâneas de senha pelo serviço
+
+    Mede o custo de um hash em cada algoritmo e, durante uma rajada de
+    `verificacoes` logins em `threads` threads, o atraso de uma tarefa leve
+    executada em paralelo (o que um webhook sofreria no mesmo worker).
+    """
+    servico = servico or get_servico_senhas()
+    custos = {}
+    for algoritmo in ('pbkdf2', 'bcrypt'):
+        inicio = time.perf_counter()
+        senha_hash = gerar_hash('senha-de-teste', algoritmo, servico.rounds)
+        verificar_hash(senha_hash, 'senha-de-teste')
+        custos[algoritmo] = round((time.perf_counter() - inicio) * 1000 / 2, 1)
+
+    senha_hash = servico.gerar_hash('senha-de-teste')
+    atrasos, fim = [], [False]
+
+    def tarefa_leve():
+        while not fim[0]:
+            inicio = time.perf_counter()
+            sum(range(10000))
+            atrasos.append(time.perf_counter() - inicio)
+            time.sleep(0.005)
+
+    def login(_):
+        try:
+            return servico.verificar(senha_hash, 'senha-de-teste')
+        except ServicoSenhasOcupado:
+            return None
+
+    medidor = threading.Thread(target=tarefa_leve)
+    medidor.start()
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        resultados = list(pool.map(login, range(verificacoes)))
+    duracao = time.perf_counter() - inicio
+    fim[0] = True
+    medidor.join()
+
+    atrasos.sort()
+    return {
+        'custo_hash_ms': custos,
+        'verificacoes': verificacoes,
+        'duracao_s': round(duracao, 2),
+        'recusadas': resultados.count(None),
+        'tarefa_leve_p99_ms': round(atrasos[int(len(atrasos) * 0.99)] * 1000, 2) if atrasos else None,
+        **servico.get_stats()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serviço de hash de senhas')
+    parser.add_argument('--medir', type=int, default=64, help='Verificações simultâneas')
+    parser.add_argument('--threads', type=int, default=16)
+    args = parser.parse_args()
+    print(json.dumps(benchmark_senhas(args.medir, args.threads), indent=2))
+
+
+if __name__ == '__main__':
+    main()
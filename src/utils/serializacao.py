@@ -0,0 +1,219 @@
+"""
+Serialização JSON das respostas
+
+ProvedorJSON substitui o provedor padrão do Flask (app.json). Com o orjson
+instalado, jsonify, os dicts retornados pelas views e request.get_json usam
+o orjson. Sem ele, o json da biblioteca padrão é usado, com as mesmas regras.
+
+Datas e horas viram texto ISO 8601 ('2024-05-01T10:30:00'), e os to_dict()
+dos modelos podem retornar os objetos datetime diretamente. O padrão do
+Flask (formato de data HTTP) não é usado.
+
+    python -m src.utils.serializacao --medir
+"""
+import argparse
+import dataclasses
+import decimal
+import json
+import time
+import uuid
+from datetime import date, datetime, time as hora
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def para_json(obj):
+    """
+    Converte tipos que o json não conhece (datas, Decimal, UUID, dataclasses)
+
+    Raises:
+        TypeError: Se o tipo não for suportado
+    """
+    if isinstance(obj, (datetime, date, hora)):
+        return obj.isoformat()
+    if isinstance(obj, (decimal.Decimal, uuid.UUID)):
+        return str(obj)
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    if hasattr(obj, '__html__'):
+        return str(obj.__html__())
+    raise TypeError(f'Objeto do tipo {type(obj).__name__} não é serializável em JSON')
+
+
+def serializar(obj):
+    """JSON compacto em texto, com as mesmas regras das respostas (ex: NDJSON, arquivos)"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, default=para_json, option=orjson.OPT_NON_STR_KEYS).decode()
+        except orjson.JSONEncodeError:
+            pass  # Ex: inteiros maiores que 64 bits; o json padrão decide
+    return json.dumps(obj, default=para_json, ensure_ascii=False, separators=(',', ':'))
+
+
+class ProvedorJSON(DefaultJSONProvider):
+    """Provedor JSON do Flask com orjson (se instalado) e datas em ISO 8601"""
+
+    default = staticmethod(para_json)
+    # Texto UTF-8 direto, sem escapes \uXXXX (respostas menores; o orjson não escapa)
+    ensure_ascii = False
+    usar_orjson = orjson is not None
+
+    def _opcoes(self, indentar=False):
+        opcoes = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            opcoes |= orjson.OPT_SORT_KEYS
+        if indentar:
+            opcoes |= orjson.OPT_INDENT_2
+        return opcoes
+
+    def _orjson(self, obj, indentar=False):
+        """Bytes do orjson, ou None para tipos que só o json padrão aceita"""
+        try:
+            return orjson.dumps(obj, default=self.default, option=self._opcoes(indentar))
+        except orjson.JSONEncodeError:
+            return None
+
+    def dumps(self, obj, **kwargs):
+        # Argumentos próprios do json padrão (cls, separators diferentes etc.) seguem para ele
+        if self.usar_orjson and set(kwargs) <= {'indent', 'separators'} and kwargs.get('indent') in (None, 2):
+            dados = self._orjson(obj, indentar='indent' in kwargs)
+            if dados is not None:
+                return dados.decode()
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if self.usar_orjson and not kwargs:
+            try:
+                return orjson.loads(s)
+            except orjson.JSONDecodeError:
+                pass  # NaN, inteiros enormes etc.; o json padrão aceita ou gera o erro
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        if not self.usar_orjson:
+            return super().response(*args, **kwargs)
+
+        obj = self._prepare_response_obj(args, kwargs)
+        indentar = (self.compact is None and self._app.debug) or self.compact is False
+        dados = self._orjson(obj, indentar)
+        if dados is None:
+            return super().response(obj)
+        # Bytes direto para a resposta, sem passar por str
+        return self._app.response_class(dados + b'\n', mimetype=self.mimetype)
+
+
+def _payload_webhook(tamanho_prompt):
+    """Resposta típica de /api/webhook/sdr: configurações com três prompts e tags"""
+    from datetime import timedelta
+    prompt = ('Você é um SDR da empresa. Qualifique o lead, pergunte sobre orçamento, '
+              'prazo e decisão; responda em português com educação.\n')
+    prompt = (prompt * (tamanho_prompt // len(prompt) + 1))[:tamanho_prompt]
+    agora = datetime(2024, 5, 1, 10, 30, 15, 123456)
+    return {
+        'sucesso': True,
+        'cliente_id': 42,
+        'configuracoes': {
+            'id': 42, 'cliente_id': 42, 'kommo_token': 'eyJ0eXAiOiJKV1QiLCJhbGciOiJSUzI1NiJ9.' * 8,
+            'kommo_domain': 'empresa.kommo.com', 'chatgpt_api_key': 'sk-' + 'a' * 48,
+            'chatgpt_model': 'gpt-4o-mini', 'pipeline_id': '7788', 'funil_ids': [1, 2, 3],
+            'prompt_agente_ia': prompt, 'prompt_audio': prompt, 'prompt_imagem': prompt,
+            'aprovacao_automatica': False, 'usar_n8n': True,
+            'data_criacao': agora, 'data_atualizacao': agora
+        },
+        'tags_permitidas': [
+            {'id': i, 'nome': f'Tag {i}', 'funil_id': '10', 'pipeline_id': '7788', 'ativa': True,
+             'data_criacao': agora - timedelta(days=i)}
+            for i in range(20)
+        ],
+        'eventos_restantes': 812
+    }
+
+
+def _payload_logs(quantidade):
+    """Página de /api/admin/logs: registros curtos com datas"""
+    agora = datetime(2024, 5, 1, 10, 30, 15, 123456)
+    return {
+        'logs': [
+            {'id': i, 'usuario_id': i % 50, 'tipo_usuario': 'cliente', 'acao': 'webhook_processado',
+             'detalhes': f'Evento {i} processado com sucesso', 'ip_address': f'10.0.{i % 256}.{i % 100}',
+             'user_agent': 'Mozilla/5.0 (X11; Linux x86_64)', 'data_criacao': agora}
+            for i in range(quantidade)
+        ],
+        'total': quantidade, 'pagina': 1, 'paginas': 1
+    }
+
+
+def benchmark_serializacao(repeticoes=2000, tamanho_prompt=4000):
+    """
+    Tempo de serialização e bytes transferidos por resposta
+
+    Compara o provedor padrão do Flask (to_dict com .isoformat() manual,
+    escapes ASCII) com o ProvedorJSON em json padrão e em orjson, e mede o
+    tamanho com gzip e brotli (src/utils/compressao.py).
+    """
+    from flask import Flask
+    from src.utils.compressao import comprimir, brotli
+
+    def isoformat_manual(obj):
+        # Como os to_dict() faziam antes: datas convertidas em Python
+        if isinstance(obj, dict):
+            return {k: isoformat_manual(v) for k, v in obj.items()}
+        if isinstance(obj, list):
+            return [isoformat_manual(v) for v in obj]
+        if isinstance(obj, datetime):
+            return obj.isoformat()
+        return obj
+
+    app = Flask(__name__)
+    provedores = {'flask_padrao': DefaultJSONProvider(app)}
+    padrao = ProvedorJSON(app)
+    padrao.usar_orjson = False
+    provedores['json_padrao'] = padrao
+    if orjson is not None:
+        provedores['orjson'] = ProvedorJSON(app)
+
+    resultados = {}
+    for caso, payload in (('webhook', _payload_webhook(tamanho_prompt)), ('logs', _payload_logs(100))):
+        resultado = {}
+        for nome, provedor in provedores.items():
+            manual = nome == 'flask_padrao'
+            with app.app_context():
+                inicio = time.perf_counter()
+                for _ in range(repeticoes):
+                    corpo = provedor.response(isoformat_manual(payload) if manual else payload).get_data()
+                duracao = time.perf_counter() - inicio
+            resultado[nome] = {'us': round(duracao / repeticoes * 1e6, 1), 'bytes': len(corpo)}
+
+        # Bytes na rede para o corpo do provedor mais rápido disponível
+        for codificacao in ('gzip', 'br'):
+            if codificacao == 'br' and brotli is None:
+                continue
+            inicio = time.perf_counter()
+            for _ in range(max(1, repeticoes // 10)):
+                comprimido = comprimir(corpo, codificacao)
+            duracao = time.perf_counter() - inicio
+            resultado[codificacao] = {
+                'us': round(duracao / max(1, repeticoes // 10) * 1e6, 1),
+                'bytes': len(comprimido)
+            }
+        resultados[caso] = resultado
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serialização JSON das respostas')
+    parser.add_argument('--medir', action='store_true', help='Compara provedores e compressão')
+    parser.add_argument('--repeticoes', type=int, default=2000)
+    parser.add_argument('--tamanho-prompt', type=int, default=4000)
+    args = parser.parse_args()
+    if args.medir:
+        print(json.dumps(benchmark_serializacao(args.repeticoes, args.tamanho_prompt), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Cache do usuário da sessão (principal)
+
+O cookie de sessão só identifica o usuário (tipo e id). O estado que decide o
+acesso (ativo, aprovado, nível de acesso) vem do banco e fica em cache por
+processo durante SESSAO_CACHE_TTL segundos, evitando uma consulta por
+requisição em /api/auth/verificar-sessao e nos decorators de acesso.
+
+As rotas que alteram esse estado chamam invalidar_principal: no processo que
+atendeu a alteração o efeito é imediato, nos demais em até SESSAO_CACHE_TTL.
+"""
+from src.models.user import db
+from src.models.cliente import Cliente
+from src.models.administrador import Administrador
+import os
+import threading
+import time
+
+SESSAO_CACHE_TTL = float(os.environ.get('SESSAO_CACHE_TTL', 30))
+SESSAO_CACHE_MAX = int(os.environ.get('SESSAO_CACHE_MAX', 10000))
+
+_lock = threading.Lock()
+_cache = {}  # (tipo_usuario, usuario_id) -> (principal ou None, expira_em)
+
+
+def carregar_principal(tipo_usuario, usuario_id):
+    """
+    Consulta o usuário no banco
+
+    Returns:
+        Dict com tipo, nivel_acesso e usuario (to_dict), ou None se o usuário
+        não existir, estiver inativo ou (cliente) não aprovado
+    """
+    if tipo_usuario == 'administrador':
+        admin = db.session.get(Administrador, usuario_id)
+        if not admin or not admin.ativo:
+            return None
+        return {'tipo': 'administrador', 'nivel_acesso': admin.nivel_acesso, 'usuario': admin.to_dict()}
+
+    if tipo_usuario == 'cliente':
+        cliente = db.session.get(Cliente, usuario_id)
+        if not cliente or not cliente.ativo or not cliente.aprovado:
+            return None
+        return {'tipo': 'cliente', 'nivel_acesso': None, 'usuario': cliente.to_dict()}
+
+    return None
+
+
+def obter_principal(tipo_usuario, usuario_id):
+    """Usuário da sessão, do cache ou do banco (None se o acesso foi revogado)"""
+    chave = (tipo_usuario, usuario_id)
+    agora = time.monotonic()
+    with _lock:
+        item = _cache.get(chave)
+    if item is not None and agora < item[1]:
+        return item[0]
+
+    principal = carregar_principal(tipo_usuario, usuario_id)
+    with _lock:
+        if chave not in _cache and len(_cache) >= SESSAO_CACHE_MAX:
+            _cache.pop(next(iter(_cache)))  # Descarta a entrada mais antiga
+        _cache[chave] = (principal, agora + SESSAO_CACHE_TTL)
+    return principal
+
+
+def invalidar_principal(tipo_usuario, usuario_id):
+    """Descarta o usuário do cache (ex: após aprovar, desativar ou reativar um cliente)"""
+    with _lock:
+        _cache.pop((tipo_usuario, usuario_id), None)
@@ -0,0 +1,240 @@
+"""
+Teste de carga do servidor de produção (gunicorn) por modelo de worker
+
+Sobe o gunicorn com src/gunicorn_conf.py para cada worker class, dispara
+requisições concorrentes (keep-alive) e mede vazão e latência.
+
+    python -m src.utils.teste_carga --modelos gthread sync gevent --duracao 10 --clientes 32
+
+Os modelos indisponíveis (ex: gevent sem o pacote instalado) são ignorados.
+
+Com --externas N mede a aplicação ASGI (src/asgi.py) no próprio processo:
+N chamadas simultâneas a /api/n8n/test contra um n8n simulado que responde
+após --latencia segundos.
+
+    python -m src.utils.teste_carga --externas 2000 --latencia 0.5
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+_RAIZ = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+CAMINHOS_PADRAO = ['/health', '/api/webhook/config/1']
+
+
+def _porta_livre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _aguardar(porta, limite=30.0):
+    fim = time.perf_counter() + limite
+    while time.perf_counter() < fim:
+        try:
+            with socket.create_connection(('127.0.0.1', porta), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'Servidor não respondeu na porta {porta}')
+
+
+def disparar(porta, caminhos, clientes, duracao):
+    """Requisições GET concorrentes por `duracao` segundos; retorna vazão e latências"""
+    latencias, erros = [], [0]
+    lock = threading.Lock()
+    fim = time.perf_counter() + duracao
+
+    def _cliente(n):
+        conn = http.client.HTTPConnection('127.0.0.1', porta, timeout=30)
+        locais, falhas, i = [], 0, n
+        while time.perf_counter() < fim:
+            caminho = caminhos[i % len(caminhos)]
+            i += 1
+            inicio = time.perf_counter()
+            try:
+                conn.request('GET', caminho)
+                resposta = conn.getresponse()
+                resposta.read()
+                if resposta.status >= 500:
+                    falhas += 1
+                else:
+                    locais.append(time.perf_counter() - inicio)
+            except (OSError, http.client.HTTPException):
+                falhas += 1
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', porta, timeout=30)
+        conn.close()
+        with lock:
+            latencias.extend(locais)
+            erros[0] += falhas
+
+    threads = [threading.Thread(target=_cliente, args=(n,)) for n in range(clientes)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    latencias.sort()
+    return {
+        'requisicoes': len(latencias),
+        'req_por_segundo': round(len(latencias) / duracao, 1),
+        'p50_ms': round(statistics.median(latencias) * 1000, 1) if latencias else None,
+        'p95_ms': round(latencias[int(len(latencias) * 0.95)] * 1000, 1) if latencias else None,
+        'erros': erros[0]
+    }
+
+
+def medir_modelo(modelo, caminhos=CAMINHOS_PADRAO, clientes=32, duracao=10.0, env=None):
+    """Sobe o gunicorn com o worker class `modelo` e executa o teste de carga"""
+    porta = _porta_livre()
+    ambiente = {
+        **os.environ,
+        'AUTO_BOOTSTRAP': 'false',
+        'GUNICORN_WORKER_CLASS': modelo,
+        'PORT': str(porta),
+        'LOG_LEVEL': 'warning',
+        'GUNICORN_ACCESS_LOG': '',
+        **(env or {})
+    }
+    servidor = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'src/gunicorn_conf.py', 'src.main:app'],
+        cwd=_RAIZ, env=ambiente, stdout=subprocess.DEVNULL
+    )
+    try:
+        _aguardar(porta)
+        disparar(porta, caminhos, clientes, 1.0)  # Aquecimento
+        return disparar(porta, caminhos, clientes, duracao)
+    finally:
+        servidor.terminate()
+        servidor.wait(timeout=60)
+
+
+def medir_chamadas_externas(chamadas=2000, latencia=0.5):
+    """
+    Chamadas simultâneas a uma rota assíncrona da aplicação ASGI
+
+    Um servidor aiohttp local simula o n8n, respondendo após `latencia`
+    segundos. Retorna o tempo total e o pico de chamadas em andamento no n8n
+    simulado (com o pool de threads do WSGI o pico seria o número de threads).
+    """
+    import asyncio
+    from aiohttp import web
+    from src.asgi import app, flask_app
+
+    cookie = flask_app.session_interface.get_signing_serializer(flask_app).dumps(
+        {'usuario_id': 1, 'tipo_usuario': 'administrador', 'nivel_acesso': 'super_admin'}
+    )
+    andamento = {'atual': 0, 'pico': 0}
+
+    async def workflows(request):
+        andamento['atual'] += 1
+        andamento['pico'] = max(andamento['pico'], andamento['atual'])
+        await asyncio.sleep(latencia)
+        andamento['atual'] -= 1
+        return web.json_response({'data': []})
+
+    async def chamar(porta):
+        corpo = json.dumps({'base_url': f'http://127.0.0.1:{porta}'}).encode()
+        scope = {
+            'type': 'http', 'method': 'POST', 'path': '/api/n8n/test', 'query_string': b'',
+            'http_version': '1.1', 'scheme': 'http', 'root_path': '',
+            'client': ('127.0.0.1', 0), 'server': ('127.0.0.1', 80),
+            'headers': [(b'content-type', b'application/json'), (b'cookie', f'session={cookie}'.encode())]
+        }
+        mensagens = [{'type': 'http.request', 'body': corpo, 'more_body': False}]
+        status = []
+
+        async def receive():
+            return mensagens.pop() if mensagens else {'type': 'http.disconnect'}
+
+        async def send(mensagem):
+            if mensagem['type'] == 'http.response.start':
+                status.append(mensagem['status'])
+
+        await app(scope, receive, send)
+        return status[0]
+
+    async def executar():
+        servidor = web.Application()
+        servidor.router.add_get('/api/v1/workflows', workflows)
+        runner = web.AppRunner(servidor, access_log=None)
+        await runner.setup()
+        porta = _porta_livre()
+        await web.TCPSite(runner, '127.0.0.1', porta).start()
+        try:
+            await chamar(porta)  # Aquecimento (imports e conexão com o banco)
+            andamento['pico'] = 0
+            inicio = time.perf_counter()
+            status = await asyncio.gather(*(chamar(porta) for _ in range(chamadas)))
+            duracao = time.perf_counter() - inicio
+        finally:
+            await app.encerrar()
+            await runner.cleanup()
+        return {
+            'chamadas': chamadas,
+            'latencia_s': latencia,
+            'duracao_s': round(duracao, 2),
+            'pico_em_andamento': andamento['pico'],
+            'erros': sum(1 for s in status if s != 200)
+        }
+
+    return asyncio.run(executar())
+
+
+def _disponivel(modelo):
+    if modelo == 'gevent':
+        try:
+            import gevent  # noqa: F401
+        except ImportError:
+            return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Teste de carga por modelo de worker do gunicorn')
+    parser.add_argument('--modelos', nargs='+', default=['sync', 'gthread', 'gevent'])
+    parser.add_argument('--caminhos', nargs='+', default=CAMINHOS_PADRAO)
+    parser.add_argument('--clientes', type=int, default=32)
+    parser.add_argument('--duracao', type=float, default=10.0)
+    parser.add_argument('--workers', type=int, help='GUNICORN_WORKERS (padrão: pela cota de CPU)')
+    parser.add_argument('--externas', type=int, help='Mede N chamadas externas simultâneas na aplicação ASGI')
+    parser.add_argument('--latencia', type=float, default=0.5, help='Latência do serviço externo simulado')
+    args = parser.parse_args()
+
+    env = {}
+    if args.workers:
+        env['GUNICORN_WORKERS'] = str(args.workers)
+    if not os.environ.get('DATABASE_URL'):
+        env['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='sdria-carga-'), 'app.db')}"
+
+    # Bootstrap do banco de teste antes de subir os servidores
+    subprocess.run([sys.executable, '-m', 'src.utils.inicializacao'], cwd=_RAIZ,
+                   env={**os.environ, **env}, check=True, stdout=subprocess.DEVNULL)
+
+    if args.externas:
+        os.environ.update(env, AUTO_BOOTSTRAP='false', LOG_LEVEL='warning')
+        print(json.dumps(medir_chamadas_externas(args.externas, args.latencia), indent=2))
+        return
+
+    resultados = {}
+    for modelo in args.modelos:
+        if not _disponivel(modelo):
+            print(f'{modelo}: indisponível, ignorado')
+            continue
+        resultados[modelo] = medir_modelo(modelo, args.caminhos, args.clientes, args.duracao, env)
+        print(f'{modelo}: {json.dumps(resultados[modelo])}')
+
+    print(json.dumps(resultados, indent=2))
+
+
+if __name__ == '__main__':
+    main()